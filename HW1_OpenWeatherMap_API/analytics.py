@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+
+# Окно скользящего среднего (дней) и порядок сезонов на графиках
+WINDOW = 30
+SEASON_ORDER = ['autumn', 'winter', 'spring', 'summer']
+
+
+def rolling_mean(city_codes: np.ndarray, temp: np.ndarray, window: int = WINDOW) -> np.ndarray:
+    """
+    Скользящее среднее температуры внутри каждого города (как rolling(window, min_periods=1).mean()).
+    city_codes - целые коды городов, строки одного города идут в порядке времени
+    """
+    # Разность накопленных сумм по строкам, отсортированным по городу (сортировка устойчивая).
+    # Из температур вычитается среднее города, чтобы накопленная сумма не росла с числом строк
+    valid = ~np.isnan(temp)
+    order = np.argsort(city_codes, kind='stable')
+    sorted_codes = city_codes[order]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        city_mean = (np.bincount(city_codes, weights=np.where(valid, temp, 0.0))
+                     / np.bincount(city_codes, weights=valid))
+    sums = np.zeros(len(temp) + 1)
+    np.cumsum(np.where(valid, temp - np.nan_to_num(city_mean)[city_codes], 0.0)[order], out=sums[1:])
+    counts = np.zeros(len(temp) + 1, dtype=np.int64)
+    np.cumsum(valid[order], out=counts[1:])
+    end = np.arange(1, len(temp) + 1)
+    start = np.maximum(end - window, np.searchsorted(sorted_codes, sorted_codes))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rolling = (sums[end] - sums[start]) / (counts[end] - counts[start])
+    del sums, counts, end, start
+    rolling += city_mean[sorted_codes]
+    moving_average = np.empty_like(rolling)
+    moving_average[order] = rolling
+    return moving_average
+
+
+def seasonal_moments(key: np.ndarray, temp: np.ndarray, size: int):
+    """
+    Число значений, среднее и std (ddof=1, как в pandas) температуры по ключам групп 0..size-1
+    """
+    # Суммы по ключу через bincount, std - по отклонениям от среднего (без потери точности на больших суммах)
+    valid = ~np.isnan(temp)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        count = np.bincount(key, weights=valid, minlength=size)
+        mean = np.bincount(key, weights=np.where(valid, temp, 0.0), minlength=size) / count
+        deviation = np.where(valid, temp - mean[key], 0.0)
+        np.square(deviation, out=deviation)
+        std = np.sqrt(np.bincount(key, weights=deviation, minlength=size) / (count - 1))
+    return count, mean, std
+
+
+def seasonal_table(season, city, mean, std) -> pd.DataFrame:
+    """
+    Таблица сезонных статистик для графиков: season (в порядке SEASON_ORDER), city, mean, std
+    """
+    seasonal_stats = pd.DataFrame({
+        'season': pd.Categorical(season, categories=SEASON_ORDER, ordered=True),
+        'city': city, 'mean': mean, 'std': std})
+    return seasonal_stats.sort_values(['season', 'city'], kind='stable', ignore_index=True)
+
+
+def analyze(data: pd.DataFrame, window: int = WINDOW):
+    """
+    Скользящее среднее за window дней по каждому городу, сезонные среднее и std по городу
+    и признак аномалии (отклонение от сезонного среднего больше 2 std) за один векторный проход.
+
+    Порядок строк data сохраняется, внутри города строки считаются упорядоченными по времени.
+    Возвращает (data с колонками moving_average, mean, std, anomaly; таблица season, city, mean, std)
+    """
+    city_codes, cities = pd.factorize(data['city'], sort=True)
+    season_codes, seasons = pd.factorize(data['season'], sort=True)
+    temp = data['temperature'].to_numpy(dtype=np.float64)
+
+    # Сезонные статистики по ключу (город, сезон)
+    key = city_codes * len(seasons) + season_codes
+    count, mean, std = seasonal_moments(key, temp, len(cities) * len(seasons))
+
+    moving_average = rolling_mean(city_codes, temp, window)
+
+    row_mean, row_std = mean[key], std[key]
+    result = data.assign(moving_average=moving_average, mean=row_mean, std=row_std,
+                         anomaly=np.abs(temp - row_mean) > 2 * row_std)
+
+    observed = np.flatnonzero(count)
+    seasonal_stats = seasonal_table(seasons[observed % len(seasons)], cities[observed // len(seasons)],
+                                    mean[observed], std[observed])
+    return result, seasonal_stats
@@ -1,22 +1,138 @@
+import asyncio
+import hashlib
+import os
+import tempfile
 import streamlit as st
 import pandas as pd
-import requests
 import plotly.graph_objects as go
+import loader
+import parallel
+import streaming
+from weather_client import WeatherClient, WeatherError
+
+# Сколько загруженных наборов данных держать в кэше и как долго (сек).
+# Сверх лимита вытесняется давно не использованный набор
+DATA_CACHE_MAX_ENTRIES = int(os.getenv("DATA_CACHE_MAX_ENTRIES", 3))
+DATA_CACHE_TTL = float(os.getenv("DATA_CACHE_TTL", 3600))
+# Графики по городам (на все наборы данных)
+CHART_CACHE_MAX_ENTRIES = int(os.getenv("CHART_CACHE_MAX_ENTRIES", 50))
+# Каталог файлов на сервере, доступных для потокового анализа (другие пути не открываются),
+# и каталог результатов анализа (по одному файлу на исходный файл)
+STREAM_DATA_DIR = os.path.realpath(os.getenv("STREAM_DATA_DIR", os.path.dirname(os.path.abspath(__file__))))
+STREAM_OUTPUT_DIR = os.getenv("STREAM_OUTPUT_DIR", os.path.join(tempfile.gettempdir(), "weather_analysis"))
+
+
+# Хэш содержимого загруженного файла; считается один раз на загрузку и хранится в сессии
+def file_digest(uploaded_file):
+    digests = st.session_state.setdefault("file_digests", {})
+    if uploaded_file.file_id not in digests:
+        digests.clear()
+        content = uploaded_file.getbuffer()
+        digests[uploaded_file.file_id] = hashlib.blake2b(content, digest_size=16).hexdigest()
+    return digests[uploaded_file.file_id]
+
+
+# Разбор файла (CSV, Parquet или Feather) с явными типами колонок. Кэш общий для сессий и не копирует
+# результат (ключ - хэш файла, сам файл в ключ не входит), поэтому возвращаемые таблицы не изменяются
+@st.cache_resource(max_entries=DATA_CACHE_MAX_ENTRIES, ttl=DATA_CACHE_TTL, show_spinner="Чтение файла...")
+def load_data(digest, _uploaded_file):
+    _uploaded_file.seek(0)
+    data = loader.load_data(_uploaded_file)
+    return data, data['city'].unique()
+
+
+# Скользящее среднее, сезонные статистики и аномалии (один проход по всем городам).
+# Большие наборы данных делятся по городам между ANALYSIS_WORKERS процессами
+@st.cache_resource(max_entries=DATA_CACHE_MAX_ENTRIES, ttl=DATA_CACHE_TTL, show_spinner="Анализ данных...")
+def analyze_data(digest, _data):
+    return parallel.analyze_parallel(_data, parallel.ANALYSIS_WORKERS)
+
+
+# Средняя температура по сезонам
+@st.cache_resource(max_entries=DATA_CACHE_MAX_ENTRIES, ttl=DATA_CACHE_TTL)
+def seasons_chart(digest, _seasonal_stats):
+    fig = go.Figure()
+    for city_ in _seasonal_stats['city'].unique():
+        city_data = _seasonal_stats[_seasonal_stats['city'] == city_]
+        fig.add_trace(go.Scatter(x=city_data['season'], y=city_data['mean'],
+                                 mode='lines+markers', name=city_))
+    fig.update_layout(title='Средняя температура по сезонам в разных городах',
+                      xaxis_title='Сезон', yaxis_title='Средняя температура (°C)',
+                      legend_title='Город', template='plotly_white')
+    return fig
+
+
+# График температуры города с аномалиями
+def city_chart(city_data, city):
+    city_anomalies = city_data[city_data['anomaly']]
 
-
-# Функция для расчета скользящего среднего за 30 дней
-def moving_avg(group):
-    group['moving_average'] = group.groupby('city')['temperature'].transform(
-        lambda x: x.rolling(window=30, min_periods=1).mean())
-    return group
-
-
-# Функция для вычисления сезонных статистик и выделения аномалий
-def season_stats(group):
-    stats = group.groupby(['season', 'city'])['temperature'].agg(['mean', 'std']).reset_index()
-    group = group.merge(stats, on=['season', 'city'], suffixes=('', '_seasonal'))
-    group['anomaly'] = abs(group['temperature'] - group['mean']) > 2 * group['std']
-    return group
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=city_data['timestamp'], y=city_data['moving_average'],
+                             mode='lines', name='Температура'))
+    fig.add_trace(go.Scatter(x=city_anomalies['timestamp'], y=city_anomalies['moving_average'],
+                             mode='markers', marker=dict(color='green', size=6), name='Аномалия'))
+    fig.update_layout(title=f'Температура и аномалии в {city}', xaxis_title='Год',
+                      yaxis_title='Температура (°C)', legend_title='Легенда',
+                      template='plotly_white')
+    return fig
+
+
+# Данные выбранного города и график температуры с аномалиями
+@st.cache_resource(max_entries=CHART_CACHE_MAX_ENTRIES, ttl=DATA_CACHE_TTL)
+def city_view(digest, city, _data):
+    city_data = _data[_data['city'] == city]
+    return city_data, city_chart(city_data, city)
+
+
+# Файлы CSV и Parquet в STREAM_DATA_DIR (ссылки, ведущие за пределы каталога, пропускаются)
+def data_files():
+    files = []
+    for entry in os.scandir(STREAM_DATA_DIR):
+        extension = os.path.splitext(entry.name)[1].lower()
+        if (entry.is_file() and loader.FORMATS.get(extension) in ('csv', 'parquet')
+                and os.path.dirname(os.path.realpath(entry.path)) == STREAM_DATA_DIR):
+            files.append(entry.name)
+    return sorted(files)
+
+
+# Потоковый анализ файла на сервере (файл может не помещаться в память).
+# Ключ кэша - путь, время изменения и размер файла. Результаты по строкам пишутся в Parquet,
+# один файл на исходный путь: повторный анализ изменённого файла перезаписывает прежний результат.
+# Возвращает также хэш версии файла - ключ кэша графиков
+@st.cache_resource(max_entries=DATA_CACHE_MAX_ENTRIES, ttl=DATA_CACHE_TTL,
+                   show_spinner="Потоковый анализ файла...")
+def stream_file(path, mtime, size):
+    os.makedirs(STREAM_OUTPUT_DIR, exist_ok=True)
+    key = hashlib.blake2b(path.encode(), digest_size=16).hexdigest()
+    digest = hashlib.blake2b(f"{path}:{mtime}:{size}".encode(), digest_size=16).hexdigest()
+    output = os.path.join(STREAM_OUTPUT_DIR, f"{key}.parquet")
+    # Результат пишется во временный файл своей версии и подменяется целиком,
+    # чтобы другие сессии не читали недописанный файл
+    temp = os.path.join(STREAM_OUTPUT_DIR, f"{key}.{digest}.tmp")
+    try:
+        seasonal_stats, anomalies = streaming.analyze_file(path, temp)
+        os.replace(temp, output)
+    finally:
+        if os.path.exists(temp):
+            os.remove(temp)
+    return seasonal_stats, anomalies, output, digest
+
+
+# Данные города из результатов потокового анализа (читаются только строки города).
+# Хэш версии исходного файла входит в ключ: результат по тому же пути мог быть перезаписан
+@st.cache_resource(max_entries=CHART_CACHE_MAX_ENTRIES, ttl=DATA_CACHE_TTL)
+def stream_city_view(output, digest, city):
+    city_data = pd.read_parquet(output, filters=[('city', '==', city)])
+    return city_data, city_chart(city_data, city)
+
+
+# Текущая погода в выбранном городе (при ошибке - WeatherError вместо ответа)
+async def fetch_weather(city, api_key):
+    async with WeatherClient(api_key) as client:
+        try:
+            return await client.get_weather(city)
+        except WeatherError as e:
+            return e
 
 
 # Заголовок
@@ -24,62 +140,62 @@ st.title("Анализ погодных данных")
 
 # Загрузка данных
 st.header("Загрузка данных")
-df = st.file_uploader("Выберите CSV-файл", type=["csv"])
-
-if df is not None:
-    # Превью данных и выбор города
-    data = pd.read_csv(df)
-    st.write("Превью данных:")
-    st.dataframe(data, use_container_width=True)
-
-    st.title("Выбор города")
-    cities = data['city'].unique()
-    city = st.selectbox("Выберите город:", cities)
-
-    # Описательные статистики для выбранного города
-    data_groups = [group for _, group in data.groupby('city')]
-    data = pd.concat([moving_avg(group) for group in data_groups], ignore_index=True)
-    data = pd.concat([season_stats(group) for group in data_groups], ignore_index=True)
-
-    filtered_city = data[data['city'] == city]
+source = st.radio("Источник данных:", ["Загрузка файла", "Файл на сервере"], horizontal=True,
+                  help="Файл на сервере обрабатывается по частям и может быть больше оперативной памяти")
+seasonal_stats = None
+
+if source == "Загрузка файла":
+    df = st.file_uploader("Выберите файл с данными (CSV, Parquet или Feather)",
+                          type=[extension.lstrip('.') for extension in loader.FORMATS])
+    if df is not None:
+        # Превью данных и выбор города.
+        # Разбор, анализ и графики кэшируются по хэшу файла, поэтому при смене города
+        # или отправке формы скрипт не обрабатывает данные заново
+        digest = file_digest(df)
+        try:
+            data, cities = load_data(digest, df)
+        except ValueError as e:
+            st.error(f"Не удалось прочитать файл: {e}")
+            st.stop()
+        st.write("Превью данных:")
+        st.dataframe(data, use_container_width=True)
+
+        st.title("Выбор города")
+        city = st.selectbox("Выберите город:", cities)
+
+        data, seasonal_stats = analyze_data(digest, data)
+        filtered_city, fig2 = city_view(digest, city, data)
+else:
+    name = st.selectbox("Файл CSV или Parquet на сервере:", data_files(), index=None,
+                        help=f"Файлы из каталога {STREAM_DATA_DIR} (STREAM_DATA_DIR)")
+    if name is not None:
+        path = os.path.join(STREAM_DATA_DIR, name)
+        # Два потоковых прохода по файлу, в памяти только часть файла и сезонные статистики
+        try:
+            file_stat = os.stat(path)
+            seasonal_stats, anomalies, output, digest = stream_file(path, file_stat.st_mtime,
+                                                                    file_stat.st_size)
+        except FileNotFoundError:
+            st.error(f"Файл {name} не найден")
+            st.stop()
+        except ValueError as e:
+            st.error(f"Не удалось прочитать файл: {e}")
+            st.stop()
+        st.write("Строк и аномалий по городам:")
+        st.dataframe(anomalies, use_container_width=True)
+
+        st.title("Выбор города")
+        cities = anomalies.index
+        city = st.selectbox("Выберите город:", cities)
+        filtered_city, fig2 = stream_city_view(output, digest, city)
+
+if seasonal_stats is not None:
     st.write(f"Вы выбрали: {city}")
     st.dataframe(filtered_city, use_container_width=True)
 
     # Графики
-    # Подготовка данных для первого графика
-    season_order = ['autumn', 'winter', 'spring', 'summer']
-    data['season'] = pd.Categorical(data['season'], categories=season_order, ordered=True)
-    seasonal_stats = (data.groupby(['season', 'city'], observed=False)
-                      ['temperature'].agg(['mean', 'std']).reset_index())
-
-    # Средняя температура по сезонам
-    fig1 = go.Figure()
-    for city_ in seasonal_stats['city'].unique():
-        city_data = seasonal_stats[seasonal_stats['city'] == city_]
-        fig1.add_trace(go.Scatter(x=city_data['season'], y=city_data['mean'],
-                                  mode='lines+markers', name=city_))
-        fig1.update_layout(title='Средняя температура по сезонам в разных городах',
-                           xaxis_title='Сезон', yaxis_title='Средняя температура (°C)',
-                           legend_title='Город', template='plotly_white')
-
-    # Подготовка данных для второго графика
-    data['timestamp'] = pd.to_datetime(data['timestamp'])
-    city_data = data[data['city'] == city]
-    city_anomalies = city_data[city_data['anomaly']]
-
-    # Температуры и аномалии
-    fig2 = go.Figure()
-    fig2.add_trace(go.Scatter(x=city_data['timestamp'], y=city_data['moving_average'],
-                              mode='lines', name='Температура'))
-    fig2.add_trace(go.Scatter(x=city_anomalies['timestamp'], y=city_anomalies['moving_average'],
-                              mode='markers', marker=dict(color='green', size=6), name='Аномалия'))
-
-    fig2.update_layout(title=f'Температура и аномалии в {city}', xaxis_title='Год',
-                       yaxis_title='Температура (°C)', legend_title='Легенда',
-                       template='plotly_white')
-
     st.title("Визуализации")
-    st.plotly_chart(fig1)
+    st.plotly_chart(seasons_chart(digest, seasonal_stats))
     st.plotly_chart(fig2)
 
     # Сохранение API-ключа
@@ -98,11 +214,9 @@ if df is not None:
 
     # Если введён API-ключ
     if st.session_state["api_key"]:
-        # Запрос текущей погоды в выбранном городе
-        url = f"http://api.openweathermap.org/data/2.5/weather?q={city}&appid={api_key}&units=metric"
-        response = requests.get(url)
-        if response.status_code == 200:
-            weather_data = response.json()
+        # Запрос текущей погоды в выбранном городе (ответы кэшируются на время WEATHER_CACHE_TTL)
+        weather_data = asyncio.run(fetch_weather(city, st.session_state["api_key"]))
+        if not isinstance(weather_data, WeatherError):
             curr_temp = weather_data['main']['temp']
             st.success(f"Погода в {city}:")
             st.write(f"Температура: {weather_data['main']['temp']} °C")
@@ -121,11 +235,13 @@ if df is not None:
             else:
                 st.success(f"Температура в пределах нормы для сезона. Ожидаемая: {mean_temp:.2f}°C")
 
-        elif response.status_code == 401:
-            st.error(f"{response.json()}")
+        elif weather_data.status == 401:
+            st.error(weather_data.message)
+        elif weather_data.status is None:
+            st.error(f"API недоступен: {weather_data.message}")
         else:
-            st.error(f"Код ошибки {response.status_code}")
+            st.error(f"Код ошибки {weather_data.status}")
     else:
         st.warning("Пожалуйста, введите API-ключ.")
 else:
-    st.write("Пожалуйста, загрузите CSV-файл.")
+    st.write("Пожалуйста, загрузите файл с данными.")
@@ -0,0 +1,98 @@
+"""
+Сравнение analytics.analyze с прежним расчётом из app.py (moving_avg + season_stats по группам городов)
+на temperature_data.csv, размноженном до нужного числа строк.
+
+Копии данных получают новые названия городов ("Moscow#3"), поэтому число групп растёт вместе с объёмом.
+Город и сезон хранятся как category; для 100 млн строк новому расчёту нужно ~12 ГБ памяти,
+прежнему - в несколько раз больше (на небольшой машине запускайте с --rows или --skip-legacy).
+
+    python benchmark_analytics.py                      # 100 млн строк
+    python benchmark_analytics.py --rows 5000000
+    python benchmark_analytics.py --skip-legacy        # только новый расчёт
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from analytics import analyze
+
+
+# Прежний расчёт из app.py
+def moving_avg(group):
+    group['moving_average'] = group.groupby('city', observed=True)['temperature'].transform(
+        lambda x: x.rolling(window=30, min_periods=1).mean())
+    return group
+
+
+def season_stats(group):
+    stats = (group.groupby(['season', 'city'], observed=True)
+             ['temperature'].agg(['mean', 'std']).reset_index())
+    group = group.merge(stats, on=['season', 'city'], suffixes=('', '_seasonal'))
+    group['anomaly'] = abs(group['temperature'] - group['mean']) > 2 * group['std']
+    return group
+
+
+def legacy_analyze(data):
+    data_groups = [group for _, group in data.groupby('city', observed=True)]
+    data = pd.concat([moving_avg(group) for group in data_groups], ignore_index=True)
+    data = pd.concat([season_stats(group) for group in data_groups], ignore_index=True)
+    return data
+
+
+def scale_data(path, rows):
+    """
+    Исходные данные, повторённые до rows строк (последняя копия обрезается)
+    """
+    base = pd.read_csv(path)
+    copies = -(-rows // len(base))
+    cities = base['city'].unique()
+    city_codes = pd.Categorical(base['city'], categories=cities).codes.astype(np.int64)
+    codes = (city_codes + len(cities) * np.arange(copies)[:, None]).ravel()[:rows]
+    names = np.array([f"{city}#{copy}" for copy in range(copies) for city in cities])
+    return pd.DataFrame({
+        'city': pd.Categorical.from_codes(codes, categories=names),
+        'timestamp': np.tile(pd.to_datetime(base['timestamp']).to_numpy(), copies)[:rows],
+        'temperature': np.tile(base['temperature'].to_numpy(), copies)[:rows],
+        'season': pd.Categorical(np.tile(base['season'].to_numpy(), copies)[:rows])})
+
+
+def timed(label, func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - started
+    print(f"{label}: {elapsed:.2f} сек")
+    return result, elapsed
+
+
+def check_equal(new, legacy):
+    """
+    Совпадение результатов (прежний расчёт меняет порядок строк - сравниваем по городу и дате)
+    """
+    columns = ['moving_average', 'mean', 'std']
+    new = new.sort_values(['city', 'timestamp'], kind='stable', ignore_index=True)
+    legacy = legacy.sort_values(['city', 'timestamp'], kind='stable', ignore_index=True)
+    np.testing.assert_allclose(new[columns].to_numpy(), legacy[columns].to_numpy(), rtol=1e-9, atol=1e-9)
+    assert (new['anomaly'].to_numpy() == legacy['anomaly'].to_numpy()).all()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк расчёта скользящего среднего и аномалий")
+    parser.add_argument("--csv", default="temperature_data.csv")
+    parser.add_argument("--rows", type=int, default=100_000_000)
+    parser.add_argument("--skip-legacy", action="store_true", help="Не запускать прежний расчёт")
+    args = parser.parse_args()
+
+    data, _ = timed(f"Подготовка {args.rows:,} строк", scale_data, args.csv, args.rows)
+    (new, _), new_time = timed("analytics.analyze", analyze, data)
+    if args.skip_legacy:
+        return
+
+    legacy, legacy_time = timed("прежний расчёт", legacy_analyze, data)
+    check_equal(new, legacy)
+    print(f"Результаты совпадают, ускорение x{legacy_time / new_time:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""
+Сравнение последовательного analytics.analyze с parallel.analyze_parallel при разном числе процессов.
+Данные - temperature_data.csv, размноженный до нужного числа строк (каждая копия - новые 15 городов).
+
+    python benchmark_parallel.py --rows 10000000 --workers 2 4 8
+"""
+import argparse
+import os
+
+import numpy as np
+
+import parallel
+from analytics import analyze
+from benchmark_analytics import scale_data, timed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк анализа в пуле процессов")
+    parser.add_argument("--csv", default="temperature_data.csv")
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    data, _ = timed(f"Подготовка {args.rows:,} строк", scale_data, args.csv, args.rows)
+    print(f"Городов: {data['city'].nunique()}")
+    (serial, _), serial_time = timed("последовательно", analyze, data)
+
+    parallel.PARALLEL_MIN_ROWS = 0
+    for workers in sorted(set(args.workers)):
+        (result, _), elapsed = timed(f"процессов: {workers}", parallel.analyze_parallel, data, workers)
+        for column in ('moving_average', 'mean', 'std'):
+            np.testing.assert_allclose(result[column].to_numpy(), serial[column].to_numpy(), rtol=1e-9)
+        assert (result['anomaly'] == serial['anomaly']).all()
+        print(f"  ускорение x{serial_time / elapsed:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Чтение температурных данных с явными типами: city и season - category, temperature - float32,
+timestamp - дата уже при разборе. Поддерживаются CSV, Parquet и Feather.
+
+Конвертация CSV в колоночный формат (тип по расширению результата):
+    python loader.py temperature_data.csv temperature_data.parquet
+"""
+import argparse
+import os
+
+import pandas as pd
+
+# Колонки и их типы (timestamp разбирается как дата)
+COLUMNS = ['city', 'timestamp', 'temperature', 'season']
+DTYPES = {'city': 'category', 'temperature': 'float32', 'season': 'category'}
+
+# Поддерживаемые форматы по расширению файла
+FORMATS = {'.csv': 'csv', '.parquet': 'parquet', '.pq': 'parquet', '.feather': 'feather'}
+
+# Многопоточный разбор CSV через pyarrow, без него - стандартный парсер pandas
+try:
+    import pyarrow  # noqa: F401
+    CSV_ENGINE = 'pyarrow'
+except ImportError:
+    CSV_ENGINE = 'c'
+
+
+def file_format(name):
+    """
+    Формат файла по расширению (ValueError для неподдерживаемых)
+    """
+    extension = os.path.splitext(name)[1].lower()
+    if extension not in FORMATS:
+        raise ValueError(f"Неподдерживаемый формат файла: {name}")
+    return FORMATS[extension]
+
+
+def _with_types(data):
+    # Приведение типов для колоночных файлов, записанных без них (например, другой программой)
+    missing = set(COLUMNS) - set(data.columns)
+    if missing:
+        raise ValueError(f"В данных нет колонок: {', '.join(sorted(missing))}")
+    data = data.astype(DTYPES)
+    if not pd.api.types.is_datetime64_any_dtype(data['timestamp']):
+        data['timestamp'] = pd.to_datetime(data['timestamp'])
+    return data
+
+
+def load_data(source, name=None):
+    """
+    Температурные данные из файла или файлового объекта (например, загрузки Streamlit).
+    Формат определяется по name, а если он не задан - по имени source
+    """
+    fmt = file_format(name or getattr(source, 'name', source))
+    if fmt == 'csv' and CSV_ENGINE == 'pyarrow':
+        # Даты разбирает сам pyarrow (parse_dates переводил бы их через объекты Python)
+        return pd.read_csv(source, dtype={**DTYPES, 'timestamp': 'datetime64[s]'}, engine='pyarrow')
+    if fmt == 'csv':
+        return pd.read_csv(source, dtype=DTYPES, parse_dates=['timestamp'])
+    if fmt == 'parquet':
+        return _with_types(pd.read_parquet(source))
+    return _with_types(pd.read_feather(source))
+
+
+def convert(source, target):
+    """
+    Сохранение данных source в колоночном формате target (Parquet или Feather) с типами
+    """
+    data = load_data(source)
+    fmt = file_format(target)
+    if fmt == 'parquet':
+        data.to_parquet(target, index=False)
+    elif fmt == 'feather':
+        data.to_feather(target)
+    else:
+        raise ValueError(f"Результат должен быть Parquet или Feather: {target}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Конвертация температурных данных в Parquet/Feather")
+    parser.add_argument("source", nargs="?", default="temperature_data.csv")
+    parser.add_argument("target", nargs="?", default="temperature_data.parquet")
+    args = parser.parse_args()
+    convert(args.source, args.target)
+    print(f"{args.source} -> {args.target} ({os.path.getsize(args.target) / 2 ** 20:.1f} МБ)")
+
+
+if __name__ == "__main__":
+    main()
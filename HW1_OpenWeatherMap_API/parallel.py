@@ -0,0 +1,140 @@
+"""
+Параллельный анализ по городам в пуле процессов.
+
+Строки сортируются по городу и копируются в разделяемую память (коды городов и сезонов, температура),
+каждая задача считает свой диапазон городов и пишет результаты в разделяемые выходные массивы.
+DataFrame между процессами не передаются, из задач возвращаются только сезонные статистики.
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from analytics import WINDOW, analyze, rolling_mean, seasonal_moments, seasonal_table
+
+# Число процессов (по умолчанию - по числу ядер) и минимум строк, с которого пул окупает запуск
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", os.cpu_count() or 1))
+PARALLEL_MIN_ROWS = int(os.getenv("PARALLEL_MIN_ROWS", 1_000_000))
+
+# Задач на процесс: города разной длины выравниваются по нагрузке
+TASKS_PER_WORKER = 4
+
+# Процессы запускаются заново, а не через fork: Streamlit и aiohttp держат потоки и цикл событий,
+# копия которых в дочернем процессе может зависнуть на блокировке
+MP_CONTEXT = multiprocessing.get_context("spawn")
+
+# Массивы в разделяемой памяти: входные и выходные
+_INPUTS = {'city': np.int64, 'season': np.int64, 'temperature': np.float64}
+_OUTPUTS = {'moving_average': np.float64, 'mean': np.float64, 'std': np.float64, 'anomaly': np.bool_}
+
+
+class SharedArrays:
+    """
+    Набор одномерных массивов длины n в одном блоке разделяемой памяти.
+    В задачах открывается по имени блока без копирования
+    """
+
+    def __init__(self, dtypes, n, name=None):
+        self.dtypes = dtypes
+        self.n = n
+        size = sum(np.dtype(dtype).itemsize for dtype in dtypes.values()) * n
+        self.shm = shared_memory.SharedMemory(name=name, create=name is None, size=max(size, 1))
+        self.arrays = {}
+        offset = 0
+        for column, dtype in dtypes.items():
+            self.arrays[column] = np.ndarray(n, dtype=dtype, buffer=self.shm.buf, offset=offset)
+            offset += np.dtype(dtype).itemsize * n
+
+    @property
+    def spec(self):
+        return self.shm.name, self.dtypes, self.n
+
+    @classmethod
+    def attach(cls, spec):
+        name, dtypes, n = spec
+        return cls(dtypes, n, name)
+
+    def close(self):
+        self.arrays = {}
+        self.shm.close()
+
+    def unlink(self):
+        self.close()
+        self.shm.unlink()
+
+
+def _analyze_range(inputs_spec, outputs_spec, start, end, first_city, n_cities, n_seasons, window):
+    # Задача процесса: строки start:end - города first_city..first_city + n_cities - 1
+    inputs, outputs = SharedArrays.attach(inputs_spec), SharedArrays.attach(outputs_spec)
+    try:
+        city_codes = inputs.arrays['city'][start:end] - first_city
+        temp = inputs.arrays['temperature'][start:end]
+        key = city_codes * n_seasons + inputs.arrays['season'][start:end]
+        count, mean, std = seasonal_moments(key, temp, n_cities * n_seasons)
+
+        outputs.arrays['moving_average'][start:end] = rolling_mean(city_codes, temp, window)
+        outputs.arrays['mean'][start:end] = row_mean = mean[key]
+        outputs.arrays['std'][start:end] = row_std = std[key]
+        outputs.arrays['anomaly'][start:end] = np.abs(temp - row_mean) > 2 * row_std
+        return first_city, count, mean, std
+    finally:
+        inputs.close()
+        outputs.close()
+
+
+def _partition(bounds, tasks):
+    # Диапазоны городов с примерно равным числом строк: границы задач - на границах городов
+    targets = np.linspace(0, bounds[-1], tasks + 1)[1:-1]
+    cuts = np.unique(np.searchsorted(bounds, targets))
+    edges = np.concatenate(([0], cuts[(cuts > 0) & (cuts < len(bounds) - 1)], [len(bounds) - 1]))
+    return list(zip(edges[:-1], edges[1:]))
+
+
+def analyze_parallel(data: pd.DataFrame, workers: int = ANALYSIS_WORKERS, window: int = WINDOW):
+    """
+    То же, что analytics.analyze, но города обрабатываются в workers процессах.
+    При workers <= 1 или небольших данных (меньше PARALLEL_MIN_ROWS строк) - обычный analyze
+    """
+    if workers <= 1 or len(data) < PARALLEL_MIN_ROWS:
+        return analyze(data, window)
+
+    city_codes, cities = pd.factorize(data['city'], sort=True)
+    season_codes, seasons = pd.factorize(data['season'], sort=True)
+    order = np.argsort(city_codes, kind='stable')
+    # Начала строк городов в отсортированном порядке (последний элемент - число строк)
+    bounds = np.concatenate(([0], np.cumsum(np.bincount(city_codes, minlength=len(cities)))))
+
+    inputs = SharedArrays(_INPUTS, len(data))
+    outputs = SharedArrays(_OUTPUTS, len(data))
+    try:
+        inputs.arrays['city'][:] = city_codes[order]
+        inputs.arrays['season'][:] = season_codes[order]
+        inputs.arrays['temperature'][:] = data['temperature'].to_numpy(dtype=np.float64)[order]
+
+        size = len(cities) * len(seasons)
+        count, mean, std = np.zeros(size), np.full(size, np.nan), np.full(size, np.nan)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=MP_CONTEXT) as executor:
+            futures = [executor.submit(_analyze_range, inputs.spec, outputs.spec, bounds[first], bounds[last],
+                                       first, last - first, len(seasons), window)
+                       for first, last in _partition(bounds, workers * TASKS_PER_WORKER)]
+            for future in futures:
+                first_city, task_count, task_mean, task_std = future.result()
+                position = slice(first_city * len(seasons), first_city * len(seasons) + len(task_count))
+                count[position], mean[position], std[position] = task_count, task_mean, task_std
+
+        # Результаты - обратно в исходный порядок строк
+        columns = {}
+        for column, dtype in _OUTPUTS.items():
+            columns[column] = np.empty(len(data), dtype=dtype)
+            columns[column][order] = outputs.arrays[column]
+    finally:
+        inputs.unlink()
+        outputs.unlink()
+
+    observed = np.flatnonzero(count)
+    seasonal_stats = seasonal_table(seasons[observed % len(seasons)], cities[observed // len(seasons)],
+                                    mean[observed], std[observed])
+    return data.assign(**columns), seasonal_stats
@@ -0,0 +1,203 @@
+"""
+Потоковый анализ файлов, не помещающихся в память: CSV или Parquet читается частями по chunk_rows строк.
+
+Первый проход собирает сезонные среднее и std по городам (объединяемые онлайн-статистики Уэлфорда/Чана),
+второй - считает скользящее среднее (хвосты окон городов переносятся между частями) и отмечает аномалии.
+В памяти одновременно только одна часть файла и по window - 1 последних строк каждого города.
+
+    python streaming.py archive.csv --output result.parquet --chunk-rows 1000000
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+import loader
+from analytics import WINDOW, rolling_mean, seasonal_table
+
+# Строк в одной части файла
+CHUNK_ROWS = int(os.getenv("CHUNK_ROWS", 1_000_000))
+
+
+def iter_chunks(source, chunk_rows=CHUNK_ROWS, columns=None, name=None):
+    """
+    Части файла (CSV или Parquet) в виде DataFrame с типами из loader.
+    columns - только нужные колонки (из loader.COLUMNS)
+    """
+    fmt = loader.file_format(name or getattr(source, 'name', source))
+    columns = columns or loader.COLUMNS
+    dtypes = {column: dtype for column, dtype in loader.DTYPES.items() if column in columns}
+    if fmt == 'csv':
+        parse_dates = ['timestamp'] if 'timestamp' in columns else False
+        yield from pd.read_csv(source, usecols=columns, dtype=dtypes, parse_dates=parse_dates,
+                               chunksize=chunk_rows)
+    elif fmt == 'parquet':
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=chunk_rows, columns=columns):
+            yield batch.to_pandas().astype(dtypes)
+    else:
+        raise ValueError(f"Потоковое чтение поддерживается для CSV и Parquet: {source}")
+
+
+class SeasonStats:
+    """
+    Число значений, среднее и сумма квадратов отклонений (M2) по парам (город, сезон).
+    Накопители частей объединяются формулой Чана, поэтому порядок частей не важен
+    """
+
+    def __init__(self, table=None):
+        self.table = table if table is not None else pd.DataFrame(
+            {'count': [], 'mean': [], 'm2': []},
+            index=pd.MultiIndex.from_arrays([[], []], names=['city', 'season']))
+
+    @classmethod
+    def from_chunk(cls, chunk):
+        grouped = (chunk.dropna(subset=['temperature'])
+                   .astype({'temperature': np.float64})
+                   .groupby(['city', 'season'], observed=True)['temperature'])
+        table = grouped.agg(['count', 'mean', 'var'])
+        table['m2'] = table.pop('var').fillna(0.0) * (table['count'] - 1)
+        # Категории частей различаются, поэтому уровни индекса - обычные строки
+        table.index = pd.MultiIndex.from_arrays(
+            [table.index.get_level_values(level).astype(str) for level in ('city', 'season')],
+            names=['city', 'season'])
+        return cls(table)
+
+    def merge(self, other):
+        index = self.table.index.union(other.table.index)
+        a = self.table.reindex(index, fill_value=0.0)
+        b = other.table.reindex(index, fill_value=0.0)
+        count = a['count'] + b['count']
+        delta = b['mean'] - a['mean']
+        mean = a['mean'] + delta * b['count'] / count
+        m2 = a['m2'] + b['m2'] + delta ** 2 * a['count'] * b['count'] / count
+        return SeasonStats(pd.DataFrame({'count': count, 'mean': mean, 'm2': m2}, index=index))
+
+    def update(self, chunk):
+        self.table = self.merge(SeasonStats.from_chunk(chunk)).table
+
+    def std(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.sqrt(self.table['m2'] / (self.table['count'] - 1))
+
+    def seasonal_stats(self):
+        """
+        Таблица в формате analytics.analyze: season, city, mean, std
+        """
+        return seasonal_table(self.table.index.get_level_values('season'),
+                              self.table.index.get_level_values('city'),
+                              self.table['mean'].to_numpy(), self.std().to_numpy())
+
+
+class RollingWindow:
+    """
+    Скользящее среднее по частям файла: для каждого города хранятся window - 1 последних температур,
+    которые подставляются перед строками города в следующей части
+    """
+
+    def __init__(self, window=WINDOW):
+        self.window = window
+        self.tails = {}
+
+    def apply(self, cities, temp):
+        codes, uniques = pd.factorize(cities)
+        uniques = uniques.astype(str)
+        carried = [self.tails.get(city, np.empty(0)) for city in uniques]
+        carry_codes = np.repeat(np.arange(len(uniques)), [len(tail) for tail in carried])
+        all_codes = np.concatenate([carry_codes, codes])
+        all_temp = np.concatenate([*carried, temp])
+        moving_average = rolling_mean(all_codes, all_temp, self.window)[len(carry_codes):]
+
+        # Новые хвосты: последние window - 1 строк каждого города (перенос + текущая часть)
+        order = np.argsort(all_codes, kind='stable')
+        sorted_codes = all_codes[order]
+        group_end = np.searchsorted(sorted_codes, sorted_codes, side='right')
+        keep = group_end - np.arange(len(order)) < self.window
+        boundaries = np.searchsorted(sorted_codes[keep], np.arange(1, len(uniques)))
+        for city, tail in zip(uniques, np.split(all_temp[order][keep], boundaries)):
+            self.tails[city] = tail
+        return moving_average
+
+
+def collect_stats(source, chunk_rows=CHUNK_ROWS, name=None):
+    """
+    Первый проход: сезонные статистики по всему файлу
+    """
+    stats = SeasonStats()
+    for chunk in iter_chunks(source, chunk_rows, ['city', 'temperature', 'season'], name):
+        stats.update(chunk)
+    return stats
+
+
+def iter_analyzed(source, stats, chunk_rows=CHUNK_ROWS, window=WINDOW, name=None):
+    """
+    Второй проход: части файла с колонками moving_average, mean, std, anomaly (как у analytics.analyze)
+    """
+    rolling = RollingWindow(window)
+    index = stats.table.index
+    mean, std = stats.table['mean'].to_numpy(), stats.std().to_numpy()
+    for chunk in iter_chunks(source, chunk_rows, name=name):
+        temp = chunk['temperature'].to_numpy(dtype=np.float64)
+        # Позиция пары (город, сезон) в статистиках - по кодам категорий части
+        city, season = chunk['city'].cat, chunk['season'].cat
+        pairs = pd.MultiIndex.from_product([city.categories.astype(str), season.categories.astype(str)])
+        lookup = np.append(index.get_indexer(pairs), -1)
+        codes = np.where((city.codes < 0) | (season.codes < 0), -1,
+                         city.codes.astype(np.int64) * len(season.categories) + season.codes)
+        position = lookup[codes]
+        row_mean = np.where(position >= 0, mean[position], np.nan)
+        row_std = np.where(position >= 0, std[position], np.nan)
+        yield chunk.assign(moving_average=rolling.apply(chunk['city'], temp), mean=row_mean, std=row_std,
+                           anomaly=np.abs(temp - row_mean) > 2 * row_std)
+
+
+def analyze_file(source, output, chunk_rows=CHUNK_ROWS, window=WINDOW, name=None):
+    """
+    Оба прохода с записью результата в Parquet output.
+    Возвращает (таблица сезонных статистик, число строк и аномалий по городам)
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    stats = collect_stats(source, chunk_rows, name)
+    counts = []
+    writer = None
+    try:
+        for chunk in iter_analyzed(source, stats, chunk_rows, window, name):
+            counts.append(chunk.groupby('city', observed=True)['anomaly'].agg(['size', 'sum']))
+            # Категории записываются строками: у частей они разные
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            table = table.cast(pa.schema([pa.field(field.name, field.type.value_type)
+                                          if pa.types.is_dictionary(field.type) else field
+                                          for field in table.schema]))
+            if writer is None:
+                writer = pq.ParquetWriter(output, table.schema)
+            writer.write_table(table.cast(writer.schema))
+    finally:
+        if writer is not None:
+            writer.close()
+
+    anomalies = (pd.concat(counts).groupby(level=0).sum() if counts
+                 else pd.DataFrame({'size': [], 'sum': []}))
+    anomalies = anomalies.rename(columns={'size': 'rows', 'sum': 'anomalies'}).astype(int)
+    return stats.seasonal_stats(), anomalies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Потоковый анализ температурных данных (CSV или Parquet)")
+    parser.add_argument("source")
+    parser.add_argument("--output", default="analysis.parquet", help="Parquet с результатами по строкам")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--window", type=int, default=WINDOW)
+    args = parser.parse_args()
+
+    seasonal_stats, anomalies = analyze_file(args.source, args.output, args.chunk_rows, args.window)
+    with pd.option_context('display.max_rows', None, 'display.width', 120):
+        print(seasonal_stats.pivot(index='city', columns='season', values='mean').round(2))
+        print(anomalies)
+    print(f"Результаты по строкам: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
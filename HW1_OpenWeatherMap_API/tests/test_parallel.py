@@ -0,0 +1,23 @@
+import numpy as np
+import pandas as pd
+
+import parallel
+from analytics import analyze
+
+
+def test_analyze_parallel(monkeypatch):
+    # Анализ в пуле процессов совпадает с последовательным analytics.analyze
+    monkeypatch.setattr(parallel, "PARALLEL_MIN_ROWS", 0)
+    rng = np.random.default_rng(0)
+    cities = np.repeat([f"city{i}" for i in range(9)], rng.integers(10, 60, 9))
+    data = pd.DataFrame({
+        'city': pd.Categorical(cities),
+        'temperature': rng.normal(10, 8, len(cities)).astype(np.float32),
+        'season': pd.Categorical(rng.choice(['winter', 'spring', 'summer', 'autumn'], len(cities)))})
+
+    result, seasonal_stats = parallel.analyze_parallel(data, workers=2, window=5)
+    expected, expected_stats = analyze(data, 5)
+    for column in ('moving_average', 'mean', 'std'):
+        np.testing.assert_allclose(result[column], expected[column], rtol=1e-9)
+    assert (result['anomaly'] == expected['anomaly']).all()
+    np.testing.assert_allclose(seasonal_stats['mean'], expected_stats['mean'], rtol=1e-9)
@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import loader
+import streaming
+from analytics import analyze, rolling_mean
+from streaming import RollingWindow, SeasonStats
+
+WINDOW = 5
+
+
+@pytest.fixture
+def data():
+    """
+    Три города с разным числом строк, строки перемешаны между городами, часть температур пропущена
+    """
+    rng = np.random.default_rng(0)
+    cities = np.repeat(["Berlin", "Cairo", "Tokyo"], [40, 23, 7])
+    rng.shuffle(cities)
+    temperature = rng.normal(10, 8, len(cities))
+    temperature[rng.choice(len(cities), 5, replace=False)] = np.nan
+    seasons = rng.choice(['winter', 'spring', 'summer', 'autumn'], len(cities))
+    return pd.DataFrame({
+        'city': pd.Categorical(cities),
+        'timestamp': pd.date_range('2010-01-01', periods=len(cities)),
+        'temperature': temperature.astype(np.float32),
+        'season': pd.Categorical(seasons)})
+
+
+def chunks(data, size):
+    return [data.iloc[start:start + size] for start in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize("size", [1, 3, WINDOW, 16, 100])
+def test_rolling_window_carries_tails(data, size):
+    # Скользящее среднее по частям совпадает с расчётом по всему набору,
+    # в том числе когда часть короче окна или город пропускает несколько частей
+    rolling = RollingWindow(WINDOW)
+    moving_average = np.concatenate([
+        rolling.apply(chunk['city'], chunk['temperature'].to_numpy(dtype=np.float64))
+        for chunk in chunks(data, size)])
+
+    city_codes = pd.factorize(data['city'])[0]
+    expected = rolling_mean(city_codes, data['temperature'].to_numpy(dtype=np.float64), WINDOW)
+    np.testing.assert_allclose(moving_average, expected, rtol=1e-9)
+    assert all(len(tail) <= WINDOW - 1 for tail in rolling.tails.values())
+
+
+@pytest.mark.parametrize("size", [1, 7, 100])
+def test_season_stats_merge(data, size):
+    # Объединённые статистики частей совпадают с сезонными статистиками analytics.analyze,
+    # порядок объединения не важен
+    parts = [SeasonStats.from_chunk(chunk) for chunk in chunks(data, size)]
+    forward, backward = SeasonStats(), SeasonStats()
+    for part in parts:
+        forward = forward.merge(part)
+    for part in reversed(parts):
+        backward = backward.merge(part)
+
+    _, expected = analyze(data, WINDOW)
+    for stats in (forward, backward):
+        result = stats.seasonal_stats()
+        for column in ('season', 'city'):
+            assert result[column].astype(str).tolist() == expected[column].astype(str).tolist()
+        np.testing.assert_allclose(result['mean'], expected['mean'], rtol=1e-9)
+        np.testing.assert_allclose(result['std'], expected['std'], rtol=1e-9)
+
+
+def test_analyze_file(data, tmp_path):
+    # Два потоковых прохода по файлу дают то же, что analytics.analyze в памяти
+    source = tmp_path / "data.csv"
+    data.to_csv(source, index=False)
+    output = tmp_path / "result.parquet"
+    seasonal_stats, anomalies = streaming.analyze_file(str(source), str(output), chunk_rows=16, window=WINDOW)
+
+    expected, expected_stats = analyze(loader.load_data(str(source)), WINDOW)
+    np.testing.assert_allclose(seasonal_stats['mean'], expected_stats['mean'], rtol=1e-9)
+    np.testing.assert_allclose(seasonal_stats['std'], expected_stats['std'], rtol=1e-9)
+
+    result = pd.read_parquet(output)
+    for column in ('moving_average', 'mean', 'std'):
+        np.testing.assert_allclose(result[column], expected[column], rtol=1e-6)
+    assert (result['anomaly'] == expected['anomaly']).all()
+    assert anomalies['rows'].to_dict() == expected.groupby('city', observed=True).size().to_dict()
+    assert anomalies['anomalies'].sum() == expected['anomaly'].sum()
@@ -1,12 +1,21 @@
 import asyncio
 from aiogram import Bot, Dispatcher
-from config import BOT_TOKEN
+from aiohttp import web
+from config import (BOT_TOKEN, TEMP_TOKEN, REDIS_URL, WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_SECRET,
+                    WEBHOOK_HOST, WEBHOOK_PORT, MAX_CONCURRENT_UPDATES, MAX_PENDING_UPDATES)
 from handlers import setup_handlers
-from aiogram.fsm.storage.memory import MemoryStorage
 from middlewares import LoggingMiddleware
+from weather_client import WeatherClient
+from food_client import FoodClient
+from storage import ProfileStorage, create_storages
+from webhook import create_webhook_app
 
 bot = Bot(token=BOT_TOKEN)
-dp = Dispatcher(storage=MemoryStorage())
+# Хранилища состояний и профилей
+fsm_storage, profiles = create_storages(REDIS_URL)
+
+# Клиенты погоды и продуктов и хранилище профилей передаются в обработчики аргументами weather, food и profiles
+dp = Dispatcher(storage=fsm_storage, weather=WeatherClient(TEMP_TOKEN), food=FoodClient(), profiles=profiles)
 
 # Настраиваем middleware и обработчики
 dp.message.middleware(LoggingMiddleware())
@@ -22,18 +31,55 @@ async def set_bot_commands(bot: Bot):
         {"command": "log_water", "description": "Записать количество выпитой воды"},
         {"command": "log_food", "description": "Записать количество ккал"},
         {"command": "log_workout", "description": "Записать количество сожённых калорий на тренировке"},
-        {"command": "check_progress", "description": "Отобразить прогресс по воде и калориям"}
+        {"command": "check_progress", "description": "Отобразить прогресс по воде и калориям"},
+        {"command": "history", "description": "История по неделям"}
     ]
     await bot.set_my_commands(commands)
 
 
+# Закрытие сессий клиентов при остановке бота
+@dp.shutdown()
+async def on_shutdown(weather: WeatherClient, food: FoodClient, profiles: ProfileStorage):
+    await weather.close()
+    await food.close()
+    await profiles.close()
+
+
+# Запуск в режиме webhook: Telegram сам присылает обновления на WEBHOOK_URL + WEBHOOK_PATH
+async def run_webhook():
+    app = create_webhook_app(dp, bot, WEBHOOK_PATH, WEBHOOK_SECRET,
+                             MAX_CONCURRENT_UPDATES, MAX_PENDING_UPDATES)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, WEBHOOK_HOST, WEBHOOK_PORT).start()
+
+    workflow_data = {"dispatcher": dp, "bots": [bot], "bot": bot, **dp.workflow_data}
+    await dp.emit_startup(**workflow_data)
+    await bot.set_webhook(f"{WEBHOOK_URL.rstrip('/')}{WEBHOOK_PATH}", secret_token=WEBHOOK_SECRET,
+                          allowed_updates=dp.resolve_used_update_types(),
+                          max_connections=min(MAX_CONCURRENT_UPDATES, 100))
+    print(f"Бот запущен (webhook на порту {WEBHOOK_PORT})!")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        # Сначала дожидаемся принятых обновлений, затем закрываем клиенты и хранилища
+        await runner.cleanup()
+        await dp.emit_shutdown(**workflow_data)
+        await dp.storage.close()
+        await bot.session.close()
+
+
 # Основная функция запуска бота
 async def main():
     # Установка команд бота
     await set_bot_commands(bot)
 
-    # Запуск бота
+    # Запуск бота: webhook, если задан WEBHOOK_URL, иначе long polling
+    if WEBHOOK_URL:
+        await run_webhook()
+        return
     print("Бот запущен!")
+    await bot.delete_webhook()
     await dp.start_polling(bot)
 
 if __name__ == "__main__":
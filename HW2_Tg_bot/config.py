@@ -8,6 +8,20 @@ load_dotenv()
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 TEMP_TOKEN = os.getenv("TEMP_TOKEN")
 
+# Redis для состояний и профилей пользователей (если не задан - хранение в памяти процесса)
+REDIS_URL = os.getenv("REDIS_URL")
+
+# Режим webhook: публичный адрес бота (если не задан - long polling для разработки)
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", 8080))
+
+# Одновременно обрабатываемые обновления и предел очереди обновлений
+MAX_CONCURRENT_UPDATES = int(os.getenv("MAX_CONCURRENT_UPDATES", 50))
+MAX_PENDING_UPDATES = int(os.getenv("MAX_PENDING_UPDATES", 1000))
+
 if not BOT_TOKEN:
     raise ValueError("Переменная окружения BOT_TOKEN не установлена!")
 
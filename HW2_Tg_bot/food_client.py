@@ -0,0 +1,172 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import time
+from typing import Optional
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+# Адрес поиска OpenFoodFacts (можно заменить на локальную заглушку для тестов)
+FOOD_BASE_URL = os.getenv("FOOD_BASE_URL", "https://world.openfoodfacts.org")
+
+# Файл кэша продуктов и время жизни записи (сек)
+FOOD_CACHE_PATH = os.getenv("FOOD_CACHE_PATH", "food_cache.sqlite3")
+FOOD_CACHE_TTL = float(os.getenv("FOOD_CACHE_TTL", 7 * 24 * 3600))
+
+# Калорийность самых частых продуктов (ккал на 100 г) - без обращения к API
+OFFLINE_FOODS = {
+    "banana": 89, "банан": 89,
+    "apple": 52, "яблоко": 52,
+    "orange": 47, "апельсин": 47,
+    "bread": 265, "хлеб": 265,
+    "rice": 130, "рис": 130,
+    "buckwheat": 110, "гречка": 110,
+    "oatmeal": 68, "овсянка": 68,
+    "pasta": 131, "макароны": 131,
+    "potato": 77, "картофель": 77, "картошка": 77,
+    "egg": 155, "яйцо": 155,
+    "milk": 52, "молоко": 52,
+    "kefir": 51, "кефир": 51,
+    "cottage cheese": 121, "творог": 121,
+    "cheese": 356, "сыр": 356,
+    "chicken breast": 165, "куриная грудка": 165,
+    "beef": 250, "говядина": 250,
+    "salmon": 208, "лосось": 208,
+    "tomato": 18, "помидор": 18,
+    "cucumber": 15, "огурец": 15,
+    "chocolate": 546, "шоколад": 546,
+}
+
+
+def normalize_name(name: str) -> str:
+    """
+    Ключ продукта: нижний регистр, одиночные пробелы, "ё" -> "е"
+    """
+    return " ".join(name.lower().replace("ё", "е").split())
+
+
+def parse_product(product, key: str) -> Optional[dict]:
+    """
+    Название и калорийность продукта из ответа OpenFoodFacts.
+    None, если калорийность не указана: такой продукт не кэшируется, и при следующем запросе ищется снова
+    """
+    nutriments = product.get("nutriments") if isinstance(product, dict) else None
+    calories = nutriments.get("energy-kcal_100g") if isinstance(nutriments, dict) else None
+    try:
+        calories = float(calories)
+    except (TypeError, ValueError):
+        calories = None
+    if calories is None or not 0 <= calories < float("inf"):
+        logger.warning("OpenFoodFacts вернул продукт без калорийности для '%s'", key)
+        return None
+    name = product.get("product_name")
+    return {"name": name if isinstance(name, str) and name else "Неизвестно", "calories": calories}
+
+
+class FoodCache:
+    """
+    Кэш найденных продуктов в SQLite (переживает перезапуск бота).
+    Запросы выполняются в отдельном потоке, чтобы не блокировать цикл событий
+    """
+
+    def __init__(self, path: str = FOOD_CACHE_PATH, ttl: float = FOOD_CACHE_TTL):
+        self.ttl = ttl
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS products "
+                           "(key TEXT PRIMARY KEY, name TEXT, calories REAL, fetched_at REAL)")
+        self._conn.commit()
+        # Соединение одно на кэш, поэтому обращения к нему идут по очереди
+        self._lock = asyncio.Lock()
+
+    def _get(self, key: str) -> Optional[dict]:
+        row = self._conn.execute("SELECT name, calories FROM products WHERE key = ? AND fetched_at > ?",
+                                 (key, time.time() - self.ttl)).fetchone()
+        return {"name": row[0], "calories": row[1]} if row else None
+
+    def _set(self, key: str, food: dict) -> None:
+        self._conn.execute("INSERT OR REPLACE INTO products VALUES (?, ?, ?, ?)",
+                           (key, food["name"], food["calories"], time.time()))
+        self._conn.commit()
+
+    async def get(self, key: str) -> Optional[dict]:
+        async with self._lock:
+            return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key: str, food: dict) -> None:
+        async with self._lock:
+            await asyncio.to_thread(self._set, key, food)
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class FoodClient:
+    """
+    Поиск калорийности продукта: офлайн-таблица, затем кэш SQLite, затем OpenFoodFacts
+    (одна сессия aiohttp, таймаут, одновременные запросы одного продукта объединяются)
+    """
+
+    def __init__(self, base_url: str = FOOD_BASE_URL, timeout: float = 5,
+                 cache: Optional[FoodCache] = None):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.cache = cache or FoodCache()
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._inflight = {}
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=self.timeout)
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        self.cache.close()
+
+    async def get_food_info(self, product_name: str) -> Optional[dict]:
+        """
+        Название и калорийность продукта на 100 г ({'name', 'calories'}).
+        None, если продукт не найден или API недоступен
+        """
+        key = normalize_name(product_name)
+        if key in OFFLINE_FOODS:
+            return {"name": key, "calories": OFFLINE_FOODS[key]}
+
+        food = await self.cache.get(key)
+        if food is not None:
+            return food
+
+        # Тот же продукт уже ищут в другом чате - ждём этот запрос
+        if key in self._inflight:
+            return await asyncio.shield(self._inflight[key])
+        task = asyncio.create_task(self._fetch(key))
+        self._inflight[key] = task
+        try:
+            food = await asyncio.shield(task)
+        finally:
+            self._inflight.pop(key, None)
+        if food is not None:
+            await self.cache.set(key, food)
+        return food
+
+    async def _fetch(self, key: str) -> Optional[dict]:
+        params = {"action": "process", "search_terms": key, "json": "true", "page_size": 1}
+        try:
+            async with self._get_session().get(f"{self.base_url}/cgi/search.pl", params=params) as response:
+                if response.status != 200:
+                    logger.warning("OpenFoodFacts вернул код %s для '%s'", response.status, key)
+                    return None
+                data = await response.json(content_type=None)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            logger.warning("OpenFoodFacts недоступен: %r", e)
+            return None
+
+        products = data.get("products") if isinstance(data, dict) else None
+        if not isinstance(products, list) or not products:  # Проверяем, есть ли найденные продукты
+            return None
+        return parse_product(products[0], key)
@@ -1,3 +1,4 @@
+from datetime import date, timedelta
 from aiogram.types import ReplyKeyboardRemove, CallbackQuery
 from aiogram.filters import Command
 from aiogram.types import Message, InlineKeyboardButton, InlineKeyboardMarkup
@@ -5,17 +6,18 @@ from states import ProfileStates, WorkoutStates
 from aiogram.fsm.context import FSMContext
 from aiogram import Router
 import utils
-from config import TEMP_TOKEN
+from weather_client import WeatherClient
+from food_client import FoodClient
+from storage import ProfileStorage, week_key
 
 router = Router()
 
-# Данные пользователей
-users = {}
-users_data = {}
-
 # Заготовленные типы тренировок
 WORKOUT_TYPES = ["Кардио", "Силовая", "Йога", "Плавание"]
 
+# Сколько недель показывать в /history
+HISTORY_WEEKS = 4
+
 # Калории, сжигаемые за 1 минуту тренировки
 CALORIES_PER_MINUTE = {"Кардио": 10, "Силовая": 8, "Йога": 4, "Плавание": 14}
 
@@ -93,7 +95,8 @@ async def get_city(message: Message, state: FSMContext):
 
 # Норма калорий и воды
 @router.message(ProfileStates.calorie_goal_input)
-async def get_calorie_input(message: Message, state: FSMContext):
+async def get_calorie_input(message: Message, state: FSMContext, weather: WeatherClient,
+                            profiles: ProfileStorage):
     user_answer = message.text.strip().lower()
     user_data = await state.get_data()
     # Если нет цели по калориям, то расчёт по формуле
@@ -120,8 +123,8 @@ async def get_calorie_input(message: Message, state: FSMContext):
         weight=user_data['weight'],
         activity=user_data['activity'])
 
-    # Получаем текущую температуру в городе для доп расчёта воды
-    current_temp = utils.get_temp(user_data['city'], TEMP_TOKEN)
+    # Получаем текущую температуру в городе для доп расчёта воды (20, если API недоступен)
+    current_temp = await weather.get_temp(user_data['city'], default=20)
     if current_temp > 25:
         water_goal += 500
     await state.update_data(water_goal=water_goal)
@@ -130,14 +133,14 @@ async def get_calorie_input(message: Message, state: FSMContext):
     user_data = await state.get_data()
 
     user_id = message.from_user.id
-    users_data[user_id] = {
+    await profiles.save(user_id, {
         "weight": user_data['weight'],
         "height": user_data['height'],
         "age": user_data['age'],
         "activity": user_data['activity'],
         "city": user_data['city'],
         "calorie_goal": calorie_goal,
-        "water_goal": water_goal}
+        "water_goal": water_goal})
 
     await message.answer(
         f"Ваш профиль сохранен:\n"
@@ -154,14 +157,13 @@ async def get_calorie_input(message: Message, state: FSMContext):
 
 # Команда для просмотра текущего профиля
 @router.message(Command('show_profile'))
-async def show_profile(message: Message, state: FSMContext):
-    user_id = message.from_user.id
+async def show_profile(message: Message, state: FSMContext, profiles: ProfileStorage):
+    user_profile = await profiles.get(message.from_user.id)
     # Проверка, существует ли профиль
-    if user_id not in users_data:
+    if user_profile is None:
         await message.answer("Ваш профиль не найден. Сначала настройте профиль с помощью /set_profile.")
         return
 
-    user_profile = users_data[user_id]
     # Базовые данные профиля
     profile_info = (
         f"Ваш профиль\n\n"
@@ -173,12 +175,13 @@ async def show_profile(message: Message, state: FSMContext):
         f"Цель по калориям: {user_profile.get('calorie_goal', 'не указана')} ккал\n"
         f"Цель по воде: {user_profile.get('water_goal', 'не указана')} мл\n")
 
-    # Залогированные данные
+    # Залогированные данные за сегодня
+    today = await profiles.get_day(message.from_user.id)
     logged_info = (
-        f"\nЗалогированные показатели:\n"
-        f"Выпито воды: {user_profile.get('logged_water', 0)} мл\n"
-        f"Потреблено калорий: {user_profile.get('logged_calories', 0)} ккал\n"
-        f"Сожжено калорий (тренировки): {user_profile.get('burned_calories', 0)} ккал\n")
+        f"\nЗалогированные показатели за сегодня:\n"
+        f"Выпито воды: {today['logged_water']} мл\n"
+        f"Потреблено калорий: {today['logged_calories']} ккал\n"
+        f"Сожжено калорий (тренировки): {today['burned_calories']} ккал\n")
 
     # Отправляем пользователю
     await message.answer(profile_info + logged_info)
@@ -186,10 +189,10 @@ async def show_profile(message: Message, state: FSMContext):
 
 # Команда для логирования воды
 @router.message(Command('log_water'))
-async def log_water(message: Message, state: FSMContext):
-    user_id = message.from_user.id
+async def log_water(message: Message, state: FSMContext, profiles: ProfileStorage):
+    user_profile = await profiles.get(message.from_user.id)
     # Проверка, существует ли профиль
-    if user_id not in users_data or "water_goal" not in users_data[user_id]:
+    if user_profile is None or "water_goal" not in user_profile:
         await message.answer("Ваш профиль не найден. Сначала настройте профиль с помощью /set_profile.")
         return
 
@@ -199,7 +202,7 @@ async def log_water(message: Message, state: FSMContext):
 
 # Обработчик логирования воды
 @router.message(ProfileStates.logged_water)
-async def handle_logged_water(message: Message, state: FSMContext):
+async def handle_logged_water(message: Message, state: FSMContext, profiles: ProfileStorage):
     user_answer = message.text.strip().lower()
     if user_answer.isdigit():
         # Расчёт сколько осталось до выполнения нормы
@@ -208,13 +211,11 @@ async def handle_logged_water(message: Message, state: FSMContext):
 
         # Сохраняем количество выпитой воды
         user_id = message.from_user.id
-        if "logged_water" not in users_data[user_id]:
-            users_data[user_id]["logged_water"] = 0  # дефолтное значение
-        users_data[user_id]["logged_water"] += logged_water
-        logged_water = users_data[user_id]["logged_water"]
+        today = await profiles.log_event(user_id, "logged_water", logged_water)
+        logged_water = today["logged_water"]
 
-        # Сколько воды осталось выпить
-        water_goal = users_data[user_id]["water_goal"]
+        # Сколько воды осталось выпить (норма растёт после тренировок)
+        water_goal = (await profiles.get(user_id))["water_goal"] + today["extra_water"]
         water_left = round(water_goal - logged_water)
 
         if water_left <= 0:
@@ -230,10 +231,9 @@ async def handle_logged_water(message: Message, state: FSMContext):
 
 # Команда для логирования еды
 @router.message(Command('log_food'))
-async def log_food(message: Message, state: FSMContext):
-    user_id = message.from_user.id
+async def log_food(message: Message, state: FSMContext, profiles: ProfileStorage):
     # Проверка, существует ли профиль
-    if user_id not in users_data:
+    if await profiles.get(message.from_user.id) is None:
         await message.answer("Ваш профиль не найден. Сначала настройте профиль с помощью /set_profile.")
         return
 
@@ -244,13 +244,15 @@ async def log_food(message: Message, state: FSMContext):
 
 # Обработчик логирования еды
 @router.message(ProfileStates.logged_calories)
-async def handle_logged_calories(message: Message, state: FSMContext):
-    user_answer = message.text.strip().lower().split(' ')
+async def handle_logged_calories(message: Message, state: FSMContext, food: FoodClient,
+                                 profiles: ProfileStorage):
+    user_answer = message.text.strip().lower().split()
     user_clrs = user_answer[-1]
-    user_food = user_answer[0]
+    # Название продукта может состоять из нескольких слов: "куриная грудка 200"
+    user_food = " ".join(user_answer[:-1]) or user_answer[0]
     if user_clrs.isdigit():
         # Указываем дефолтное значение калорий, если api отвалиться (такое было при локальном тесте)
-        food_info = utils.get_food_info(user_food)
+        food_info = await food.get_food_info(user_food)
         if food_info is None:
             food_clrs = {'calories': 250}.get('calories')
         else:
@@ -260,10 +262,7 @@ async def handle_logged_calories(message: Message, state: FSMContext):
         logged_calories = (int(user_clrs) * food_clrs) / 100
         await state.update_data(logged_calories=logged_calories)
 
-        user_id = message.from_user.id
-        if "logged_calories" not in users_data[user_id]:
-            users_data[user_id]["logged_calories"] = 0  # дефолтное значение
-        users_data[user_id]["logged_calories"] += logged_calories
+        await profiles.log_event(message.from_user.id, "logged_calories", logged_calories)
 
         await message.answer(f"{user_food} - {food_clrs} ккал на 100 г.\n"
                              f"Записано {logged_calories} ккал.")
@@ -274,9 +273,8 @@ async def handle_logged_calories(message: Message, state: FSMContext):
 
 # Команда для логирования тренировок
 @router.message(Command('log_workout'))
-async def log_workout(message: Message, state: FSMContext):
-    user_id = message.from_user.id
-    if user_id not in users_data:
+async def log_workout(message: Message, state: FSMContext, profiles: ProfileStorage):
+    if await profiles.get(message.from_user.id) is None:
         await message.answer("Ваш профиль не найден. Сначала настройте профиль с помощью /set_profile.")
         return
 
@@ -307,7 +305,7 @@ async def choose_type(callback_query: CallbackQuery, state: FSMContext):
 
 # Обработчик выбора длительности тренировки
 @router.callback_query(lambda c: c.data.startswith("workout_duration"))
-async def choose_duration(callback_query: CallbackQuery, state: FSMContext):
+async def choose_duration(callback_query: CallbackQuery, state: FSMContext, profiles: ProfileStorage):
     duration = callback_query.data.split(":")[1]
     duration_mins = int(duration.split()[0])  # длительность тренировки в минутах
     user_data = await state.get_data()
@@ -319,15 +317,13 @@ async def choose_duration(callback_query: CallbackQuery, state: FSMContext):
     await state.update_data(burned_calories=burned_calories)
 
     user_id = callback_query.from_user.id
-    if "burned_calories" not in users_data[user_id]:
-        users_data[user_id]["burned_calories"] = 0  # дефолтное значение
-    users_data[user_id]["burned_calories"] += burned_calories
-    users_data[user_id]["water_goal"] += extra_water
-
-    # Данные по калориям для рекомендации по итогам тренировки
-    calorie_goal = users_data[user_id]["calorie_goal"]
-    logged_calories = users_data[user_id]['logged_calories']
-    balance_calories = round(logged_calories - burned_calories)
+    await profiles.log_event(user_id, "extra_water", extra_water)
+    today = await profiles.log_event(user_id, "burned_calories", burned_calories)
+
+    # Данные по калориям за сегодня для рекомендации по итогам тренировки
+    calorie_goal = (await profiles.get(user_id))["calorie_goal"]
+    logged_calories = today['logged_calories']
+    total_burned = today['burned_calories']
 
     # Формирование текста ответа
     result_text = (
@@ -336,8 +332,7 @@ async def choose_duration(callback_query: CallbackQuery, state: FSMContext):
         f"Рекомендуется выпить дополнительно воды: {extra_water} мл.\n")
 
     # Рекомендации
-    burned_calories = users_data[user_id]["burned_calories"]
-    balance_calories = round(logged_calories - burned_calories)
+    balance_calories = round(logged_calories - total_burned)
     if balance_calories <= calorie_goal:
         result_text += "Вы находитесь в балансе по калориям, так держать!"
     else:
@@ -352,10 +347,10 @@ async def choose_duration(callback_query: CallbackQuery, state: FSMContext):
 
 # Команда для проверки прогресса
 @router.message(Command('check_progress'))
-async def check_progress(message: Message, state: FSMContext):
-    user_id = message.from_user.id
+async def check_progress(message: Message, state: FSMContext, profiles: ProfileStorage):
+    user_profile = await profiles.get(message.from_user.id)
     # Проверка, существует ли профиль
-    if user_id not in users_data:
+    if user_profile is None:
         await message.answer("Ваш профиль не найден. Сначала настройте профиль с помощью /set_profile.")
         return
 
@@ -365,23 +360,26 @@ async def check_progress(message: Message, state: FSMContext):
         'logged_calories': "Количество потребленных калорий не найдено.\nСначала запишите их с помощью /log_food.",
         'burned_calories': "Количество сожжённых калорий не найдено.\nСначала запишите их с помощью /log_workout."}
 
-    # Проверяем наличие каждого ключа
+    # Суммы за сегодня (без перебора событий журнала)
+    today = await profiles.get_day(message.from_user.id)
+
+    # Проверяем, что каждый показатель записан
     for key, error_message in required_keys.items():
-        if key not in users_data[user_id]:
+        if not today[key]:
             await message.answer(error_message)
             return
 
     # Достаём данные по воде и калориям
-    logged_water = users_data[user_id]['logged_water']
-    water_goal = users_data[user_id]['water_goal']
+    logged_water = today['logged_water']
+    water_goal = user_profile['water_goal'] + today['extra_water']
     if round(water_goal - logged_water) <= 0:
         water_left = 0
     else:
         water_left = round(water_goal - logged_water)
 
-    logged_calories = users_data[user_id]['logged_calories']
-    calorie_goal = users_data[user_id]['calorie_goal']
-    burned_calories = users_data[user_id]['burned_calories']
+    logged_calories = today['logged_calories']
+    calorie_goal = user_profile['calorie_goal']
+    burned_calories = today['burned_calories']
     balance_calories = round(logged_calories - burned_calories)
 
     # Формирование текста ответа
@@ -415,6 +413,41 @@ async def check_progress(message: Message, state: FSMContext):
     await state.clear()
 
 
+# Команда для просмотра истории по неделям
+@router.message(Command('history'))
+async def history(message: Message, profiles: ProfileStorage):
+    user_id = message.from_user.id
+    user_profile = await profiles.get(user_id)
+    # Проверка, существует ли профиль
+    if user_profile is None:
+        await message.answer("Ваш профиль не найден. Сначала настройте профиль с помощью /set_profile.")
+        return
+
+    # Суммы за последние HISTORY_WEEKS недель (от текущей к более ранним)
+    today = date.today()
+    weeks = [week_key(today - timedelta(weeks=i)) for i in range(HISTORY_WEEKS)]
+    totals = await profiles.get_weeks(user_id, weeks)
+
+    # В среднем за день: текущая неделя ещё не закончилась
+    result_text = "История по неделям (в среднем за день):\n"
+    for i, (week, week_totals) in enumerate(zip(weeks, totals)):
+        days = today.isoweekday() if i == 0 else 7
+        water = round(week_totals['logged_water'] / days)
+        water_goal = round(user_profile['water_goal'] + week_totals['extra_water'] / days)
+        eaten = round(week_totals['logged_calories'] / days)
+        burned = round(week_totals['burned_calories'] / days)
+        result_text += (f"\n{week}{' (текущая)' if i == 0 else ''}:\n"
+                        f"- Вода: {water} мл из {water_goal} мл\n"
+                        f"- Калории: {eaten} ккал из {user_profile['calorie_goal']} ккал, сожжено {burned} ккал\n")
+
+    # Тренд потребления относительно прошлой недели
+    if totals[1]['logged_calories']:
+        change = (totals[0]['logged_calories'] / today.isoweekday()) / (totals[1]['logged_calories'] / 7) - 1
+        result_text += f"\nКалории к прошлой неделе: {change:+.0%}"
+
+    await message.answer(result_text)
+
+
 # Подключение обработчиков
 def setup_handlers(dp):
     dp.include_router(router)
@@ -0,0 +1,194 @@
+import json
+import time
+from abc import ABC, abstractmethod
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from aiogram.fsm.storage.base import BaseStorage
+from aiogram.fsm.storage.memory import MemoryStorage
+
+# Показатели дневного журнала: вода (мл), съеденные и сожжённые калории, доп. вода после тренировок (мл)
+LOG_FIELDS = ("logged_water", "logged_calories", "burned_calories", "extra_water")
+
+# Однобуквенные коды показателей в сырых событиях журнала
+_EVENT_CODES = {"logged_water": "w", "logged_calories": "f", "burned_calories": "b", "extra_water": "x"}
+
+# Сколько хранить сырые события, дневные и недельные суммы (дни)
+EVENTS_RETENTION_DAYS = 7
+DAILY_RETENTION_DAYS = 60
+WEEKLY_RETENTION_DAYS = 366
+
+
+def week_key(day: date) -> str:
+    """
+    Неделя дня в формате ISO ("2025-W03")
+    """
+    year, week, _ = day.isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def encode_event(field: str, amount: float) -> str:
+    """
+    Компактная запись события: "<секунда от начала дня>:<код показателя>:<величина>"
+    """
+    seconds = int(time.time() - time.mktime(date.today().timetuple()))
+    return f"{seconds}:{_EVENT_CODES[field]}:{amount:g}"
+
+
+def _totals(data: dict) -> Dict[str, float]:
+    """
+    Суммы показателей (отсутствующие - 0), целые значения - целыми
+    """
+    totals = {}
+    for field in LOG_FIELDS:
+        value = float(data.get(field, 0))
+        totals[field] = int(value) if value.is_integer() else value
+    return totals
+
+
+# Хранилище профилей пользователей и дневного журнала (вода, еда, тренировки).
+# Журнал - только добавление событий; при записи события сразу обновляются суммы за день и за неделю,
+# поэтому прогресс и история читаются без перебора событий
+class ProfileStorage(ABC):
+    @abstractmethod
+    async def get(self, user_id: int) -> Optional[dict]:
+        """
+        Профиль пользователя (None, если профиля нет)
+        """
+
+    @abstractmethod
+    async def save(self, user_id: int, profile: dict) -> None:
+        """
+        Сохранение профиля целиком
+        """
+
+    @abstractmethod
+    async def log_event(self, user_id: int, field: str, amount: float, day: Optional[date] = None) -> Dict[str, float]:
+        """
+        Запись события в журнал дня, возвращает суммы показателей за день
+        """
+
+    @abstractmethod
+    async def get_day(self, user_id: int, day: Optional[date] = None) -> Dict[str, float]:
+        """
+        Суммы показателей за день
+        """
+
+    @abstractmethod
+    async def get_weeks(self, user_id: int, weeks: List[str]) -> List[Dict[str, float]]:
+        """
+        Суммы показателей за недели (ключи недель - week_key)
+        """
+
+    async def close(self) -> None:
+        pass
+
+
+# Хранение в памяти процесса: данные теряются при перезапуске, только для одного процесса
+class MemoryProfileStorage(ProfileStorage):
+    def __init__(self):
+        self._data: Dict[int, dict] = {}
+        self._events: Dict[Tuple[int, date], List[str]] = {}
+        self._daily: Dict[Tuple[int, date], Dict[str, float]] = {}
+        self._weekly: Dict[Tuple[int, str], Dict[str, float]] = {}
+        self._pruned_on: Optional[date] = None
+
+    async def get(self, user_id: int) -> Optional[dict]:
+        profile = self._data.get(user_id)
+        return dict(profile) if profile is not None else None
+
+    async def save(self, user_id: int, profile: dict) -> None:
+        self._data[user_id] = dict(profile)
+
+    async def log_event(self, user_id: int, field: str, amount: float, day: Optional[date] = None) -> Dict[str, float]:
+        day = day or date.today()
+        self._events.setdefault((user_id, day), []).append(encode_event(field, amount))
+        daily = self._daily.setdefault((user_id, day), {})
+        daily[field] = daily.get(field, 0) + amount
+        weekly = self._weekly.setdefault((user_id, week_key(day)), {})
+        weekly[field] = weekly.get(field, 0) + amount
+        self._prune(day)
+        return _totals(daily)
+
+    def _prune(self, today: date) -> None:
+        # Удаление данных старше срока хранения (аналог TTL ключей в Redis), раз в день
+        if self._pruned_on == today:
+            return
+        self._pruned_on = today
+        for storage, days in ((self._events, EVENTS_RETENTION_DAYS), (self._daily, DAILY_RETENTION_DAYS)):
+            for key in [key for key in storage if key[1] <= today - timedelta(days=days)]:
+                del storage[key]
+        oldest_week = week_key(today - timedelta(days=WEEKLY_RETENTION_DAYS))
+        for key in [key for key in self._weekly if key[1] < oldest_week]:
+            del self._weekly[key]
+
+    async def get_day(self, user_id: int, day: Optional[date] = None) -> Dict[str, float]:
+        return _totals(self._daily.get((user_id, day or date.today()), {}))
+
+    async def get_weeks(self, user_id: int, weeks: List[str]) -> List[Dict[str, float]]:
+        return [_totals(self._weekly.get((user_id, week), {})) for week in weeks]
+
+
+# Хранение в Redis: профиль - хэш со значениями полей в JSON.
+# Журнал дня - список событий, суммы за день и неделю - хэши, изменяемые HINCRBYFLOAT в одной транзакции,
+# поэтому несколько копий бота не теряют записи друг друга. Срок хранения задаётся TTL ключей
+class RedisProfileStorage(ProfileStorage):
+    def __init__(self, redis):
+        self.redis = redis
+
+    @staticmethod
+    def _key(user_id: int) -> str:
+        return f"profile:{user_id}"
+
+    async def get(self, user_id: int) -> Optional[dict]:
+        data = await self.redis.hgetall(self._key(user_id))
+        if not data:
+            return None
+        return {field: json.loads(value) for field, value in data.items()}
+
+    async def save(self, user_id: int, profile: dict) -> None:
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.delete(self._key(user_id))
+            pipe.hset(self._key(user_id), mapping={field: json.dumps(value) for field, value in profile.items()})
+            await pipe.execute()
+
+    async def log_event(self, user_id: int, field: str, amount: float, day: Optional[date] = None) -> Dict[str, float]:
+        day = day or date.today()
+        events_key = f"events:{user_id}:{day.isoformat()}"
+        daily_key = f"daily:{user_id}:{day.isoformat()}"
+        weekly_key = f"weekly:{user_id}:{week_key(day)}"
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.rpush(events_key, encode_event(field, amount))
+            pipe.expire(events_key, timedelta(days=EVENTS_RETENTION_DAYS))
+            pipe.hincrbyfloat(daily_key, field, amount)
+            pipe.expire(daily_key, timedelta(days=DAILY_RETENTION_DAYS))
+            pipe.hincrbyfloat(weekly_key, field, amount)
+            pipe.expire(weekly_key, timedelta(days=WEEKLY_RETENTION_DAYS))
+            pipe.hgetall(daily_key)
+            results = await pipe.execute()
+        return _totals(results[-1])
+
+    async def get_day(self, user_id: int, day: Optional[date] = None) -> Dict[str, float]:
+        day = day or date.today()
+        return _totals(await self.redis.hgetall(f"daily:{user_id}:{day.isoformat()}"))
+
+    async def get_weeks(self, user_id: int, weeks: List[str]) -> List[Dict[str, float]]:
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for week in weeks:
+                pipe.hgetall(f"weekly:{user_id}:{week}")
+            return [_totals(data) for data in await pipe.execute()]
+
+    async def close(self) -> None:
+        await self.redis.aclose()
+
+
+def create_storages(redis_url: Optional[str]) -> Tuple[BaseStorage, ProfileStorage]:
+    """
+    Хранилища состояний FSM и профилей: в Redis, если задан redis_url, иначе в памяти
+    """
+    if not redis_url:
+        return MemoryStorage(), MemoryProfileStorage()
+
+    from aiogram.fsm.storage.redis import RedisStorage
+    from redis.asyncio import Redis
+    return RedisStorage.from_url(redis_url), RedisProfileStorage(Redis.from_url(redis_url, decode_responses=True))
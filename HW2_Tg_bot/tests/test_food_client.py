@@ -0,0 +1,74 @@
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from food_client import FoodCache, FoodClient
+
+pytestmark = pytest.mark.asyncio
+
+# Ответы заглушки OpenFoodFacts по искомому продукту
+RESPONSES = {
+    "granola": {"products": [{"product_name": "Granola", "nutriments": {"energy-kcal_100g": 471}}]},
+    "mystery bar": {"products": [{"product_name": "Mystery bar", "nutriments": {}}]},
+    "nothing": {"products": []},
+    "broken": ["not", "a", "dict"],
+    "bad products": {"products": [None]},
+}
+
+
+async def food_server(requests: list) -> TestServer:
+    """
+    Заглушка OpenFoodFacts с ответами из RESPONSES, каждый запрос записывается в requests
+    """
+    async def search(request: web.Request) -> web.Response:
+        key = request.query["search_terms"]
+        requests.append(key)
+        return web.json_response(RESPONSES[key])
+
+    app = web.Application()
+    app.router.add_get("/cgi/search.pl", search)
+    server = TestServer(app)
+    await server.start_server()
+    return server
+
+
+def food_client(server: TestServer, tmp_path) -> FoodClient:
+    return FoodClient(str(server.make_url("")), cache=FoodCache(str(tmp_path / "food.sqlite3")))
+
+
+async def test_food_cached(tmp_path):
+    """
+    Найденный продукт берётся из кэша, в том числе после пересоздания клиента
+    """
+    requests = []
+    server = await food_server(requests)
+    try:
+        client = food_client(server, tmp_path)
+        assert await client.get_food_info("Granola") == {"name": "Granola", "calories": 471}
+        assert await client.get_food_info(" granola ") == {"name": "Granola", "calories": 471}
+        await client.close()
+
+        client = food_client(server, tmp_path)
+        assert await client.get_food_info("granola") == {"name": "Granola", "calories": 471}
+        await client.close()
+    finally:
+        await server.close()
+    assert requests == ["granola"]
+
+
+async def test_food_incomplete_not_cached(tmp_path):
+    """
+    Продукт без калорийности и ответы неожиданной формы - None, и в кэш они не попадают
+    """
+    requests = []
+    server = await food_server(requests)
+    client = food_client(server, tmp_path)
+    try:
+        for name in ("mystery bar", "nothing", "broken", "bad products"):
+            for _ in range(2):
+                assert await client.get_food_info(name) is None
+            assert await client.cache.get(name) is None
+    finally:
+        await client.close()
+        await server.close()
+    assert requests == [name for name in ("mystery bar", "nothing", "broken", "bad products") for _ in range(2)]
@@ -0,0 +1,128 @@
+from pathlib import Path
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+import weather_client
+from weather_client import WeatherCache, WeatherClient, WeatherError
+
+API_KEY = "test-key"
+
+
+async def weather_server(requests: list) -> TestServer:
+    """
+    Заглушка OpenWeatherMap: неверный ключ - 401, город Nowhere - 404, остальные - погода.
+    Каждый запрос записывается в requests
+    """
+    async def weather(request: web.Request) -> web.Response:
+        city, api_key = request.query["q"], request.query["appid"]
+        requests.append((api_key, city))
+        if api_key != API_KEY:
+            return web.json_response({"cod": 401, "message": "Invalid API key"}, status=401)
+        if city == "Nowhere":
+            return web.json_response({"cod": "404", "message": "city not found"}, status=404)
+        return web.json_response({"name": city, "main": {"temp": float(len(city))}})
+
+    app = web.Application()
+    app.router.add_get("/weather", weather)
+    server = TestServer(app)
+    await server.start_server()
+    return server
+
+
+@pytest.mark.asyncio
+async def test_weather_cache_per_key():
+    """
+    Повторный запрос города берётся из кэша, клиенту с другим ключом кэш чужих ответов не отдаётся
+    """
+    requests = []
+    server = await weather_server(requests)
+    cache = WeatherCache(ttl=60)
+    base_url = str(server.make_url(""))
+    try:
+        async with WeatherClient(API_KEY, base_url, cache=cache) as client:
+            assert await client.get_temp("Berlin") == 6.0
+            assert await client.get_temp("berlin") == 6.0
+        assert requests == [(API_KEY, "Berlin")]
+
+        async with WeatherClient("wrong-key", base_url, cache=cache) as client:
+            with pytest.raises(WeatherError) as error:
+                await client.get_weather("Berlin")
+            assert await client.get_temp("Berlin", default=-1) == -1
+        assert error.value.status == 401
+        assert error.value.message == "Invalid API key"
+        # Ошибки не кэшируются
+        assert requests[1:] == [("wrong-key", "Berlin")] * 2
+    finally:
+        await server.close()
+
+
+@pytest.mark.asyncio
+async def test_weather_errors_not_cached():
+    """
+    Ответ с ошибкой не попадает в кэш, после истечения времени жизни город запрашивается заново
+    """
+    requests = []
+    server = await weather_server(requests)
+    cache = WeatherCache(ttl=0)
+    try:
+        async with WeatherClient(API_KEY, str(server.make_url("")), cache=cache) as client:
+            for _ in range(2):
+                with pytest.raises(WeatherError) as error:
+                    await client.get_weather("Nowhere")
+                assert error.value.status == 404
+                await client.get_weather("Tokyo")
+        assert requests == [(API_KEY, "Nowhere"), (API_KEY, "Tokyo")] * 2
+        assert cache.get(API_KEY, "Nowhere") is None
+    finally:
+        await server.close()
+
+
+@pytest.mark.asyncio
+async def test_weather_network_error():
+    """
+    Недоступный API - WeatherError без HTTP-кода
+    """
+    server = await weather_server([])
+    base_url = str(server.make_url(""))
+    await server.close()
+    async with WeatherClient(API_KEY, base_url, cache=WeatherCache()) as client:
+        with pytest.raises(WeatherError) as error:
+            await client.get_weather("Berlin")
+    assert error.value.status is None
+
+
+def test_weather_cache_eviction(monkeypatch):
+    """
+    При переполнении сначала удаляются устаревшие записи, затем давно не запрошенные
+    """
+    now = [0.0]
+    monkeypatch.setattr(weather_client.time, "monotonic", lambda: now[0])
+    cache = WeatherCache(ttl=10, maxsize=3)
+    cache.set(API_KEY, "A", {"name": "A"})
+    now[0] = 5
+    cache.set(API_KEY, "B", {"name": "B"})
+    cache.set(API_KEY, "C", {"name": "C"})
+    now[0] = 6
+    assert cache.get(API_KEY, "A") == {"name": "A"}
+    now[0] = 12
+    # A запрошена последней, но устарела - удаляется она, а не давно не запрошенная B
+    cache.set(API_KEY, "D", {"name": "D"})
+    assert len(cache) == 3
+    assert cache.get(API_KEY, "A") is None
+    # B запрошена недавно, поэтому вытесняется C
+    assert cache.get(API_KEY, "B") == {"name": "B"}
+    cache.set(API_KEY, "E", {"name": "E"})
+    assert cache.get(API_KEY, "C") is None
+    assert [cache.get(API_KEY, city) is not None for city in "BDE"] == [True, True, True]
+
+
+def test_weather_client_matches_hw1():
+    """
+    weather_client.py - копия клиента из HW1_OpenWeatherMap_API, копии не должны расходиться
+    """
+    source = Path(__file__).resolve().parents[2] / "HW1_OpenWeatherMap_API" / "weather_client.py"
+    if not source.exists():
+        pytest.skip("HW1_OpenWeatherMap_API рядом нет")
+    assert Path(weather_client.__file__).read_text(encoding="utf-8") == source.read_text(encoding="utf-8")
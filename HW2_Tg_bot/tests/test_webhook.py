@@ -0,0 +1,125 @@
+import asyncio
+
+import pytest
+from aiogram import Bot, Dispatcher
+from aiogram.types import Message
+from aiohttp.test_utils import TestClient, TestServer
+
+from webhook import create_webhook_app
+
+pytestmark = pytest.mark.asyncio
+
+PATH = "/webhook"
+
+
+def message_update(update_id: int, chat_id: int, text: str) -> dict:
+    """
+    Обновление Telegram с текстовым сообщением в чате chat_id
+    """
+    return {"update_id": update_id,
+            "message": {"message_id": update_id, "date": 0, "text": text,
+                        "chat": {"id": chat_id, "type": "private"}}}
+
+
+async def webhook_client(dp: Dispatcher, max_concurrency: int = 10, max_pending: int = 100) -> TestClient:
+    bot = Bot("123456:TEST")
+    app = create_webhook_app(dp, bot, PATH, None, max_concurrency, max_pending)
+    client = TestClient(TestServer(app))
+    await client.start_server()
+    return client
+
+
+async def test_webhook_keeps_chat_order():
+    """
+    Обновления одного чата обрабатываются по очереди поступления, разных чатов - параллельно
+    """
+    dp = Dispatcher()
+    handled = []
+
+    @dp.message()
+    async def handler(message: Message):
+        # Первые сообщения чатов обрабатываются дольше следующих
+        await asyncio.sleep(0.05 if message.text.endswith("-0") else 0)
+        handled.append(message.text)
+
+    client = await webhook_client(dp)
+    try:
+        update_id = 0
+        for i in range(3):
+            for chat_id in (1, 2):
+                update_id += 1
+                resp = await client.post(PATH, json=message_update(update_id, chat_id, f"{chat_id}-{i}"))
+                assert resp.status == 200
+        await client.app["processor"].close()
+    finally:
+        await client.close()
+
+    assert [text for text in handled if text.startswith("1-")] == ["1-0", "1-1", "1-2"]
+    assert [text for text in handled if text.startswith("2-")] == ["2-0", "2-1", "2-2"]
+
+
+async def test_webhook_queue_full():
+    """
+    При переполнении очереди обновление не принимается (503), после освобождения - принимается
+    """
+    dp = Dispatcher()
+    release = asyncio.Event()
+
+    @dp.message()
+    async def handler(message: Message):
+        await release.wait()
+
+    client = await webhook_client(dp, max_pending=1)
+    try:
+        resp = await client.post(PATH, json=message_update(1, 1, "first"))
+        assert resp.status == 200
+        resp = await client.post(PATH, json=message_update(2, 2, "second"))
+        assert resp.status == 503
+
+        release.set()
+        await client.app["processor"].close()
+        resp = await client.post(PATH, json=message_update(3, 2, "third"))
+        assert resp.status == 200
+        await client.app["processor"].close()
+    finally:
+        await client.close()
+
+
+async def test_webhook_bad_request():
+    """
+    Тело не JSON, не UTF-8 или не обновление Telegram - 400
+    """
+    client = await webhook_client(Dispatcher())
+    try:
+        resp = await client.post(PATH, data="not json")
+        assert resp.status == 400
+        resp = await client.post(PATH, json={"message": "no update_id"})
+        assert resp.status == 400
+        resp = await client.post(PATH, data=b'{"update_id": 1, "message": "\xff"}',
+                                 headers={"Content-Type": "application/json"})
+        assert resp.status == 400
+    finally:
+        await client.close()
+
+
+async def test_webhook_unknown_update_type():
+    """
+    Обновление без известного типа события пропускается с ответом 200 (Telegram не повторяет доставку)
+    """
+    dp = Dispatcher()
+    handled = []
+
+    @dp.message()
+    async def handler(message: Message):
+        handled.append(message.text)
+
+    client = await webhook_client(dp)
+    try:
+        resp = await client.post(PATH, json={"update_id": 1})
+        assert resp.status == 200
+        resp = await client.post(PATH, json=message_update(2, 1, "after"))
+        assert resp.status == 200
+        await client.app["processor"].close()
+    finally:
+        await client.close()
+    assert handled == ["after"]
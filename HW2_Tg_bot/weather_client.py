@@ -0,0 +1,144 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+# Адрес API (можно заменить на локальную заглушку для тестов)
+WEATHER_BASE_URL = os.getenv("WEATHER_BASE_URL", "http://api.openweathermap.org/data/2.5")
+
+# Время жизни погоды города в кэше (сек)
+WEATHER_CACHE_TTL = float(os.getenv("WEATHER_CACHE_TTL", 600))
+
+# Сколько пар (ключ API, город) хранится в кэше
+WEATHER_CACHE_SIZE = int(os.getenv("WEATHER_CACHE_SIZE", 1000))
+
+
+class WeatherError(Exception):
+    """
+    Ошибка запроса погоды (status - HTTP-код ответа, None - сеть или таймаут)
+    """
+
+    def __init__(self, city: str, status: Optional[int], message: str):
+        super().__init__(f"{city}: {message}")
+        self.city = city
+        self.status = status
+        self.message = message
+
+
+class WeatherCache:
+    """
+    Кэш ответов по ключу API и городу с временем жизни записи.
+    Общий для всех клиентов процесса, поэтому переживает пересоздание клиента.
+    Клиенту с другим ключом (в том числе неверным) кэш чужих ответов не отдаёт.
+    Хранит не больше maxsize записей: при переполнении сначала удаляются устаревшие,
+    затем давно не запрошенные
+    """
+
+    def __init__(self, ttl: float = WEATHER_CACHE_TTL, maxsize: int = WEATHER_CACHE_SIZE):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Tuple[str, str], tuple]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, api_key: str, city: str) -> Optional[dict]:
+        key = (api_key, city.lower())
+        item = self._data.get(key)
+        if item is None:
+            return None
+        if item[0] <= time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return item[1]
+
+    def set(self, api_key: str, city: str, weather: dict) -> None:
+        key = (api_key, city.lower())
+        self._data[key] = (time.monotonic() + self.ttl, weather)
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            now = time.monotonic()
+            for expired in [k for k, (expires, _) in self._data.items() if expires <= now]:
+                del self._data[expired]
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+
+weather_cache = WeatherCache()
+
+
+class WeatherClient:
+    """
+    Асинхронный клиент OpenWeatherMap: одна сессия aiohttp на клиента,
+    кэш по городам, ограничение одновременных запросов и таймаут.
+
+    async with WeatherClient(api_key) as client:
+        temp = await client.get_temp("Moscow")
+        weather = await client.get_weather("Berlin")
+    """
+
+    def __init__(self, api_key: str, base_url: str = WEATHER_BASE_URL, timeout: float = 5,
+                 max_concurrency: int = 10, cache: WeatherCache = weather_cache):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.cache = cache
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # Сессия создаётся в работающем цикле событий при первом запросе
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=self.timeout)
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def get_weather(self, city: str) -> dict:
+        """
+        Текущая погода в городе (ответ API как есть).
+        При ошибке API, сети или таймауте - WeatherError
+        """
+        weather = self.cache.get(self.api_key, city)
+        if weather is not None:
+            return weather
+
+        params = {"q": city, "appid": self.api_key, "units": "metric"}
+        async with self._semaphore:
+            try:
+                async with self._get_session().get(f"{self.base_url}/weather", params=params) as response:
+                    data = await response.json(content_type=None)
+                    if response.status != 200:
+                        message = data.get("message", "") if isinstance(data, dict) else ""
+                        raise WeatherError(city, response.status, message or f"код {response.status}")
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                raise WeatherError(city, None, repr(e)) from e
+
+        self.cache.set(self.api_key, city, data)
+        return data
+
+    async def get_temp(self, city: str, default: Optional[float] = None) -> Optional[float]:
+        """
+        Текущая температура в городе, при любой ошибке - default
+        """
+        try:
+            return (await self.get_weather(city))["main"]["temp"]
+        except WeatherError as e:
+            logger.warning("Не удалось получить погоду: %s", e)
+            return default
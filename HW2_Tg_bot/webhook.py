@@ -0,0 +1,112 @@
+import asyncio
+import json
+import logging
+from typing import Dict, List, Optional, Set
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from aiogram.types.update import UpdateTypeLookupError
+from aiohttp import web
+from pydantic import ValidationError
+
+logger = logging.getLogger(__name__)
+
+
+# Чат (или пользователь), к которому относится обновление: по нему соблюдается порядок обработки
+def update_chat_id(update: Update) -> Optional[int]:
+    event = update.event
+    chat = getattr(event, "chat", None) or getattr(getattr(event, "message", None), "chat", None)
+    if chat is not None:
+        return chat.id
+    user = getattr(event, "from_user", None)
+    return user.id if user is not None else None
+
+
+# Обработка обновлений в фоне: обновления разных чатов - параллельно (не больше max_concurrency),
+# обновления одного чата - строго по очереди поступления
+class UpdateProcessor:
+    def __init__(self, dp: Dispatcher, bot: Bot, max_concurrency: int, max_pending: int):
+        self.dp = dp
+        self.bot = bot
+        self.max_pending = max_pending
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        # Блокировка чата и число его обновлений в обработке (блокировка удаляется, когда их не осталось)
+        self._chats: Dict[int, List] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    def submit(self, update: Update) -> bool:
+        """
+        Постановка обновления в обработку. False - очередь переполнена
+        """
+        if len(self._tasks) >= self.max_pending:
+            return False
+        chat_id = update_chat_id(update)
+        # Блокировка берётся в порядке вызова submit: asyncio.Lock отдаётся ожидающим по очереди
+        if chat_id is not None:
+            self._chats.setdefault(chat_id, [asyncio.Lock(), 0])[1] += 1
+        task = asyncio.create_task(self._process(update, chat_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return True
+
+    async def _process(self, update: Update, chat_id: Optional[int]) -> None:
+        chat = self._chats.get(chat_id)
+        try:
+            if chat is not None:
+                await chat[0].acquire()
+            try:
+                async with self._semaphore:
+                    await self.dp.feed_update(self.bot, update)
+            finally:
+                if chat is not None:
+                    chat[0].release()
+        except Exception:
+            logger.exception("Ошибка обработки обновления %s", update.update_id)
+        finally:
+            if chat is not None:
+                chat[1] -= 1
+                if chat[1] == 0:
+                    del self._chats[chat_id]
+
+    async def close(self) -> None:
+        """
+        Ожидание обновлений, уже принятых в обработку
+        """
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+def create_webhook_app(dp: Dispatcher, bot: Bot, path: str, secret: Optional[str],
+                       max_concurrency: int, max_pending: int) -> web.Application:
+    """
+    Приложение aiohttp, принимающее обновления Telegram по POST на path.
+    Ответ отправляется сразу после постановки обновления в обработку,
+    при переполнении очереди - 503 (Telegram повторит доставку позже), при некорректном теле - 400.
+    Обновления неизвестных типов пропускаются с ответом 200
+    """
+    processor = UpdateProcessor(dp, bot, max_concurrency, max_pending)
+
+    async def handle_update(request: web.Request) -> web.Response:
+        if secret and request.headers.get("X-Telegram-Bot-Api-Secret-Token") != secret:
+            return web.Response(status=401)
+        # Тело не JSON (в том числе не UTF-8) или не обновление Telegram - повторять доставку бессмысленно
+        try:
+            update = Update.model_validate(await request.json(), context={"bot": bot})
+        except (UnicodeDecodeError, json.JSONDecodeError, ValidationError):
+            return web.Response(status=400)
+        # Обновление неизвестного боту типа пропускаем, ответ 200 - чтобы Telegram не повторял доставку
+        try:
+            update.event_type
+        except UpdateTypeLookupError:
+            return web.Response()
+        if not processor.submit(update):
+            return web.Response(status=503)
+        return web.Response()
+
+    async def on_shutdown(app: web.Application) -> None:
+        await processor.close()
+
+    app = web.Application()
+    app.router.add_post(path, handle_update)
+    app.on_shutdown.append(on_shutdown)
+    app["processor"] = processor
+    return app
@@ -0,0 +1,38 @@
+"""link url hash
+
+Revision ID: 0002_link_url_hash
+Revises: 0001_initial_schema
+Create Date: 2026-10-18 12:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002_link_url_hash'
+down_revision: Union[str, None] = '0001_initial_schema'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('links', sa.Column('url_hash', sa.BigInteger(), nullable=True))
+
+    # Заполняем хэш для существующих ссылок тем же способом, что и app.urls.url_hash:
+    # первые 8 байт sha256 как знаковое 64-битное число
+    op.execute(
+        "UPDATE links SET url_hash = "
+        "('x' || substr(encode(sha256(convert_to(original_url, 'UTF8')), 'hex'), 1, 16))"
+        "::bit(64)::bigint")
+
+    op.create_index('ix_links_url_hash_id', 'links', ['url_hash', 'id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_links_url_hash_id', table_name='links')
+    op.drop_column('links', 'url_hash')
@@ -0,0 +1,27 @@
+"""link owner id index
+
+Revision ID: 0003_link_owner_id_index
+Revises: 0002_link_url_hash
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003_link_owner_id_index'
+down_revision: Union[str, None] = '0002_link_url_hash'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_links_owner_id_id', 'links', ['owner_id', 'id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_links_owner_id_id', table_name='links')
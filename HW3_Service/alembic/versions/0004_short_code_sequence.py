@@ -0,0 +1,31 @@
+"""short code sequence
+
+Revision ID: 0004_short_code_sequence
+Revises: 0003_link_owner_id_index
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004_short_code_sequence'
+down_revision: Union[str, None] = '0003_link_owner_id_index'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Последовательности есть только в PostgreSQL, в остальных БД коды выдаёт счётчик Redis
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute(sa.schema.CreateSequence(sa.Sequence('short_code_seq')))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute(sa.schema.DropSequence(sa.Sequence('short_code_seq')))
@@ -0,0 +1,27 @@
+"""link expires at index
+
+Revision ID: 0005_link_expires_at_index
+Revises: 0004_short_code_sequence
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005_link_expires_at_index'
+down_revision: Union[str, None] = '0004_short_code_sequence'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_links_expires_at', 'links', ['expires_at'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_links_expires_at', table_name='links')
@@ -1,25 +1,13 @@
-from collections.abc import AsyncGenerator
 from fastapi import Depends
 from fastapi_users.db import SQLAlchemyUserDatabase
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
-from app.config import DB_URL
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db import get_db
 from app.models import User
 
 
-engine = create_async_engine(DB_URL)
-async_session_maker = async_sessionmaker(engine, expire_on_commit=False)
-
-
-async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
-    """
-    Создание асинхронной сессии для работы с БД
-    """
-    async with async_session_maker() as session:
-        yield session
-
-
-async def get_user_db(session: AsyncSession = Depends(get_async_session)):
+async def get_user_db(session: AsyncSession = Depends(get_db)):
     """
-    Предоставление зависимости для доступа к БД пользователей
+    Предоставление зависимости для доступа к БД пользователей.
+    Сессия берётся из общего движка app.db
     """
     yield SQLAlchemyUserDatabase(session, User)
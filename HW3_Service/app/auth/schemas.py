@@ -1,8 +1,9 @@
 import uuid
 from fastapi_users import schemas
-from pydantic import BaseModel, HttpUrl, ConfigDict
+from pydantic import BaseModel, HttpUrl, ConfigDict, Field
 import datetime
-from typing import Optional
+from typing import List, Optional
+from app.config import BATCH_MAX_ITEMS
 
 
 # Users
@@ -40,6 +41,24 @@ class LinkResponse(BaseModel):
         from_attributes = True
 
 
+# Страница ссылок; next_cursor передаётся в after_id для получения следующей
+class LinkPage(BaseModel):
+    items: List[LinkResponse]
+    next_cursor: Optional[int] = None
+
+
+# Пакетное создание ссылок
+class LinkBatchCreate(BaseModel):
+    items: List[LinkCreate] = Field(..., min_length=1, max_length=BATCH_MAX_ITEMS)
+
+
+# Результат создания одной ссылки из пакета: ссылка или причина ошибки
+class LinkBatchItemResult(BaseModel):
+    index: int
+    link: Optional[LinkResponse] = None
+    error: Optional[str] = None
+
+
 # Модель ответа для статуса приложения "/"
 class StatusResponse(BaseModel):
     status: str
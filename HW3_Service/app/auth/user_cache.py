@@ -0,0 +1,140 @@
+import hashlib
+import json
+import time
+import uuid
+from typing import Dict, Optional
+
+import jwt
+from fastapi_users.authentication import JWTStrategy
+
+from app.cache import TTLCache, listen_channel
+from app.config import USER_CACHE_SIZE, USER_CACHE_TTL, USER_CACHE_REDIS
+from app.models import User
+from app.routers.redis_client import get_redis
+
+# Поля пользователя, которые хранятся во втором уровне кэша (Redis)
+USER_FIELDS = ("email", "is_active", "is_superuser", "is_verified")
+
+# Канал Redis, по которому процессы сообщают друг другу об изменённых пользователях
+USER_INVALIDATION_CHANNEL = "user_cache:invalidate"
+
+
+def token_key(token: str) -> str:
+    """
+    Ключ кэша по токену: сам токен в кэше не хранится
+    """
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class UserCache:
+    """
+    Кэш проверенных пользователей по токену.
+    Запись живёт не дольше USER_CACHE_TTL и не дольше самого токена,
+    при изменении пользователя все его записи, закэшированные раньше, становятся недействительными
+    """
+
+    def __init__(self, maxsize: int = USER_CACHE_SIZE, ttl: int = USER_CACHE_TTL,
+                 use_redis: bool = USER_CACHE_REDIS):
+        self.ttl = ttl
+        self.use_redis = use_redis
+        self._local = TTLCache(maxsize, ttl)
+        # Время последней инвалидации пользователя (хранится не дольше ttl записей)
+        self._invalidated: Dict[uuid.UUID, float] = {}
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Счётчики локального уровня кэша
+        """
+        return {"size": len(self._local), **self._local.stats.as_dict()}
+
+    def _remember(self, key: str, user: User, ttl: float) -> None:
+        self._local.set(key, (user, time.monotonic()), ttl)
+
+    async def get(self, token: str) -> Optional[User]:
+        key = token_key(token)
+        item = self._local.get(key)
+        if item is not None:
+            user, cached_at = item
+            if cached_at > self._invalidated.get(user.id, 0):
+                return user
+            self._local.delete(key)
+        if not self.use_redis:
+            return None
+
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.get(f"user:{key}")
+        pipe.ttl(f"user:{key}")
+        cached, ttl = await pipe.execute()
+        if cached is None:
+            return None
+        data = json.loads(cached)
+        user = User(id=uuid.UUID(data.pop("id")), **data)
+        self._remember(key, user, ttl)
+        return user
+
+    async def set(self, token: str, user: User) -> None:
+        # Токен уже проверен стратегией - берём только срок его действия
+        expires = jwt.decode(token, options={"verify_signature": False}).get("exp")
+        ttl = self.ttl if expires is None else min(self.ttl, int(expires - time.time()))
+        if ttl <= 0:
+            return
+
+        key = token_key(token)
+        self._remember(key, user, ttl)
+        if self.use_redis:
+            data = {"id": str(user.id), **{field: getattr(user, field) for field in USER_FIELDS}}
+            pipe = get_redis().pipeline(transaction=False)
+            pipe.set(f"user:{key}", json.dumps(data), ex=ttl)
+            pipe.sadd(f"user_tokens:{user.id}", key)
+            pipe.expire(f"user_tokens:{user.id}", self.ttl)
+            await pipe.execute()
+
+    def forget(self, user_id: uuid.UUID) -> None:
+        """
+        Удаление из памяти процесса записей пользователя, закэшированных до этого момента
+        """
+        now = time.monotonic()
+        self._invalidated = {uid: at for uid, at in self._invalidated.items() if at > now - self.ttl}
+        self._invalidated[user_id] = now
+
+    async def invalidate(self, user_id: uuid.UUID) -> None:
+        """
+        Удаление из кэша всех записей пользователя.
+        Остальные процессы удаляют записи из памяти по сообщению в канале USER_INVALIDATION_CHANNEL
+        """
+        self.forget(user_id)
+        pipe = get_redis().pipeline(transaction=False)
+        if self.use_redis:
+            keys = await get_redis().smembers(f"user_tokens:{user_id}")
+            pipe.delete(f"user_tokens:{user_id}", *(f"user:{key}" for key in keys))
+        pipe.publish(USER_INVALIDATION_CHANNEL, json.dumps(str(user_id)))
+        await pipe.execute()
+
+    async def listen(self) -> None:
+        """
+        Фоновая задача: удаление из памяти процесса пользователей, изменённых другими процессами
+        """
+        await listen_channel(USER_INVALIDATION_CHANNEL,
+                             lambda user_id: self.forget(uuid.UUID(user_id)), self._local.clear)
+
+
+user_cache = UserCache()
+
+
+class CachedJWTStrategy(JWTStrategy):
+    """
+    JWT-стратегия с кэшем: для уже проверенного токена пользователь берётся из кэша
+    без декодирования токена и запроса в БД
+    """
+
+    async def read_token(self, token, user_manager):
+        if token is None:
+            return None
+        user = await user_cache.get(token)
+        if user is not None:
+            return user
+
+        user = await super().read_token(token, user_manager)
+        if user is not None:
+            await user_cache.set(token, user)
+        return user
@@ -1,14 +1,18 @@
+import logging
 import uuid
-from typing import Optional
+from typing import Any, Dict, Optional
 from fastapi import Depends, Request
 from fastapi_users import BaseUserManager, FastAPIUsers, UUIDIDMixin
 from fastapi_users.authentication import AuthenticationBackend, BearerTransport, JWTStrategy
 from fastapi_users.db import SQLAlchemyUserDatabase
 from app.auth.auth_db import get_user_db
+from app.auth.user_cache import CachedJWTStrategy, user_cache
 from app.models import User
 
 SECRET = "SECRET"
 
+logger = logging.getLogger(__name__)
+
 
 # Класс для управления пользователями (регистрация, работа с паролем, верификация аккаунта)
 class UserManager(UUIDIDMixin, BaseUserManager[User, uuid.UUID]):
@@ -16,15 +20,26 @@ class UserManager(UUIDIDMixin, BaseUserManager[User, uuid.UUID]):
     verification_token_secret = SECRET
 
     async def on_after_register(self, user: User, request: Optional[Request] = None):
-        print(f"User {user.id} has registered.")
+        logger.info("User %s has registered.", user.id)
 
     async def on_after_forgot_password(
             self, user: User, token: str, request: Optional[Request] = None):
-        print(f"User {user.id} has forgot password. Reset token: {token}")
+        logger.info("User %s has forgot password. Reset token: %s", user.id, token)
 
     async def on_after_request_verify(
             self, user: User, token: str, request: Optional[Request] = None):
-        print(f"Verification requested for user {user.id}. Token: {token}")
+        logger.info("Verification requested for user %s. Token: %s", user.id, token)
+
+    # Изменённый или удалённый пользователь не должен браться из кэша авторизации
+    async def on_after_update(
+            self, user: User, update_dict: Dict[str, Any], request: Optional[Request] = None):
+        await user_cache.invalidate(user.id)
+
+    async def on_after_reset_password(self, user: User, request: Optional[Request] = None):
+        await user_cache.invalidate(user.id)
+
+    async def on_after_delete(self, user: User, request: Optional[Request] = None):
+        await user_cache.invalidate(user.id)
 
 
 async def get_user_manager(user_db: SQLAlchemyUserDatabase[User, uuid.UUID] = Depends(get_user_db)):
@@ -44,7 +59,22 @@ auth_backend = AuthenticationBackend(
     get_strategy=get_jwt_strategy)
 
 
+def get_cached_jwt_strategy() -> CachedJWTStrategy:
+    return CachedJWTStrategy(secret=SECRET, lifetime_seconds=3600)
+
+
+# Тот же JWT, но с кэшем проверенных пользователей - для роутов ссылок
+cached_auth_backend = AuthenticationBackend(
+    name="jwt",
+    transport=bearer_transport,
+    get_strategy=get_cached_jwt_strategy)
+
+
 # Управление пользователями через FastAPIUsers
 fastapi_users = FastAPIUsers[User, uuid.UUID](get_user_manager, [auth_backend])
 
-current_active_user = fastapi_users.current_user(active=True)
+# Роуты ссылок используют пользователя только для чтения, поэтому берут его из кэша.
+# Роуты /users работают с пользователем из своей сессии БД
+cached_fastapi_users = FastAPIUsers[User, uuid.UUID](get_user_manager, [cached_auth_backend])
+
+current_active_user = cached_fastapi_users.current_user(active=True)
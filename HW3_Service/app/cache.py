@@ -0,0 +1,291 @@
+import asyncio
+import json
+import logging
+import math
+import random
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from redis.exceptions import RedisError
+
+from app.config import (LINK_CACHE_TTL, STATS_CACHE_TTL, CACHE_STALE_TTL, CACHE_EARLY_BETA,
+                        LOCAL_CACHE_SIZE, LOCAL_CACHE_TTL)
+from app.routers.redis_client import get_redis
+from app.metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+# Канал Redis, по которому процессы сообщают друг другу об удалённых из кэша ссылках
+INVALIDATION_CHANNEL = "cache:invalidate"
+
+
+class TierStats:
+    """
+    Счётчики попаданий, промахов и вытеснений уровня кэша
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+class TTLCache:
+    """
+    Ограниченный по размеру LRU-кэш в памяти процесса со временем жизни записей
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stats = TierStats()
+        self._data: OrderedDict = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        item = self._data.get(key)
+        if item is None:
+            self.stats.misses += 1
+            return None
+        value, expires = item
+        if expires <= time.monotonic():
+            del self._data[key]
+            self.stats.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.stats.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        self._data[key] = (value, time.monotonic() + ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.stats.evictions += 1
+
+    def delete(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+def link_key(short_code: str) -> str:
+    """
+    Ключ записи редиректа в Redis
+    """
+    return f"link:{short_code}"
+
+
+# Уровни кэша редиректов: память процесса, затем Redis
+local_links = TTLCache(LOCAL_CACHE_SIZE, LOCAL_CACHE_TTL)
+redis_links_stats = TierStats()
+
+
+def cache_stats() -> Dict[str, Dict[str, int]]:
+    """
+    Счётчики уровней кэша редиректов
+    """
+    return {"local": {"size": len(local_links), **local_links.stats.as_dict()},
+            "redis": redis_links_stats.as_dict()}
+
+
+async def cache_link(short_code: str, original_url: str, expires_at: datetime) -> None:
+    """
+    Сохранение в кэш данных для редиректа по короткому коду.
+    Запись живёт не дольше самой ссылки
+    """
+    expires_at = expires_at.astimezone()
+    ttl = min(LINK_CACHE_TTL, int((expires_at - datetime.now().astimezone()).total_seconds()))
+    if ttl <= 0:
+        return
+    local_links.set(short_code, {"original_url": original_url, "expires_at": expires_at}, ttl)
+    payload = {"original_url": original_url, "expires_at": expires_at.isoformat()}
+    await get_redis().set(link_key(short_code), json.dumps(payload), ex=ttl)
+
+
+async def get_cached_link(short_code: str) -> Optional[dict]:
+    """
+    Получение данных для редиректа из кэша (None, если записи нет).
+    Сначала из памяти процесса, затем из Redis
+    """
+    link = local_links.get(short_code)
+    if link is not None:
+        return link
+
+    cached = await get_redis().get(link_key(short_code))
+    if cached is None:
+        redis_links_stats.misses += 1
+        return None
+    redis_links_stats.hits += 1
+    link = json.loads(cached)
+    link["expires_at"] = datetime.fromisoformat(link["expires_at"])
+    local_links.set(short_code, link)
+    return link
+
+
+async def invalidate_link(short_code: str, original_url: Optional[str] = None) -> None:
+    """
+    Удаление из кэша всех записей, связанных со ссылкой
+    """
+    keys = [f"stats:{short_code}"]
+    if original_url:
+        keys.append(f"search:{original_url}")
+    await _invalidate([short_code], keys)
+
+
+async def invalidate_links(links: Iterable[Tuple[str, str]]) -> None:
+    """
+    Удаление из кэша записей пачки ссылок (short_code, original_url) одной командой
+    """
+    short_codes, keys = [], []
+    for short_code, original_url in links:
+        short_codes.append(short_code)
+        keys += [f"stats:{short_code}", f"search:{original_url}"]
+    if short_codes:
+        await _invalidate(short_codes, keys)
+
+
+async def invalidate_searches(urls: Iterable[str]) -> None:
+    """
+    Удаление закэшированных страниц поиска по url, на которые появились или изменились ссылки
+    """
+    keys = {f"search:{url}" for url in urls}
+    if keys:
+        await get_redis().delete(*keys)
+
+
+async def _invalidate(short_codes: List[str], keys: List[str]) -> None:
+    """
+    Удаление записей редиректов из обоих уровней и прочих ключей из Redis.
+    Остальные процессы удаляют записи из памяти по сообщению в канале INVALIDATION_CHANNEL
+    """
+    for short_code in short_codes:
+        local_links.delete(short_code)
+    pipe = get_redis().pipeline(transaction=False)
+    pipe.delete(*(link_key(short_code) for short_code in short_codes), *keys)
+    pipe.publish(INVALIDATION_CHANNEL, json.dumps(short_codes))
+    await pipe.execute()
+
+
+async def listen_channel(channel: str, handle: Callable[[Any], None], reset: Callable[[], None]) -> None:
+    """
+    Подписка на канал Redis: handle вызывается с разобранным JSON каждого сообщения.
+    При обрыве соединения сообщения могли потеряться, поэтому вызывается reset и подписка повторяется
+    """
+    while True:
+        pubsub = get_redis().pubsub()
+        try:
+            await pubsub.subscribe(channel)
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    handle(json.loads(message["data"]))
+        except RedisError:
+            logger.warning("Потеряна подписка на %s, локальный кэш очищен", channel)
+            reset()
+            await asyncio.sleep(1)
+        finally:
+            await pubsub.aclose()
+
+
+async def listen_invalidations() -> None:
+    """
+    Фоновая задача: удаление из памяти процесса ссылок, изменённых другими процессами
+    """
+    def handle(short_codes: List[str]) -> None:
+        for short_code in short_codes:
+            local_links.delete(short_code)
+
+    await listen_channel(INVALIDATION_CHANNEL, handle, local_links.clear)
+
+
+# Загрузки, выполняющиеся в этом процессе: ключ -> результат
+_inflight: Dict[str, asyncio.Future] = {}
+
+
+async def _read_entry(key: str) -> Optional[dict]:
+    """
+    Запись кэша с метаданными; записи прежнего формата (без метаданных) считаются отсутствующими
+    """
+    cached = await get_redis().get(key)
+    entry = json.loads(cached) if cached is not None else None
+    return entry if isinstance(entry, dict) and "expires" in entry else None
+
+
+async def _load(key: str, loader: Callable[[], Awaitable[Any]], ttl: int, stale_ttl: int,
+                seen: Optional[dict] = None) -> Any:
+    """
+    Загрузка значения с объединением запросов: по ключу в процессе выполняется один loader,
+    остальные ждут его результат. seen - запись, прочитанная вызывающим перед загрузкой
+    """
+    inflight = _inflight.get(key)
+    if inflight is not None:
+        return await asyncio.shield(inflight)
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    try:
+        # seen могла быть прочитана до записи значения загрузкой, которая уже завершилась
+        entry = await _read_entry(key)
+        if entry is not None and entry != seen and entry["expires"] > time.time():
+            future.set_result(entry["value"])
+            return entry["value"]
+
+        start = time.perf_counter()
+        value = await loader()
+        delta = time.perf_counter() - start
+        if value is not None:
+            entry = {"value": value, "delta": delta, "expires": time.time() + ttl}
+            await get_redis().set(key, json.dumps(entry), ex=ttl + stale_ttl)
+        future.set_result(value)
+        return value
+    except Exception as e:
+        future.set_exception(e)
+        # Ожидающих может не быть - помечаем исключение как полученное
+        future.exception()
+        raise
+    finally:
+        del _inflight[key]
+
+
+async def cached_load(key: str, loader: Callable[[], Awaitable[Any]],
+                      ttl: int = STATS_CACHE_TTL, stale_ttl: int = CACHE_STALE_TTL,
+                      beta: float = CACHE_EARLY_BETA) -> Any:
+    """
+    Чтение через кэш Redis, устойчивое к лавине запросов при истечении ключа:
+    - запись обновляется заранее с вероятностью, растущей к концу её свежести (XFetch);
+    - устаревшую запись обновляет один запрос (блокировка в Redis), остальные получают старое значение;
+    - при отсутствии записи загрузки по одному ключу в процессе объединяются.
+    loader возвращает JSON-сериализуемое значение или None (не кэшируется)
+    """
+    entry = await _read_entry(key)
+    if entry is None:
+        record_cache(key, "miss")
+        return await _load(key, loader, ttl, stale_ttl)
+
+    # XFetch: -log(random) > 0, поэтому "срок" сдвигается тем раньше, чем дольше загрузка
+    if time.time() - entry["delta"] * beta * math.log(1 - random.random()) < entry["expires"]:
+        record_cache(key, "hit")
+        return entry["value"]
+    record_cache(key, "stale")
+
+    # Пора обновлять: обновляет только владелец блокировки, остальные отдают текущее значение
+    lock_key = f"lock:{key}"
+    lock_ttl = max(1, math.ceil(entry["delta"] * 10))
+    if key in _inflight or not await get_redis().set(lock_key, 1, nx=True, ex=lock_ttl):
+        return entry["value"]
+    # После успешного обновления блокировка истекает сама: запросы, прочитавшие
+    # старую запись до её обновления, не должны запускать загрузку повторно
+    try:
+        return await _load(key, loader, ttl, stale_ttl, entry)
+    except Exception:
+        await get_redis().delete(lock_key)
+        raise
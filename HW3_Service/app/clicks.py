@@ -0,0 +1,165 @@
+import asyncio
+from datetime import datetime
+from typing import Optional, Tuple
+from redis.exceptions import WatchError
+from sqlalchemy import DateTime, Integer, String, bindparam, column, func, update, values
+
+from app.config import CLICKS_FLUSH_INTERVAL
+from app.db import SessionLocal
+from app.models import Link
+from app.routers.redis_client import get_redis
+
+# Хэши Redis: short_code -> число кликов / время последнего клика
+CLICKS_PENDING = "clicks:pending"
+CLICKS_LAST = "clicks:last"
+
+# Те же хэши в процессе записи в БД
+CLICKS_FLUSHING = "clicks:flushing"
+CLICKS_LAST_FLUSHING = "clicks:last:flushing"
+
+
+async def record_click(short_code: str) -> None:
+    """
+    Учёт клика по ссылке в Redis без обращения к БД
+    """
+    pipe = get_redis().pipeline()
+    pipe.hincrby(CLICKS_PENDING, short_code, 1)
+    pipe.hset(CLICKS_LAST, short_code, datetime.now().astimezone().isoformat())
+    await pipe.execute()
+
+
+async def pending_clicks(short_code: str) -> Tuple[int, Optional[datetime]]:
+    """
+    Клики по ссылке, ещё не записанные в БД, и время последнего из них
+    """
+    pipe = get_redis().pipeline(transaction=False)
+    pipe.hget(CLICKS_PENDING, short_code)
+    pipe.hget(CLICKS_FLUSHING, short_code)
+    pipe.hget(CLICKS_LAST, short_code)
+    pipe.hget(CLICKS_LAST_FLUSHING, short_code)
+    pending, flushing, last, last_flushing = await pipe.execute()
+
+    clicks = int(pending or 0) + int(flushing or 0)
+    last = last or last_flushing
+    return clicks, datetime.fromisoformat(last) if last else None
+
+
+async def discard_clicks(*short_codes: str) -> None:
+    """
+    Удаление накопленных кликов удалённых ссылок
+    """
+    if not short_codes:
+        return
+    pipe = get_redis().pipeline(transaction=False)
+    for key in (CLICKS_PENDING, CLICKS_LAST, CLICKS_FLUSHING, CLICKS_LAST_FLUSHING):
+        pipe.hdel(key, *short_codes)
+    await pipe.execute()
+
+
+async def move_clicks(old_code: str, new_code: str) -> None:
+    """
+    Перенос накопленных кликов ссылки на новый короткий код (при смене алиаса).
+    Выполняется транзакцией с WATCH: при одновременном сбросе кликов перенос повторяется
+    """
+    keys = (CLICKS_PENDING, CLICKS_FLUSHING, CLICKS_LAST, CLICKS_LAST_FLUSHING)
+    async with get_redis().pipeline() as pipe:
+        while True:
+            try:
+                await pipe.watch(*keys)
+                pending, flushing, last, last_flushing = [await pipe.hget(key, old_code) for key in keys]
+                pipe.multi()
+                for key, delta in ((CLICKS_PENDING, pending), (CLICKS_FLUSHING, flushing)):
+                    if delta:
+                        pipe.hincrby(key, new_code, int(delta))
+                for key, clicked_at in ((CLICKS_LAST, last), (CLICKS_LAST_FLUSHING, last_flushing)):
+                    if clicked_at:
+                        pipe.hset(key, new_code, clicked_at)
+                for key in keys:
+                    pipe.hdel(key, old_code)
+                await pipe.execute()
+                return
+            except WatchError:
+                continue
+
+
+async def _write_flushing(session) -> int:
+    """
+    Запись забранных из буфера кликов в БД одним UPDATE ... FROM (VALUES ...).
+    Если время последнего клика не сохранилось, last_clicked_at не меняется
+    """
+    deltas = await get_redis().hgetall(CLICKS_FLUSHING)
+    last_clicks = await get_redis().hgetall(CLICKS_LAST_FLUSHING)
+    if deltas:
+        rows = [(code, int(delta), datetime.fromisoformat(last_clicks[code]) if code in last_clicks else None)
+                for code, delta in deltas.items()]
+        links = Link.__table__
+        if session.bind.dialect.name == "postgresql":
+            pending = values(column("short_code", String),
+                             column("delta", Integer),
+                             column("clicked_at", DateTime(timezone=True)),
+                             name="pending").data(rows)
+            stmt = (update(links)
+                    .where(links.c.short_code == pending.c.short_code)
+                    .values(clicks_count=links.c.clicks_count + pending.c.delta,
+                            last_clicked_at=func.coalesce(pending.c.clicked_at, links.c.last_clicked_at)))
+            await session.execute(stmt)
+        else:
+            # Диалекты без UPDATE ... FROM (VALUES ...) (SQLite в тестах) - executemany
+            stmt = (update(links)
+                    .where(links.c.short_code == bindparam("code"))
+                    .values(clicks_count=links.c.clicks_count + bindparam("delta"),
+                            last_clicked_at=func.coalesce(bindparam("clicked_at", type_=DateTime(timezone=True)),
+                                                          links.c.last_clicked_at)))
+            await session.execute(stmt, [{"code": code, "delta": delta, "clicked_at": clicked_at}
+                                         for code, delta, clicked_at in rows])
+        await session.commit()
+
+    # Счётчики записаны - чистим буфер и устаревший кэш статистики
+    pipe = get_redis().pipeline(transaction=False)
+    pipe.delete(CLICKS_FLUSHING, CLICKS_LAST_FLUSHING)
+    for code in deltas:
+        pipe.delete(f"stats:{code}")
+    await pipe.execute()
+    return len(deltas)
+
+
+async def flush_clicks(session) -> int:
+    """
+    Сброс накопленных кликов в БД.
+    Возвращает количество обновлённых ссылок
+    """
+    flushed = 0
+
+    # Если прошлый сброс не завершился - сначала дописываем его
+    if await get_redis().exists(CLICKS_FLUSHING):
+        flushed += await _write_flushing(session)
+
+    # Забираем накопленные счётчики атомарным переименованием, только если буфер записи пуст:
+    # RENAME перезаписал бы клики, которые другой процесс забрал, но ещё не записал
+    async with get_redis().pipeline() as pipe:
+        try:
+            await pipe.watch(CLICKS_PENDING, CLICKS_FLUSHING)
+            if await pipe.exists(CLICKS_FLUSHING) or not await pipe.exists(CLICKS_PENDING):
+                return flushed
+            pipe.multi()
+            pipe.rename(CLICKS_PENDING, CLICKS_FLUSHING)
+            pipe.rename(CLICKS_LAST, CLICKS_LAST_FLUSHING)
+            # Ошибка второго RENAME (нет времени кликов) не отменяет первый - клики всё равно записываются
+            await pipe.execute(raise_on_error=False)
+        except WatchError:
+            # Счётчики уже забрал другой процесс
+            return flushed
+
+    flushed += await _write_flushing(session)
+    return flushed
+
+
+async def flush_clicks_periodically():
+    """
+    Фоновая задача сброса накопленных кликов в БД
+    """
+    while True:
+        async with SessionLocal() as session:
+            await flush_clicks(session)
+
+        await asyncio.sleep(CLICKS_FLUSH_INTERVAL)
@@ -16,4 +16,70 @@ REDIS_PORT = os.getenv("REDIS_PORT")
 ASYNC_DB_URL = (f"postgresql+asyncpg://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}")
 SYNC_DB_URL = (f"postgresql+psycopg2://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}")
 
-DB_URL = ASYNC_DB_URL
+# DB_URL позволяет подключить другую БД (например, SQLite для локальных бенчмарков)
+DB_URL = os.getenv("DB_URL", ASYNC_DB_URL)
+
+# Время жизни записи редиректа в кэше Redis (сек)
+LINK_CACHE_TTL = int(os.getenv("LINK_CACHE_TTL", 3600))
+
+# Интервал сброса накопленных кликов из Redis в БД (сек)
+CLICKS_FLUSH_INTERVAL = int(os.getenv("CLICKS_FLUSH_INTERVAL", 5))
+
+# Размер общего пула соединений Redis и время ожидания свободного соединения (сек)
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", 50))
+REDIS_POOL_TIMEOUT = float(os.getenv("REDIS_POOL_TIMEOUT", 5))
+
+# Длина генерируемого короткого кода и размер блока номеров, резервируемого воркером
+SHORT_CODE_LENGTH = int(os.getenv("SHORT_CODE_LENGTH", 6))
+SHORT_CODE_BLOCK_SIZE = int(os.getenv("SHORT_CODE_BLOCK_SIZE", 1000))
+
+# Максимальное число ссылок в одном пакетном запросе
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", 10000))
+
+# Удаление устаревших ссылок: размер порции, границы адаптивного интервала (сек)
+# и запуск внутри приложения (false - только отдельным воркером `python -m app.sweeper`)
+SWEEPER_CHUNK_SIZE = int(os.getenv("SWEEPER_CHUNK_SIZE", 1000))
+SWEEPER_MIN_INTERVAL = float(os.getenv("SWEEPER_MIN_INTERVAL", 5))
+SWEEPER_MAX_INTERVAL = float(os.getenv("SWEEPER_MAX_INTERVAL", 60))
+SWEEPER_IN_APP = os.getenv("SWEEPER_IN_APP", "true").lower() == "true"
+
+# Размер страницы выдачи по умолчанию и максимальный
+PAGE_SIZE = int(os.getenv("PAGE_SIZE", 50))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", 1000))
+
+# Сколько строк за раз читается из серверного курсора при потоковой выдаче
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", 1000))
+
+# Пул соединений с БД
+DB_ECHO = os.getenv("DB_ECHO", "false").lower() == "true"
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", 100))
+
+# Подключение через PgBouncer в режиме transaction pooling:
+# пул держит PgBouncer, подготовленные выражения asyncpg отключаются
+DB_PGBOUNCER = os.getenv("DB_PGBOUNCER", "false").lower() == "true"
+
+# Кэш авторизованных пользователей: размер, время жизни записи (сек) и второй уровень в Redis
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", 10000))
+USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", 60))
+USER_CACHE_REDIS = os.getenv("USER_CACHE_REDIS", "false").lower() == "true"
+
+# Кэш статистики и поиска: время свежести записи (сек), сколько ещё отдавать устаревшую запись
+# во время обновления (сек) и коэффициент вероятностного раннего обновления
+STATS_CACHE_TTL = int(os.getenv("STATS_CACHE_TTL", 600))
+CACHE_STALE_TTL = int(os.getenv("CACHE_STALE_TTL", 300))
+CACHE_EARLY_BETA = float(os.getenv("CACHE_EARLY_BETA", 1.0))
+
+# Локальный (в памяти процесса) уровень кэша редиректов перед Redis
+LOCAL_CACHE_SIZE = int(os.getenv("LOCAL_CACHE_SIZE", 10000))
+LOCAL_CACHE_TTL = float(os.getenv("LOCAL_CACHE_TTL", 10))
+
+# Порт HTTP-сервера метрик отдельного воркера app.sweeper (0 - не запускать)
+SWEEPER_METRICS_PORT = int(os.getenv("SWEEPER_METRICS_PORT", 9100))
+
+# Время аренды фоновых задач в Redis (сек): задачи выполняет один процесс, продлевающий аренду
+SWEEPER_LEASE_TTL = float(os.getenv("SWEEPER_LEASE_TTL", 15))
@@ -1,10 +1,42 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from uuid import uuid4
+from sqlalchemy import inspect
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 from app.models import Base
-from app.config import DB_URL
-
-
-engine = create_async_engine(DB_URL, echo=True)
+from app.metrics import instrument_engine
+from app.config import (DB_URL, DB_ECHO, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT,
+                        DB_POOL_RECYCLE, DB_POOL_PRE_PING, DB_STATEMENT_CACHE_SIZE, DB_PGBOUNCER)
+
+
+def create_engine(url: str = DB_URL) -> AsyncEngine:
+    """
+    Создание движка БД с настройками пула из app.config.
+    Один движок на процесс используется и ссылками, и авторизацией
+    """
+    options = {"echo": DB_ECHO}
+    if make_url(url).get_backend_name() != "postgresql":
+        return create_async_engine(url, **options)
+
+    if DB_PGBOUNCER:
+        # Соединения пулит PgBouncer, а подготовленные выражения не переживают смену соединения
+        options["poolclass"] = NullPool
+        options["connect_args"] = {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__"}
+    else:
+        options.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW,
+                       pool_timeout=DB_POOL_TIMEOUT, pool_recycle=DB_POOL_RECYCLE,
+                       pool_pre_ping=DB_POOL_PRE_PING,
+                       connect_args={"statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+                                     "prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE})
+    return create_async_engine(url, **options)
+
+
+engine = create_engine()
+instrument_engine(engine)
 SessionLocal = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
 
 
@@ -14,10 +46,16 @@ async def get_db():
         yield session
 
 
+def _create_schema(conn) -> None:
+    # Схемой управляет Alembic: если миграции применялись, таблицы не создаём
+    if not inspect(conn).has_table("alembic_version"):
+        Base.metadata.create_all(conn)
+
+
 # Асинхронная функция инициализации базы данных
 async def init_db():
     async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_create_schema)
 
 
 async def get_async_session():
@@ -1,25 +1,45 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
+from fastapi.responses import JSONResponse
+from sqlalchemy import text
 import asyncio
 from contextlib import asynccontextmanager
 
 from app.routers import links, user_auth
-from app.db import init_db
-from app.utils import delete_old_links
+from app.db import init_db, engine
+from app.sweeper import run_background_tasks
+from app.routers import redis_client
+from app.routers.redis_client import init_redis, close_redis, get_redis
+from app.metrics import CONTENT_TYPE_LATEST, MetricsMiddleware, render_metrics, update_pool_gauges
+from app.config import SWEEPER_IN_APP
+from app.cache import cache_stats, listen_invalidations
 from app.auth.schemas import StatusResponse
+from app.auth.user_cache import user_cache
 
 
-# Создание БД при запуске и фоновой задачи удаления устаревших ссылок
+# Создание БД и пула Redis при запуске, фоновые задачи удаления устаревших ссылок и сброса кликов
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await init_db()
-    task = asyncio.create_task(delete_old_links())
+    init_redis()
+    # При SWEEPER_IN_APP=false фоновые задачи выполняет отдельный воркер app.sweeper,
+    # иначе - один из воркеров приложения (см. run_background_tasks)
+    tasks = [asyncio.create_task(listen_invalidations()), asyncio.create_task(user_cache.listen())]
+    if SWEEPER_IN_APP:
+        tasks.append(asyncio.create_task(run_background_tasks()))
     yield
-    task.cancel()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await close_redis()
 
 # Инициализация приложения
 app = FastAPI(title="URL Shortener",
               docs_url="/api/docs",
-              openapi_url="/api/docs.json")
+              openapi_url="/api/docs.json",
+              lifespan=lifespan)
+
+# Задержки и запросы к БД по роутам
+app.add_middleware(MetricsMiddleware)
 
 # Подключаем роутеры
 app.include_router(user_auth.router)
@@ -35,3 +55,59 @@ async def root():
     Возвращает JSON со статусом работы сервиса
     """
     return StatusResponse(status="App healthy")
+
+
+# Liveness: процесс жив и обрабатывает запросы
+@app.get("/health/live", response_model=StatusResponse, summary="Liveness",
+         description="Процесс сервиса отвечает")
+async def liveness():
+    """
+    Проверка, что процесс отвечает (без обращения к БД и Redis)
+    """
+    return StatusResponse(status="alive")
+
+
+# Readiness: сервис может обслуживать запросы
+@app.get("/health/ready", summary="Readiness",
+         description="Доступность БД и Redis")
+async def readiness():
+    """
+    Проверка доступности БД и Redis.
+    Возвращает 503, если хотя бы одна зависимость недоступна
+    """
+    checks = {}
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+        checks["db"] = "ok"
+    except Exception as e:
+        checks["db"] = f"error: {e.__class__.__name__}"
+    try:
+        await get_redis().ping()
+        checks["redis"] = "ok"
+    except Exception as e:
+        checks["redis"] = f"error: {e.__class__.__name__}"
+
+    ready = all(status == "ok" for status in checks.values())
+    return JSONResponse({"status": "ready" if ready else "not ready", **checks},
+                        status_code=200 if ready else 503)
+
+
+# Счётчики уровней кэша
+@app.get("/cache/stats", summary="Cache stats",
+         description="Попадания, промахи и вытеснения по уровням кэша")
+async def get_cache_stats():
+    """
+    Счётчики кэша редиректов (память процесса и Redis) и кэша авторизации
+    """
+    return {**cache_stats(), "users_local": user_cache.stats()}
+
+
+# Метрики Prometheus
+@app.get("/metrics", summary="Metrics", include_in_schema=False)
+async def metrics():
+    """
+    Метрики сервиса в текстовом формате Prometheus
+    """
+    update_pool_gauges(engine, redis_client.redis_client)
+    return Response(render_metrics(), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,142 @@
+"""
+Метрики сервиса в формате Prometheus (GET /metrics).
+Задержки запросов по роутам, запросы к БД и Redis, попадания в кэш, загрузка пулов, работа чистильщика
+"""
+import os
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from prometheus_client import (CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram,
+                               generate_latest, multiprocess)
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.config import DB_MAX_OVERFLOW
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Время обработки HTTP-запроса",
+    ["method", "route", "status"])
+REQUEST_DB_QUERIES = Histogram(
+    "http_request_db_queries", "Количество запросов к БД за HTTP-запрос", ["route"],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100))
+REQUEST_DB_TIME = Histogram(
+    "http_request_db_seconds", "Суммарное время запросов к БД за HTTP-запрос", ["route"])
+DB_QUERIES = Counter("db_queries_total", "Запросы к БД")
+REDIS_LATENCY = Histogram(
+    "redis_command_duration_seconds", "Время выполнения команды Redis", ["command"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1))
+CACHE_REQUESTS = Counter(
+    "cache_requests_total", "Обращения к кэшу по префиксу ключа (hit, stale, miss)",
+    ["prefix", "result"])
+DB_POOL_IN_USE = Gauge("db_pool_connections_in_use", "Занятые соединения пула БД")
+DB_POOL_CAPACITY = Gauge("db_pool_connections_max", "Максимум соединений пула БД (pool_size + max_overflow)")
+REDIS_POOL_IN_USE = Gauge("redis_pool_connections_in_use", "Занятые соединения пула Redis")
+REDIS_POOL_CAPACITY = Gauge("redis_pool_connections_max", "Максимум соединений пула Redis")
+SWEEPER_DURATION = Histogram("sweeper_run_duration_seconds", "Длительность прохода чистильщика")
+SWEEPER_DELETED = Counter("sweeper_deleted_links_total", "Удалённые чистильщиком ссылки")
+
+
+class RequestStats:
+    """
+    Счётчики запросов к БД в рамках одного HTTP-запроса
+    """
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_time = 0.0
+
+
+# Счётчики текущего HTTP-запроса (None вне запроса: фоновые задачи, тесты)
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """
+    Подсчёт количества и времени запросов к БД через события SQLAlchemy
+    """
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        DB_QUERIES.inc()
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.db_queries += 1
+            stats.db_time += elapsed
+
+
+def record_cache(key: str, result: str) -> None:
+    """
+    Учёт обращения к кэшу по префиксу ключа ("stats:abc" -> "stats")
+    """
+    CACHE_REQUESTS.labels(key.split(":", 1)[0], result).inc()
+
+
+def update_pool_gauges(engine: AsyncEngine, redis_client) -> None:
+    """
+    Снятие загрузки пулов БД и Redis на момент чтения метрик
+    """
+    pool = engine.sync_engine.pool
+    # NullPool и пулы SQLite не считают занятые соединения
+    if hasattr(pool, "checkedout"):
+        DB_POOL_IN_USE.set(pool.checkedout())
+        # Пул создаётся с max_overflow=DB_MAX_OVERFLOW (app.db), отрицательное значение - без ограничения
+        DB_POOL_CAPACITY.set(pool.size() + max(DB_MAX_OVERFLOW, 0))
+    if redis_client is not None:
+        redis_pool = redis_client.connection_pool
+        REDIS_POOL_IN_USE.set(len(redis_pool._in_use_connections))
+        REDIS_POOL_CAPACITY.set(redis_pool.max_connections)
+
+
+def render_metrics() -> bytes:
+    """
+    Метрики в текстовом формате.
+    При нескольких воркерах (задан PROMETHEUS_MULTIPROC_DIR) собираются метрики всех процессов
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest()
+
+
+class MetricsMiddleware:
+    """
+    ASGI-middleware: гистограммы задержки и запросов к БД по шаблону роута
+    (/links/{short_code}, а не сам код - иначе число рядов метрики не ограничено)
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _request_stats.reset(token)
+            route = scope.get("route")
+            route = getattr(route, "path", "unmatched")
+            REQUEST_LATENCY.labels(scope["method"], route, status).observe(elapsed)
+            REQUEST_DB_QUERIES.labels(route).observe(stats.db_queries)
+            REQUEST_DB_TIME.labels(route).observe(stats.db_time)
+
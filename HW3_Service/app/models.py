@@ -1,12 +1,16 @@
 from datetime import datetime
 import uuid
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, ForeignKey, Boolean, Index, Sequence
 from fastapi_users.db import SQLAlchemyBaseUserTableUUID
 from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship, declarative_base
+from sqlalchemy.orm import relationship, declarative_base, validates
+from app.urls import url_hash
 
 Base = declarative_base()
 
+# Последовательность номеров коротких кодов (см. app.shortcodes), создаётся только в PostgreSQL
+short_code_seq = Sequence("short_code_seq", metadata=Base.metadata)
+
 
 # Таблица юзеров
 class User(SQLAlchemyBaseUserTableUUID, Base):
@@ -29,6 +33,7 @@ class Link(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     original_url = Column(String, nullable=False)
+    url_hash = Column(BigInteger)
     short_code = Column(String, unique=True, index=True, nullable=False)
     owner_id = Column(UUID(as_uuid=True), ForeignKey("users.id"))
     created_at = Column(DateTime(timezone=True), default=lambda: datetime.now().astimezone())
@@ -38,3 +43,14 @@ class Link(Base):
     is_active = Column(Boolean, default=True)
 
     owner = relationship("User", back_populates='links')
+
+    # Постраничная выдача по хэшу оригинального url и по владельцу, с сортировкой по id,
+    # поиск устаревших ссылок чистильщиком (expires_at <= now)
+    __table_args__ = (Index("ix_links_url_hash_id", "url_hash", "id"),
+                      Index("ix_links_owner_id_id", "owner_id", "id"),
+                      Index("ix_links_expires_at", "expires_at"))
+
+    @validates("original_url")
+    def _set_url_hash(self, key, value):
+        self.url_hash = url_hash(value)
+        return value
@@ -1,20 +1,50 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from typing import AsyncIterator, List, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import String, any_, bindparam, insert, select
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.exc import IntegrityError
 from datetime import datetime
-from fastapi.responses import RedirectResponse
-import json
+from fastapi.responses import RedirectResponse, StreamingResponse
 
 from app.auth.users import current_active_user
 from app.db import get_db
-from app import models, utils
+from app import models
 from app.auth import schemas
-from app.routers.redis_client import redis_client
+from app.cache import cache_link, cached_load, get_cached_link, invalidate_link, invalidate_searches
+from app.clicks import discard_clicks, move_clicks, pending_clicks, record_click
+from app.shortcodes import allocator
+from app.urls import normalize_url, url_hash
+from app.config import PAGE_SIZE, MAX_PAGE_SIZE, STREAM_BATCH_SIZE
 
 # Основной роутер
 router = APIRouter(prefix="/links", tags=['Links'])
 
+# Сколько раз заменять сгенерированный код, если его уже занял пользовательский алиас
+SHORT_CODE_RETRIES = 3
+
+
+async def save_link(db: AsyncSession, new_link: models.Link, custom_alias: bool) -> models.Link:
+    """
+    Сохранение новой ссылки в БД.
+    Сгенерированный код может совпасть только с пользовательским алиасом - тогда выдаём следующий
+    """
+    for _ in range(SHORT_CODE_RETRIES):
+        db.add(new_link)
+        try:
+            await db.commit()
+            return new_link
+        except IntegrityError:
+            await db.rollback()
+            if custom_alias:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Алиас уже существует")
+            new_link.short_code = await allocator.allocate(db)
+    raise HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Не удалось выделить короткий код")
+
 
 @router.post("/shorten", response_model=schemas.LinkResponse)
 async def create_link(
@@ -36,7 +66,7 @@ async def create_link(
                 detail="Алиас уже существует")
         short_code = str(link_data.custom_alias)
     else:
-        short_code = str(utils.generate_short_code())
+        short_code = await allocator.allocate(db)
 
     # Если алиаса нет - создаём новую ссылку
     new_link = models.Link(
@@ -48,32 +78,127 @@ async def create_link(
         last_clicked_at=datetime.now().astimezone(),
         clicks_count=0)
 
-    db.add(new_link)
-    await db.commit()
+    await save_link(db, new_link, custom_alias=bool(link_data.custom_alias))
     await db.refresh(new_link)
+    await cache_link(new_link.short_code, new_link.original_url, new_link.expires_at)
+    await invalidate_searches([new_link.original_url])
     return new_link
 
 
+async def taken_codes(db: AsyncSession, codes: List[str]) -> set:
+    """
+    Коды из списка, уже занятые в БД (одним запросом)
+    """
+    if not codes:
+        return set()
+    if db.bind.dialect.name == "postgresql":
+        condition = models.Link.short_code == any_(
+            bindparam("codes", codes, type_=ARRAY(String)))
+    else:
+        condition = models.Link.short_code.in_(codes)
+    result = await db.execute(select(models.Link.short_code).where(condition))
+    return set(result.scalars())
+
+
+@router.post("/shorten/batch", response_model=List[schemas.LinkBatchItemResult])
+async def create_links_batch(
+    batch: schemas.LinkBatchCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user=Depends(current_active_user),
+):
+    """
+    Пакетное создание коротких ссылок.
+    Все алиасы проверяются одним запросом, ссылки вставляются одним INSERT ... RETURNING,
+    для каждого элемента пакета возвращается созданная ссылка или причина ошибки
+    """
+    items = batch.items
+    results = [schemas.LinkBatchItemResult(index=i) for i in range(len(items))]
+
+    # Сначала проверяем элементы: отклонённый элемент не резервирует свой алиас
+    aliases = {}
+    for i, item in enumerate(items):
+        if item.expires_at is None:
+            results[i].error = "Не указан срок действия ссылки"
+        else:
+            aliases[i] = str(item.custom_alias) if item.custom_alias else None
+
+    # Проверяем все алиасы пакета одним запросом, повторный алиас в пакете - тоже ошибка
+    taken = await taken_codes(db, [alias for alias in aliases.values() if alias])
+    for i, alias in list(aliases.items()):
+        if alias is None:
+            continue
+        if alias in taken:
+            results[i].error = "Алиас уже существует"
+            del aliases[i]
+        else:
+            taken.add(alias)
+
+    now = datetime.now().astimezone()
+    for _ in range(SHORT_CODE_RETRIES):
+        if not aliases:
+            return results
+
+        # Коды для элементов без алиаса выдаём одним блоком
+        generated = iter(await allocator.allocate_many(
+            sum(alias is None for alias in aliases.values()), db))
+        rows = [{
+            "original_url": str(items[i].original_url),
+            "url_hash": url_hash(str(items[i].original_url)),
+            "short_code": alias or next(generated),
+            "owner_id": current_user.id,
+            "expires_at": items[i].expires_at.astimezone(),
+            "created_at": now,
+            "last_clicked_at": now,
+            "clicks_count": 0} for i, alias in aliases.items()]
+
+        stmt = insert(models.Link).returning(models.Link, sort_by_parameter_order=True)
+        try:
+            created = (await db.scalars(stmt, rows)).all()
+            await db.commit()
+        except IntegrityError:
+            # Алиас заняли параллельным запросом между проверкой и вставкой - такие элементы отклоняем.
+            # Иначе сгенерированный код совпал с алиасом - выдаём новые коды и повторяем вставку
+            await db.rollback()
+            taken = await taken_codes(db, [alias for alias in aliases.values() if alias])
+            for i in [i for i, alias in aliases.items() if alias in taken]:
+                results[i].error = "Алиас уже существует"
+                del aliases[i]
+            continue
+
+        for i, link in zip(aliases, created):
+            results[i].link = schemas.LinkResponse.model_validate(link)
+        await invalidate_searches(link.original_url for link in created)
+        return results
+
+    raise HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Не удалось выделить короткий код")
+
+
 @router.get("/{short_code}")
 async def redirect_link(short_code: str, db: AsyncSession = Depends(get_db)):
     """
     Редирект с короткого кода ссылки на оригинальный url
     """
-    stmt = select(models.Link).where(models.Link.short_code == short_code)
-    result = await db.execute(stmt)
-    link = result.scalar_one_or_none()
-    if not link:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Ссылка не найдена")
+    # Сначала ищем ссылку в кэше, при промахе - в БД
+    link = await get_cached_link(short_code)
+    if link is None:
+        stmt = (select(models.Link.original_url, models.Link.expires_at)
+                .where(models.Link.short_code == short_code))
+        result = await db.execute(stmt)
+        row = result.one_or_none()
+        if not row:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Ссылка не найдена")
+        link = {"original_url": row.original_url, "expires_at": row.expires_at.astimezone()}
+        await cache_link(short_code, link["original_url"], link["expires_at"])
 
     # Проверяем expires_at
-    if link.expires_at and link.expires_at < datetime.now().astimezone():
+    if link["expires_at"] < datetime.now().astimezone():
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Ссылка истекла")
 
-    # Обновляем статистику
-    link.clicks_count += 1
-    link.last_clicked_at = datetime.now().astimezone()
-    await db.commit()
-    return RedirectResponse(link.original_url)
+    # Клик копится в Redis и попадёт в БД при ближайшем сбросе
+    await record_click(short_code)
+    return RedirectResponse(link["original_url"])
 
 
 @router.get("/{short_code}/stats", response_model=schemas.LinkResponse)
@@ -81,24 +206,27 @@ async def get_link_stats(short_code: str, db: AsyncSession = Depends(get_db)):
     """
     Получение статистики о ссылке по её короткому коду
     """
-    # Проверка кэширования в redis
-    cache_key = f"stats:{short_code}"
-    cached = redis_client.get(cache_key)
-    if cached:
-        return json.loads(cached)
-
-    # Если нет кэша - делаем запрос в БД
-    stmt = select(models.Link).where(models.Link.short_code == short_code)
-    result = await db.execute(stmt)
-    link = result.scalar_one_or_none()
-    if not link:
+    async def load_link():
+        stmt = select(models.Link).where(models.Link.short_code == short_code)
+        result = await db.execute(stmt)
+        link = result.scalar_one_or_none()
+        if not link:
+            return None
+        # Преобразуем результат через Pydantic-схему для сохранения в Redis
+        return schemas.LinkResponse.model_validate(link).model_dump(mode="json")
+
+    # Чтение через кэш redis: при истечении ключа в БД идёт один запрос
+    link_data = await cached_load(f"stats:{short_code}", load_link)
+    if link_data is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Ссылка не найдена")
 
-    # Преобразуем результат через Pydantic-схему и сохраняем данные в Redis
-    link_data = schemas.LinkResponse.model_validate(link).model_dump()
-    redis_client.setex(cache_key, 600, json.dumps(link_data, default=str))
-
-    return link
+    # Добавляем клики, ещё не записанные в БД (в копию - значение общее для объединённых запросов)
+    link_data = dict(link_data)
+    clicks, last_clicked_at = await pending_clicks(short_code)
+    link_data["clicks_count"] += clicks
+    if last_clicked_at:
+        link_data["last_clicked_at"] = last_clicked_at
+    return link_data
 
 
 @router.delete("/{short_code}", response_model=schemas.LinkResponse)
@@ -122,8 +250,8 @@ async def delete_link(
 
     await db.delete(link)
     await db.commit()
-    redis_client.delete(short_code)
-    redis_client.delete(f"stats:{short_code}")
+    await invalidate_link(short_code, link.original_url)
+    await discard_clicks(short_code)
 
     return link
 
@@ -148,9 +276,7 @@ async def update_link(
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
                             detail="Недостаточно прав для обновления ссылки")
 
-    # Очистка кэша перед обновлением ссылки
-    redis_client.delete(short_code)
-    redis_client.delete(f"stats:{short_code}")
+    old_url = link.original_url
 
     # Проверка alias
     if update_data.custom_alias and update_data.custom_alias != link.short_code:
@@ -166,31 +292,51 @@ async def update_link(
 
     await db.commit()
     await db.refresh(link)
+
+    # Кэш чистится после commit: редирект, попавший между очисткой и commit, закэшировал бы старый url.
+    # При смене алиаса чистятся записи и старого, и нового кода
+    await invalidate_link(short_code, old_url)
+    if link.short_code != short_code:
+        await invalidate_link(link.short_code)
+        # Клики, ещё не записанные в БД, копятся по коду - переносим их на новый
+        await move_clicks(short_code, link.short_code)
+    if link.original_url != old_url:
+        await invalidate_searches([link.original_url])
+    await cache_link(link.short_code, link.original_url, link.expires_at)
     return link
 
 
-@router.get("/search/")
-async def search_link(original_url: str, db: AsyncSession = Depends(get_db)):
+@router.get("/search/", response_model=schemas.LinkPage)
+async def search_link(
+    original_url: str,
+    limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_db),
+):
     """
-    Поиск короткой ссылки по оригинальному url
+    Поиск всех коротких ссылок по оригинальному url с постраничной выдачей
     """
-    # Проверка кэширования
-    cache_key = f"search:{original_url}"
-    cached = redis_client.get(cache_key)
-    if cached:
-        return json.loads(cached)
+    url = normalize_url(original_url)
 
-    # Если нет кэша - запрос в БД
-    stmt = select(models.Link).where(models.Link.original_url == original_url)
-    result = await db.execute(stmt)
+    async def load_page():
+        # Поиск по индексу (url_hash, id)
+        stmt = (select(models.Link)
+                .where(models.Link.url_hash == url_hash(url), models.Link.original_url == url)
+                .order_by(models.Link.id)
+                .limit(limit + 1))
+        if after_id is not None:
+            stmt = stmt.where(models.Link.id > after_id)
+        links = (await db.scalars(stmt)).all()
 
-    # Если нашли ссылку
-    link = result.scalar_one_or_none()
-    if link:
-        link_data = schemas.LinkResponse.model_validate(link).model_dump()
-        redis_client.setex(cache_key, 600, json.dumps(link_data, default=str))
-        return link_data
-    return None
+        page = schemas.LinkPage(
+            items=links[:limit],
+            next_cursor=links[limit - 1].id if len(links) > limit else None)
+        return page.model_dump(mode="json")
+
+    # Кэшируем только первую страницу стандартного размера
+    if after_id is None and limit == PAGE_SIZE:
+        return await cached_load(f"search:{url}", load_page)
+    return await load_page()
 
 
 @router.post("/public", response_model=schemas.LinkResponse)
@@ -210,7 +356,7 @@ async def shorten_url_public(link_data: schemas.LinkCreate,
                 detail="Алиас уже существует")
         short_code = str(link_data.custom_alias)
     else:
-        short_code = str(utils.generate_short_code())
+        short_code = await allocator.allocate(db)
 
     # Если алиаса нет - создаём новую ссылку
     new_link = models.Link(
@@ -221,21 +367,49 @@ async def shorten_url_public(link_data: schemas.LinkCreate,
         last_clicked_at=datetime.now().astimezone(),
         clicks_count=0)
 
-    db.add(new_link)
-    await db.commit()
+    await save_link(db, new_link, custom_alias=bool(link_data.custom_alias))
     await db.refresh(new_link)
+    await cache_link(new_link.short_code, new_link.original_url, new_link.expires_at)
+    await invalidate_searches([new_link.original_url])
     return new_link
 
 
-@router.get("/user/all", response_model=List[schemas.LinkResponse])
+async def stream_links(db: AsyncSession, stmt) -> AsyncIterator[str]:
+    """
+    Потоковая выдача ссылок в формате NDJSON через серверный курсор.
+    Читаются только колонки (без ORM-объектов), поэтому память не растёт с числом ссылок
+    """
+    result = await db.stream(stmt.execution_options(yield_per=STREAM_BATCH_SIZE))
+    async for rows in result.partitions():
+        yield "".join(schemas.LinkResponse.model_validate(row._mapping).model_dump_json() + "\n"
+                      for row in rows)
+
+
+@router.get("/user/all", response_model=schemas.LinkPage)
 async def get_user_links(
+    limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after_id: Optional[int] = None,
+    stream: bool = False,
     db: AsyncSession = Depends(get_db),
     current_user=Depends(current_active_user)
 ):
     """
-    Получение списка всех ссылок пользователя с их статусом
+    Получение ссылок пользователя с их статусом.
+    Постранично по индексу (owner_id, id), либо все ссылки потоком NDJSON при stream=true
     """
-    stmt = select(models.Link).where(models.Link.owner_id == current_user.id)
-    result = await db.execute(stmt)
-    links = result.scalars().all()
-    return links
+    if stream:
+        columns = [getattr(models.Link, name) for name in schemas.LinkResponse.model_fields]
+        stmt = select(*columns)
+    else:
+        stmt = select(models.Link)
+    stmt = stmt.where(models.Link.owner_id == current_user.id).order_by(models.Link.id)
+    if after_id is not None:
+        stmt = stmt.where(models.Link.id > after_id)
+
+    if stream:
+        return StreamingResponse(stream_links(db, stmt), media_type="application/x-ndjson")
+
+    links = (await db.scalars(stmt.limit(limit + 1))).all()
+    return schemas.LinkPage(
+        items=links[:limit],
+        next_cursor=links[limit - 1].id if len(links) > limit else None)
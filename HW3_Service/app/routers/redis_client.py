@@ -1,5 +1,74 @@
-import redis
-from app.config import REDIS_HOST, REDIS_PORT
+import time
+from typing import Optional
+import redis.asyncio as redis
+from redis.asyncio.client import Pipeline
+from app.config import REDIS_HOST, REDIS_PORT, REDIS_MAX_CONNECTIONS, REDIS_POOL_TIMEOUT
+from app.metrics import REDIS_LATENCY
 
-# Подключение клиента Redis
-redis_client = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, decode_responses=True)
+
+class InstrumentedPipeline(Pipeline):
+    """
+    Конвейер Redis, замеряющий время выполнения всей пачки команд.
+    Метка - имена команд пачки через "+", например GET+TTL
+    """
+
+    async def execute(self, raise_on_error: bool = True):
+        # execute очищает стек команд, поэтому метка собирается заранее
+        command = "+".join(str(args[0]).upper() for args, _ in self.command_stack)
+        start = time.perf_counter()
+        try:
+            return await super().execute(raise_on_error)
+        finally:
+            if command:
+                REDIS_LATENCY.labels(command).observe(time.perf_counter() - start)
+
+
+class InstrumentedRedis(redis.Redis):
+    """
+    Клиент Redis, замеряющий время каждой команды и конвейера (с учётом ожидания соединения из пула)
+    """
+
+    async def execute_command(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        finally:
+            REDIS_LATENCY.labels(str(args[0]).upper()).observe(time.perf_counter() - start)
+
+    def pipeline(self, transaction: bool = True, shard_hint: Optional[str] = None) -> InstrumentedPipeline:
+        return InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+# Асинхронный клиент Redis с общим пулом соединений (создаётся в lifespan приложения)
+redis_client: Optional[redis.Redis] = None
+
+
+def init_redis() -> redis.Redis:
+    """
+    Создание клиента Redis с ограниченным пулом соединений
+    """
+    global redis_client
+    if redis_client is None:
+        pool = redis.BlockingConnectionPool(
+            host=REDIS_HOST, port=REDIS_PORT, decode_responses=True,
+            max_connections=REDIS_MAX_CONNECTIONS, timeout=REDIS_POOL_TIMEOUT)
+        redis_client = InstrumentedRedis(connection_pool=pool)
+    return redis_client
+
+
+def get_redis() -> redis.Redis:
+    """
+    Получение клиента Redis.
+    Если lifespan не запускался (тесты, фоновые воркеры) - клиент создаётся при первом обращении
+    """
+    return redis_client or init_redis()
+
+
+async def close_redis() -> None:
+    """
+    Закрытие клиента и пула соединений Redis
+    """
+    global redis_client
+    if redis_client is not None:
+        await redis_client.aclose(close_connection_pool=True)
+        redis_client = None
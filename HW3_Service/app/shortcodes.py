@@ -0,0 +1,100 @@
+import string
+from collections import deque
+from math import gcd
+from typing import Iterable, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import SHORT_CODE_LENGTH, SHORT_CODE_BLOCK_SIZE
+from app.routers.redis_client import get_redis
+
+ALPHABET = string.digits + string.ascii_letters
+BASE = len(ALPHABET)
+
+# Последовательность номеров в PostgreSQL
+SEQUENCE_NAME = "short_code_seq"
+# Счётчик номеров в Redis - только для БД без последовательностей (SQLite в тестах)
+SEQUENCE_KEY = "shortcode:seq"
+
+
+def encode(number: int, length: int) -> str:
+    """
+    Кодирование числа в base62 строку фиксированной длины
+    """
+    chars = []
+    for _ in range(length):
+        number, rem = divmod(number, BASE)
+        chars.append(ALPHABET[rem])
+    return ''.join(reversed(chars))
+
+
+class ShortCodeAllocator:
+    """
+    Выдача уникальных коротких кодов без обращения к БД на каждый код.
+    Воркер резервирует блок номеров одним запросом и выдаёт коды из него локально.
+    Номер переставляется биективно по модулю 62**length, поэтому коды не идут подряд
+    и не повторяются, пока не исчерпано всё пространство кодов.
+
+    Если передана сессия PostgreSQL, номера берутся из последовательности SEQUENCE_NAME:
+    она переживает перезапуск и очистку Redis. Номера последовательности сдвинуты на половину
+    пространства, поэтому не совпадают с номерами, выданными раньше счётчиком Redis
+    """
+
+    def __init__(self, length: int = SHORT_CODE_LENGTH, block_size: int = SHORT_CODE_BLOCK_SIZE,
+                 sequence_name: str = SEQUENCE_NAME, sequence_key: str = SEQUENCE_KEY):
+        self.length = length
+        self.block_size = block_size
+        self.sequence_name = sequence_name
+        self.sequence_key = sequence_key
+        self.space = BASE ** length
+
+        # Множитель взаимно прост с размером пространства - перестановка биективна
+        multiplier = int(self.space * 0.6180339887) | 1
+        while gcd(multiplier, self.space) != 1:
+            multiplier += 2
+        self._multiplier = multiplier
+        self._offset = self.space // 3
+
+        # Зарезервированные, но ещё не выданные номера
+        self._numbers = deque()
+
+    def _scramble(self, number: int) -> str:
+        return encode((number * self._multiplier + self._offset) % self.space, self.length)
+
+    async def _reserve(self, db: Optional[AsyncSession], count: int) -> Iterable[int]:
+        if db is not None and db.bind.dialect.name == "postgresql":
+            # nextval не откатывается вместе с транзакцией сессии
+            result = await db.execute(
+                text("SELECT nextval(CAST(:name AS regclass)) FROM generate_series(1, :count)"),
+                {"name": self.sequence_name, "count": count})
+            # Последовательность начинается с 1
+            numbers = [self.space // 2 + value - 1 for value in result.scalars()]
+            limit = self.space
+        else:
+            end = await get_redis().incrby(self.sequence_key, count)
+            numbers = range(end - count, end)
+            limit = self.space // 2
+        if max(numbers) >= limit:
+            raise RuntimeError(f"Исчерпано пространство коротких кодов длины {self.length}")
+        return numbers
+
+    async def allocate_many(self, count: int, db: Optional[AsyncSession] = None) -> List[str]:
+        """
+        Выдача count уникальных кодов (db - сессия, через которую резервируются номера в PostgreSQL)
+        """
+        while len(self._numbers) < count:
+            # Параллельные корутины могут зарезервировать блоки одновременно -
+            # лишние номера остаются в запасе
+            needed = count - len(self._numbers)
+            self._numbers.extend(await self._reserve(db, max(self.block_size, needed)))
+        return [self._scramble(self._numbers.popleft()) for _ in range(count)]
+
+    async def allocate(self, db: Optional[AsyncSession] = None) -> str:
+        """
+        Выдача одного уникального кода
+        """
+        return (await self.allocate_many(1, db))[0]
+
+
+allocator = ShortCodeAllocator()
@@ -0,0 +1,105 @@
+"""
+Фоновые задачи: удаление устаревших ссылок и сброс кликов в БД.
+Задачи выполняет только один процесс - владелец аренды в Redis, поэтому их можно
+запускать и в каждом воркере приложения (SWEEPER_IN_APP=true), и отдельным воркером.
+
+Метрики отдельного воркера доступны на порту SWEEPER_METRICS_PORT.
+
+Запуск отдельного воркера: python -m app.sweeper
+"""
+import asyncio
+import logging
+import os
+from uuid import uuid4
+
+from prometheus_client import start_http_server
+from redis.exceptions import RedisError, WatchError
+
+from app.config import SWEEPER_METRICS_PORT, SWEEPER_LEASE_TTL
+from app.clicks import flush_clicks_periodically
+from app.routers.redis_client import init_redis, close_redis, get_redis
+from app.utils import delete_old_links
+
+logger = logging.getLogger(__name__)
+
+# Ключ аренды фоновых задач, значение - метка процесса-владельца
+LEASE_KEY = "sweeper:lease"
+
+
+async def _update_lease(token: str, ttl_ms: int, release: bool = False) -> bool:
+    """
+    Продление (или освобождение) аренды, только если она всё ещё принадлежит token
+    """
+    async with get_redis().pipeline(transaction=True) as pipe:
+        try:
+            await pipe.watch(LEASE_KEY)
+            if await pipe.get(LEASE_KEY) != token:
+                return False
+            pipe.multi()
+            if release:
+                pipe.delete(LEASE_KEY)
+            else:
+                pipe.pexpire(LEASE_KEY, ttl_ms)
+            await pipe.execute()
+            return True
+        except WatchError:
+            return False
+
+
+async def run_background_tasks(lease_ttl: float = SWEEPER_LEASE_TTL):
+    """
+    Выполнение фоновых задач в единственном процессе.
+    Процесс, захвативший аренду, запускает задачи и продлевает её каждые lease_ttl / 3 сек.
+    Остальные ждут: если владелец завис или упал, аренда истечёт и задачи подхватит другой процесс
+    """
+    token = uuid4().hex
+    ttl_ms = int(lease_ttl * 1000)
+    while True:
+        try:
+            acquired = await get_redis().set(LEASE_KEY, token, nx=True, px=ttl_ms)
+        except RedisError:
+            logger.warning("Redis недоступен, аренда фоновых задач не захвачена")
+            acquired = False
+        if not acquired:
+            await asyncio.sleep(lease_ttl / 3)
+            continue
+
+        logger.info("Фоновые задачи выполняет процесс %s", os.getpid())
+        tasks = [asyncio.create_task(delete_old_links()),
+                 asyncio.create_task(flush_clicks_periodically())]
+        try:
+            while not any(task.done() for task in tasks):
+                await asyncio.sleep(lease_ttl / 3)
+                if not await _update_lease(token, ttl_ms):
+                    logger.warning("Аренда фоновых задач потеряна")
+                    break
+        except RedisError:
+            logger.warning("Аренда фоновых задач не продлена: Redis недоступен")
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            try:
+                await _update_lease(token, ttl_ms, release=True)
+            except RedisError:
+                pass
+        for task in tasks:
+            if not task.cancelled() and task.exception() is not None:
+                logger.error("Фоновая задача завершилась с ошибкой", exc_info=task.exception())
+        # Пауза перед следующей попыткой, чтобы падающая задача не перезапускалась без остановки
+        await asyncio.sleep(lease_ttl / 3)
+
+
+async def main():
+    init_redis()
+    try:
+        await run_background_tasks()
+    finally:
+        await close_redis()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    if SWEEPER_METRICS_PORT:
+        start_http_server(SWEEPER_METRICS_PORT)
+    asyncio.run(main())
@@ -0,0 +1,23 @@
+import hashlib
+from pydantic import HttpUrl, TypeAdapter, ValidationError
+
+_http_url = TypeAdapter(HttpUrl)
+
+
+def normalize_url(url: str) -> str:
+    """
+    Приведение url к виду, в котором он хранится в БД (как после валидации HttpUrl)
+    """
+    try:
+        return str(_http_url.validate_python(url))
+    except ValidationError:
+        return url
+
+
+def url_hash(url: str) -> int:
+    """
+    Хэш url фиксированной ширины: первые 8 байт sha256 как знаковое 64-битное число.
+    Совпадает с SQL-выражением из миграции 0002_link_url_hash
+    """
+    digest = hashlib.sha256(url.encode()).digest()
+    return int.from_bytes(digest[:8], "big", signed=True)
@@ -1,40 +1,67 @@
-import secrets
-import string
-from datetime import datetime, timezone
+from datetime import datetime
 import asyncio
-from sqlalchemy import select
+import logging
+import time
+from sqlalchemy import delete, select
 
+from app.config import SWEEPER_CHUNK_SIZE, SWEEPER_MIN_INTERVAL, SWEEPER_MAX_INTERVAL
 from app.db import SessionLocal
-from app.routers.redis_client import redis_client
+from app.cache import invalidate_links
+from app.clicks import discard_clicks
 from app.models import Link
+from app.metrics import SWEEPER_DURATION, SWEEPER_DELETED
 
+logger = logging.getLogger(__name__)
 
-def generate_short_code(length: int = 6) -> str:
+
+async def sweep_expired_links(session, chunk_size: int = SWEEPER_CHUNK_SIZE) -> int:
     """
-    Генерация случайного короткого кода
+    Удаление одной порции устаревших ссылок одним DELETE ... RETURNING.
+    Возвращает количество удалённых ссылок
     """
-    alphabet = string.ascii_letters + string.digits
-    return ''.join(secrets.choice(alphabet) for _ in range(length))
+    now = datetime.now().astimezone()
+    # SKIP LOCKED - параллельные чистильщики забирают разные строки, а не ждут друг друга
+    expired = (select(Link.id)
+               .where(Link.expires_at <= now)
+               .limit(chunk_size)
+               .with_for_update(skip_locked=True))
+    stmt = (delete(Link)
+            .where(Link.id.in_(expired.scalar_subquery()))
+            .returning(Link.short_code, Link.original_url)
+            .execution_options(synchronize_session=False))
+    deleted = (await session.execute(stmt)).all()
+    await session.commit()
+
+    # Чистим кэш и буфер кликов удалённых ссылок пачкой
+    if deleted:
+        await invalidate_links(deleted)
+        await discard_clicks(*(short_code for short_code, _ in deleted))
+    return len(deleted)
 
 
 async def delete_old_links():
     """
-    Фоновая задача удаления устаревших ссылок
+    Фоновая задача удаления устаревших ссылок.
+    Пока есть полные порции - удаляет без пауз, иначе увеличивает интервал до SWEEPER_MAX_INTERVAL
     """
+    interval = SWEEPER_MIN_INTERVAL
     while True:
+        total = 0
+        start = time.perf_counter()
         async with SessionLocal() as session:
-            now = datetime.now(timezone.utc).replace(tzinfo=None)
-            expired_links = await session.execute(
-                select(Link).where(Link.expires_at.isnot(None), Link.expires_at <= now))
-            expired_links = expired_links.scalars().all()
-
-            # удаляем из основной таблицы и из кэша
-            for link in expired_links:
-                await session.delete(link)
-                redis_client.delete(link.short_code)
-                redis_client.delete(f"stats:{link.short_code}")
-                redis_client.delete(f"search:{link.original_url}")
-
-            await session.commit()
+            while True:
+                deleted = await sweep_expired_links(session)
+                total += deleted
+                if deleted < SWEEPER_CHUNK_SIZE:
+                    break
+                # Отдаём управление циклу событий между порциями
+                await asyncio.sleep(0)
+        SWEEPER_DURATION.observe(time.perf_counter() - start)
+        SWEEPER_DELETED.inc(total)
 
-        await asyncio.sleep(30)
+        if total:
+            logger.info("Удалено устаревших ссылок: %s", total)
+            interval = SWEEPER_MIN_INTERVAL
+        else:
+            interval = min(interval * 2, SWEEPER_MAX_INTERVAL)
+        await asyncio.sleep(interval)
@@ -3,5 +3,16 @@
 # Миграция
 alembic upgrade head
 
-# Запуск приложения
-uvicorn app.main:app --host 0.0.0.0 --port 8000
\ No newline at end of file
+# Режим разработки: один процесс с перезагрузкой при изменении кода
+if [ "$APP_MODE" = "dev" ]; then
+    exec uvicorn app.main:app --host 0.0.0.0 --port 8000 --reload
+fi
+
+# Метрики воркеров собираются через общий каталог (очищается при старте)
+export PROMETHEUS_MULTIPROC_DIR=${PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus}
+rm -rf "$PROMETHEUS_MULTIPROC_DIR" && mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+
+# Запуск приложения: по воркеру на ядро, цикл событий uvloop и парсер httptools
+exec uvicorn app.main:app --host 0.0.0.0 --port 8000 \
+    --workers "${WEB_CONCURRENCY:-$(nproc)}" --loop uvloop --http httptools \
+    --timeout-graceful-shutdown 30
@@ -0,0 +1,87 @@
+"""
+Бенчмарк выдачи коротких кодов из последовательности PostgreSQL.
+Таблица ссылок дозаполняется до каждого размера из TABLE_SIZES (tests.load.seed),
+после чего замеряется выдача кодов и создание ссылки с выданным кодом.
+Аллокатор не читает таблицу, поэтому время на код не растёт вместе с её размером,
+в отличие от вероятности коллизии у прежнего случайного кода.
+
+Запуск (нужен PostgreSQL из .env): python -m tests.benchmark_shortcodes
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select, text
+
+from app.db import SessionLocal, engine
+from app.models import Link
+from app.shortcodes import BASE, ShortCodeAllocator
+from tests.load.seed import seed
+
+# До скольких ссылок дозаполняется таблица перед замером
+TABLE_SIZES = [0, 100_000, 1_000_000, 10_000_000]
+
+# Сколько кодов выдаём в каждом замере
+CODES_PER_RUN = 100_000
+
+# Сколько ссылок создаём в каждом замере (вставки откатываются, таблица не растёт)
+LINKS_PER_RUN = 1_000
+
+# Отдельная последовательность, чтобы не сдвигать боевую
+BENCH_SEQUENCE = "short_code_bench_seq"
+
+
+async def bench_allocator(length: int) -> float:
+    """
+    Среднее время выдачи одного кода (мкс), включая резервирование блоков в последовательности
+    """
+    allocator = ShortCodeAllocator(length=length, sequence_name=BENCH_SEQUENCE)
+    async with SessionLocal() as db:
+        start = time.perf_counter()
+        for _ in range(CODES_PER_RUN):
+            await allocator.allocate(db)
+        return (time.perf_counter() - start) / CODES_PER_RUN * 1e6
+
+
+async def bench_create(length: int) -> float:
+    """
+    Среднее время создания одной ссылки (мкс): выдача кода и вставка в таблицу с уникальным индексом
+    """
+    allocator = ShortCodeAllocator(length=length, sequence_name=BENCH_SEQUENCE)
+    expires_at = datetime.now().astimezone() + timedelta(days=1)
+    async with SessionLocal() as db:
+        start = time.perf_counter()
+        for _ in range(LINKS_PER_RUN):
+            db.add(Link(original_url="https://bench.example.com/shortcode",
+                        short_code=await allocator.allocate(db), expires_at=expires_at))
+            await db.flush()
+        elapsed = time.perf_counter() - start
+        await db.rollback()
+    return elapsed / LINKS_PER_RUN * 1e6
+
+
+async def main(length: int = 6):
+    async with engine.begin() as conn:
+        await conn.execute(text(f"CREATE SEQUENCE IF NOT EXISTS {BENCH_SEQUENCE}"))
+
+    print(f"Длина кода: {length}, пространство кодов: {BASE ** length:,}")
+    print(f"{'Ссылок в таблице':>18} | {'мкс на код':>10} | {'мкс на ссылку':>13} | "
+          f"{'P(коллизии) у случайного кода':>30}")
+    try:
+        for table_size in TABLE_SIZES:
+            await seed(table_size, batch_size=10_000)
+            async with engine.begin() as conn:
+                links = await conn.scalar(select(func.count()).select_from(Link))
+            per_code = await bench_allocator(length)
+            per_link = await bench_create(length)
+            # Прежний generate_short_code: вероятность попасть в уже занятый код
+            collision = links / BASE ** length
+            print(f"{links:>18,} | {per_code:>10.2f} | {per_link:>13.2f} | {collision:>30.6f}")
+    finally:
+        async with engine.begin() as conn:
+            await conn.execute(text(f"DROP SEQUENCE IF EXISTS {BENCH_SEQUENCE}"))
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,16 @@
+import pytest_asyncio
+
+from app.cache import local_links
+from app.routers.redis_client import close_redis
+
+
+@pytest_asyncio.fixture(autouse=True)
+async def redis_pool():
+    """
+    Закрытие пула Redis после каждого теста:
+    у каждого теста свой event loop, а соединения к нему привязаны.
+    Локальный кэш ссылок очищается, чтобы тесты не видели записи друг друга
+    """
+    yield
+    local_links.clear()
+    await close_redis()
@@ -1,13 +1,21 @@
 import pytest_asyncio
 import pytest
+import json
+import uuid
 from datetime import datetime, timedelta
+from types import SimpleNamespace
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
 from httpx import ASGITransport, AsyncClient
 from typing import Callable
 
 from app.main import app
 from app.models import Base
 from app.db import get_db
+from app.cache import get_cached_link
+from app.auth.users import current_active_user
+from app.auth.user_cache import user_cache
+from app.shortcodes import allocator
 
 # from unittest.mock import AsyncMock
 # from app.routers.redis_client import redis_client
@@ -76,6 +84,7 @@ API_AUTH_REGISTER = "/auth/register"
 API_AUTH_LOGIN = "/auth/jwt/login"
 API_CREATE_PUBLIC = "/links/public"
 API_CREATE_SHORTEN = "/links/shorten"
+API_CREATE_BATCH = "/links/shorten/batch"
 API_REDIRECT = "/links"
 API_LINK_STATS = "/links"
 API_SEARCH = "/links/search/"
@@ -116,7 +125,7 @@ async def auth_headers(async_client: AsyncClient, user_data: dict):
     # Заголовок с токеном
     headers = {"Authorization": f"Bearer {token}"}
     yield headers
-    await async_client.close()
+    await async_client.aclose()
 
 
 # Основные тесты
@@ -169,7 +178,57 @@ async def test_search_link(async_client: AsyncClient):
     resp_search = await async_client.get(API_SEARCH, params={"original_url": "http://search.com"})
     assert resp_search.status_code == 200
     found_data = resp_search.json()
-    assert found_data is None
+    assert found_data == {"items": [], "next_cursor": None}
+
+
+async def test_search_after_create(async_client: AsyncClient):
+    """
+    Тестируем, что закэшированный пустой результат поиска сбрасывается при создании ссылки
+    (одиночном и пакетном) на тот же url
+    """
+    # Уникальный url: Redis общий для запусков тестов
+    url = f"http://search-after-{uuid.uuid4().hex}.com"
+    params = {"original_url": url}
+    resp = await async_client.get(API_SEARCH, params=params)
+    assert resp.json() == {"items": [], "next_cursor": None}
+
+    plus_day = (datetime.now() + timedelta(days=1)).isoformat()
+    resp = await async_client.post(API_CREATE_PUBLIC, json={
+        "original_url": url, "expires_at": plus_day})
+    assert resp.status_code == 200, resp.text
+    resp = await async_client.get(API_SEARCH, params=params)
+    assert len(resp.json()["items"]) == 1
+
+    app.dependency_overrides[current_active_user] = lambda: SimpleNamespace(id=uuid.uuid4())
+    resp = await async_client.post(API_CREATE_BATCH, json={"items": [
+        {"original_url": url, "expires_at": plus_day}]})
+    assert resp.status_code == 200, resp.text
+    resp = await async_client.get(API_SEARCH, params=params)
+    assert len(resp.json()["items"]) == 2
+
+
+async def test_search_link_pages(async_client: AsyncClient):
+    """
+    Тестируем поиск нескольких ссылок с одинаковым оригинальным URL по страницам
+    """
+    plus_day = (datetime.now() + timedelta(days=1)).isoformat()
+    codes = []
+    for _ in range(3):
+        resp = await async_client.post(API_CREATE_PUBLIC, json={
+            "original_url": "http://search-pages.com/", "expires_at": plus_day})
+        assert resp.status_code == 200, resp.text
+        codes.append(resp.json()["short_code"])
+
+    # Поиск по ненормализованному url (без завершающего слэша)
+    params = {"original_url": "http://search-pages.com", "limit": 2}
+    first = (await async_client.get(API_SEARCH, params=params)).json()
+    assert [link["short_code"] for link in first["items"]] == codes[:2]
+    assert first["next_cursor"] is not None
+
+    params["after_id"] = first["next_cursor"]
+    second = (await async_client.get(API_SEARCH, params=params)).json()
+    assert [link["short_code"] for link in second["items"]] == codes[2:]
+    assert second["next_cursor"] is None
 
 
 # async def test_auth_shortening_and_crud(async_client: AsyncClient, auth_headers: dict):
@@ -217,3 +276,249 @@ async def test_search_link(async_client: AsyncClient):
 #     assert resp_delete.status_code == 200, resp_delete.text
 #     deleted_link = resp_delete.json()
 #     assert deleted_link["short_code"] == "custom-alias"
+
+
+async def test_redirect_served_from_cache(async_client: AsyncClient):
+    """
+    Тестируем, что созданная ссылка сразу попадает в кэш редиректов,
+    а редирект по ней отдаёт оригинальный url
+    """
+    plus_day = (datetime.now() + timedelta(days=1)).isoformat()
+    payload = {"original_url": "http://example-cached.com/", "expires_at": plus_day}
+
+    resp = await async_client.post(API_CREATE_PUBLIC, json=payload)
+    assert resp.status_code == 200, resp.text
+    short_code = resp.json()["short_code"]
+
+    cached = await get_cached_link(short_code)
+    assert cached is not None
+    assert cached["original_url"] == "http://example-cached.com/"
+
+    resp_redirect = await async_client.get(f"{API_REDIRECT}/{short_code}")
+    assert resp_redirect.status_code == 307, resp_redirect.text
+    assert resp_redirect.headers["Location"] == "http://example-cached.com/"
+
+
+async def test_health(async_client: AsyncClient):
+    """
+    Тестируем liveness и readiness: readiness отдаёт состояние каждой зависимости
+    """
+    resp = await async_client.get("/health/live")
+    assert resp.status_code == 200
+    assert resp.json() == {"status": "alive"}
+
+    resp = await async_client.get("/health/ready")
+    assert resp.status_code in (200, 503)
+    assert resp.json()["redis"] == "ok"
+    assert resp.json()["status"] == ("ready" if resp.json()["db"] == "ok" else "not ready")
+
+
+async def test_metrics(async_client: AsyncClient):
+    """
+    Тестируем, что /metrics отдаёт задержки по шаблону роута, а не по самому короткому коду,
+    и время команд Redis
+    """
+    plus_day = (datetime.now() + timedelta(days=1)).isoformat()
+    resp = await async_client.post(API_CREATE_PUBLIC, json={
+        "original_url": "http://example-metrics.com/", "expires_at": plus_day})
+    short_code = resp.json()["short_code"]
+    await async_client.get(f"{API_REDIRECT}/{short_code}")
+
+    resp = await async_client.get("/metrics")
+    assert resp.status_code == 200
+    assert 'http_request_duration_seconds_count{method="GET",route="/links/{short_code}",status="307"}' in resp.text
+    assert short_code not in resp.text
+    assert 'redis_command_duration_seconds_count{command="SET"}' in resp.text
+    # Команды конвейера (учёт клика при редиректе) замеряются одной пачкой
+    assert 'redis_command_duration_seconds_count{command="HINCRBY+HSET"}' in resp.text
+
+
+async def test_create_links_batch(async_client: AsyncClient):
+    """
+    Тестируем пакетное создание ссылок (POST /links/shorten/batch):
+    занятый и повторный алиас возвращают ошибку, остальные ссылки создаются
+    """
+    app.dependency_overrides[current_active_user] = lambda: SimpleNamespace(id=uuid.uuid4())
+    plus_day = (datetime.now() + timedelta(days=1)).isoformat()
+
+    resp = await async_client.post(API_CREATE_PUBLIC, json={
+        "original_url": "http://batch-taken.com/", "expires_at": plus_day,
+        "custom_alias": "batch-taken"})
+    assert resp.status_code == 200, resp.text
+
+    items = [
+        {"original_url": "http://batch-1.com/", "expires_at": plus_day},
+        {"original_url": "http://batch-2.com/", "expires_at": plus_day, "custom_alias": "batch-alias"},
+        {"original_url": "http://batch-3.com/", "expires_at": plus_day, "custom_alias": "batch-alias"},
+        {"original_url": "http://batch-4.com/", "expires_at": plus_day, "custom_alias": "batch-taken"},
+        {"original_url": "http://batch-5.com/", "custom_alias": "batch-valid"},
+        {"original_url": "http://batch-6.com/", "expires_at": plus_day, "custom_alias": "batch-valid"}]
+    resp = await async_client.post(API_CREATE_BATCH, json={"items": items})
+    assert resp.status_code == 200, resp.text
+    results = resp.json()
+
+    assert [r["index"] for r in results] == [0, 1, 2, 3, 4, 5]
+    assert results[0]["link"]["original_url"] == "http://batch-1.com/"
+    assert results[1]["link"]["short_code"] == "batch-alias"
+    assert results[2]["link"] is None and results[2]["error"]
+    assert results[3]["link"] is None and results[3]["error"]
+    # Элемент с ошибкой не резервирует алиас за собой
+    assert results[4]["link"] is None and results[4]["error"]
+    assert results[5]["link"]["short_code"] == "batch-valid"
+
+    # Созданные пакетом ссылки доступны для редиректа
+    short_code = results[0]["link"]["short_code"]
+    resp_redirect = await async_client.get(f"{API_REDIRECT}/{short_code}")
+    assert resp_redirect.status_code == 307, resp_redirect.text
+
+
+async def test_create_links_batch_code_conflict(async_client: AsyncClient, monkeypatch):
+    """
+    Тестируем пакетное создание ссылок: сгенерированный код, совпавший с алиасом,
+    заменяется новым, а не отклоняет весь пакет
+    """
+    # Повторная вставка идёт после rollback, поэтому сессия не привязана к внешней транзакции
+    engine = create_async_engine(
+        "sqlite+aiosqlite:///:memory:",
+        connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async_session = async_sessionmaker(engine, expire_on_commit=False)
+
+    async def override_get_db():
+        async with async_session() as session:
+            yield session
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[current_active_user] = lambda: SimpleNamespace(id=uuid.uuid4())
+    plus_day = (datetime.now() + timedelta(days=1)).isoformat()
+
+    resp = await async_client.post(API_CREATE_PUBLIC, json={
+        "original_url": "http://batch-conflict.com/", "expires_at": plus_day,
+        "custom_alias": "batch-conflict"})
+    assert resp.status_code == 200, resp.text
+
+    allocate_many = allocator.allocate_many
+    calls = []
+
+    async def conflicting_allocate_many(count, db=None):
+        calls.append(count)
+        codes = await allocate_many(count, db)
+        return ["batch-conflict"] + codes[1:] if len(calls) == 1 else codes
+
+    monkeypatch.setattr(allocator, "allocate_many", conflicting_allocate_many)
+    items = [
+        {"original_url": "http://batch-conflict-1.com/", "expires_at": plus_day},
+        {"original_url": "http://batch-conflict-2.com/", "expires_at": plus_day}]
+    resp = await async_client.post(API_CREATE_BATCH, json={"items": items})
+    assert resp.status_code == 200, resp.text
+    results = resp.json()
+
+    assert calls == [2, 2]
+    assert all(r["link"] and r["link"]["short_code"] != "batch-conflict" for r in results)
+    await engine.dispose()
+
+
+async def test_user_links_pages_and_stream(async_client: AsyncClient):
+    """
+    Тестируем ссылки пользователя (GET /links/user/all): постранично и потоком NDJSON
+    """
+    user = SimpleNamespace(id=uuid.uuid4())
+    app.dependency_overrides[current_active_user] = lambda: user
+    plus_day = (datetime.now() + timedelta(days=1)).isoformat()
+
+    items = [{"original_url": f"http://user-links-{i}.com/", "expires_at": plus_day} for i in range(3)]
+    resp = await async_client.post(API_CREATE_BATCH, json={"items": items})
+    assert resp.status_code == 200, resp.text
+    codes = [r["link"]["short_code"] for r in resp.json()]
+
+    first = (await async_client.get(API_USER_ALL, params={"limit": 2})).json()
+    assert [link["short_code"] for link in first["items"]] == codes[:2]
+    second = (await async_client.get(API_USER_ALL, params={"limit": 2, "after_id": first["next_cursor"]})).json()
+    assert [link["short_code"] for link in second["items"]] == codes[2:]
+    assert second["next_cursor"] is None
+
+    resp_stream = await async_client.get(API_USER_ALL, params={"stream": True})
+    assert resp_stream.status_code == 200, resp_stream.text
+    assert resp_stream.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in resp_stream.text.splitlines()]
+    assert [link["short_code"] for link in lines] == codes
+
+
+async def test_auth_create_link(async_client: AsyncClient, auth_headers: dict):
+    """
+    Тестируем создание ссылки авторизованным пользователем (POST /links/shorten):
+    регистрация, логин и ссылки работают через одну и ту же сессию БД
+    """
+    plus_day = (datetime.now().astimezone() + timedelta(days=1)).isoformat()
+    payload = {"original_url": "http://example-auth.com/", "expires_at": plus_day}
+
+    resp = await async_client.post(API_CREATE_SHORTEN, json=payload, headers=auth_headers)
+    assert resp.status_code == 200, resp.text
+    short_code = resp.json()["short_code"]
+
+    resp_user_all = await async_client.get(API_USER_ALL, headers=auth_headers)
+    assert resp_user_all.status_code == 200, resp_user_all.text
+    assert [link["short_code"] for link in resp_user_all.json()["items"]] == [short_code]
+
+
+async def test_update_link_alias(async_client: AsyncClient, auth_headers: dict):
+    """
+    Тестируем смену алиаса (PUT /links/{short_code}): старый код после обновления
+    не редиректит по закэшированной записи, новый ведёт на новый url
+    """
+    plus_day = (datetime.now().astimezone() + timedelta(days=1)).isoformat()
+    # Уникальные коды и url: Redis общий для запусков тестов
+    old_code, new_code = f"old-{uuid.uuid4().hex[:8]}", f"new-{uuid.uuid4().hex[:8]}"
+    old_url, new_url = f"http://{old_code}.com/", f"http://{new_code}.com/"
+    resp = await async_client.post(API_CREATE_SHORTEN, json={
+        "original_url": old_url, "expires_at": plus_day,
+        "custom_alias": old_code}, headers=auth_headers)
+    assert resp.status_code == 200, resp.text
+    resp = await async_client.get(f"{API_REDIRECT}/{old_code}")
+    assert resp.status_code == 307, resp.text
+
+    resp = await async_client.get(API_SEARCH, params={"original_url": new_url})
+    assert resp.json()["items"] == []
+
+    resp = await async_client.put(f"{API_REDIRECT}/{old_code}", json={
+        "original_url": new_url, "expires_at": plus_day,
+        "custom_alias": new_code}, headers=auth_headers)
+    assert resp.status_code == 200, resp.text
+
+    assert await get_cached_link(old_code) is None
+    resp = await async_client.get(f"{API_REDIRECT}/{old_code}")
+    assert resp.status_code == 404, resp.text
+    resp = await async_client.get(f"{API_REDIRECT}/{new_code}")
+    assert resp.status_code == 307, resp.text
+    assert resp.headers["location"] == new_url
+    # Клик по старому коду, ещё не записанный в БД, перешёл на новый код
+    resp = await async_client.get(f"{API_REDIRECT}/{new_code}/stats")
+    assert resp.json()["clicks_count"] == 2
+
+    # Поиск по новому url, закэшированный до обновления, видит ссылку, по старому - нет
+    resp = await async_client.get(API_SEARCH, params={"original_url": new_url})
+    assert [link["short_code"] for link in resp.json()["items"]] == [new_code]
+    resp = await async_client.get(API_SEARCH, params={"original_url": old_url})
+    assert resp.json()["items"] == []
+
+
+async def test_auth_user_cache(async_client: AsyncClient, auth_headers: dict):
+    """
+    Тестируем кэш авторизации: повторный запрос берёт пользователя из кэша,
+    изменение профиля (PATCH /users/me) сбрасывает кэш
+    """
+    token = auth_headers["Authorization"].split()[1]
+
+    resp = await async_client.get(API_USER_ALL, headers=auth_headers)
+    assert resp.status_code == 200, resp.text
+    user = await user_cache.get(token)
+    assert user is not None
+
+    resp = await async_client.get(API_USER_ALL, headers=auth_headers)
+    assert resp.status_code == 200, resp.text
+    assert await user_cache.get(token) is user
+
+    resp = await async_client.patch("/users/me", json={"email": "renamed@example.com"}, headers=auth_headers)
+    assert resp.status_code == 200, resp.text
+    assert await user_cache.get(token) is None
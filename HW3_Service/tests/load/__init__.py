@@ -0,0 +1,28 @@
+"""
+Нагрузочные бенчмарки сервиса: профили Locust, заполнение БД и запуск с сравнением с базовой линией.
+
+Заполненные ссылки имеют предсказуемые коды и url, поэтому профилям не нужно
+создавать ссылку перед каждым запросом
+"""
+import os
+
+# Сколько ссылок заполнено в БД (должно совпадать у seed и профилей)
+BENCH_LINKS = int(os.getenv("BENCH_LINKS", 100_000))
+
+# Сколько разных оригинальных url у заполненных ссылок (по каждому url находится BENCH_LINKS / BENCH_URLS ссылок)
+BENCH_URLS = int(os.getenv("BENCH_URLS", 1000))
+
+
+def seed_code(index: int) -> str:
+    """
+    Короткий код index-й заполненной ссылки.
+    Дефиса нет в алфавите аллокатора, поэтому коды не пересекаются с выдаваемыми сервисом
+    """
+    return f"bench-{index:07d}"
+
+
+def seed_url(index: int) -> str:
+    """
+    Оригинальный url index-й заполненной ссылки
+    """
+    return f"https://bench.example.com/page/{index % BENCH_URLS}"
@@ -0,0 +1,153 @@
+"""
+Профили нагрузки Locust. Профиль выбирается именем класса пользователя:
+
+    locust -f tests/load/locustfile.py --host http://localhost:8000 RedirectUser
+
+- RedirectUser - редиректы по заполненным ссылкам, популярность по закону Ципфа;
+- WriteUser - создание ссылок (одиночное, публичное и пакетное);
+- ReadUser - статистика и поиск по заполненным ссылкам;
+- MixedUser - смесь чтения и записи, близкая к реальной.
+
+Перед запуском заполните БД: python -m tests.load.seed --links $BENCH_LINKS
+"""
+import bisect
+import itertools
+import os
+import random
+import uuid
+from datetime import datetime, timedelta
+
+from locust import HttpUser, constant, task
+
+from tests.load import BENCH_LINKS, BENCH_URLS, seed_code, seed_url
+
+# Показатель распределения Ципфа: чем больше, тем сильнее запросы сосредоточены на популярных ссылках
+ZIPF_S = float(os.getenv("BENCH_ZIPF_S", 1.1))
+
+
+class ZipfKeys:
+    """
+    Выбор номера ссылки с вероятностью, обратно пропорциональной рангу в степени s
+    """
+
+    def __init__(self, n: int, s: float):
+        self.cum_weights = list(itertools.accumulate(1 / rank ** s for rank in range(1, n + 1)))
+
+    def sample(self) -> int:
+        return bisect.bisect_left(self.cum_weights, random.random() * self.cum_weights[-1])
+
+
+# Таблица весов общая для всех пользователей процесса
+_zipf = None
+
+
+def zipf_code() -> str:
+    global _zipf
+    if _zipf is None:
+        _zipf = ZipfKeys(BENCH_LINKS, ZIPF_S)
+    return seed_code(_zipf.sample())
+
+
+def expires_at(days: int = 1) -> str:
+    return (datetime.now() + timedelta(days=days)).isoformat()
+
+
+class BenchUser(HttpUser):
+    """
+    Базовый пользователь: без пауз между запросами, чтобы мерить пропускную способность
+    """
+    abstract = True
+    wait_time = constant(0)
+
+    def redirect(self):
+        self.client.get(f"/links/{zipf_code()}", allow_redirects=False, name="/links/[code]")
+
+    def stats(self):
+        self.client.get(f"/links/{zipf_code()}/stats", name="/links/[code]/stats")
+
+    def search(self):
+        url = seed_url(random.randrange(BENCH_URLS))
+        self.client.get("/links/search/", params={"original_url": url}, name="/links/search/")
+
+
+class AuthorizedBenchUser(BenchUser):
+    """
+    Пользователь со своей учётной записью (регистрируется при старте)
+    """
+    abstract = True
+
+    def on_start(self):
+        email = f"bench-{uuid.uuid4().hex}@example.com"
+        self.client.post("/auth/register", json={"email": email, "password": "bench"})
+        response = self.client.post("/auth/jwt/login", data={"username": email, "password": "bench"})
+        self.client.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+        self.own_codes = []
+
+    def create(self):
+        response = self.client.post("/links/shorten", json={
+            "original_url": f"https://write.example.com/{uuid.uuid4().hex}", "expires_at": expires_at()})
+        if response.ok:
+            self.own_codes.append(response.json()["short_code"])
+
+
+class RedirectUser(BenchUser):
+    @task
+    def redirect_link(self):
+        self.redirect()
+
+
+class WriteUser(AuthorizedBenchUser):
+    @task(5)
+    def create_link(self):
+        self.create()
+
+    @task(3)
+    def create_public_link(self):
+        self.client.post("/links/public", json={
+            "original_url": f"https://public.example.com/{uuid.uuid4().hex}", "expires_at": expires_at()})
+
+    @task(1)
+    def create_links_batch(self):
+        items = [{"original_url": f"https://batch.example.com/{uuid.uuid4().hex}", "expires_at": expires_at()}
+                 for _ in range(100)]
+        self.client.post("/links/shorten/batch", json={"items": items})
+
+
+class ReadUser(BenchUser):
+    @task(3)
+    def link_stats(self):
+        self.stats()
+
+    @task(2)
+    def search_links(self):
+        self.search()
+
+
+class MixedUser(AuthorizedBenchUser):
+    @task(80)
+    def redirect_link(self):
+        self.redirect()
+
+    @task(8)
+    def link_stats(self):
+        self.stats()
+
+    @task(4)
+    def search_links(self):
+        self.search()
+
+    @task(5)
+    def create_link(self):
+        self.create()
+
+    @task(2)
+    def update_link(self):
+        if self.own_codes:
+            self.client.put(f"/links/{random.choice(self.own_codes)}", name="/links/[code]", json={
+                "original_url": f"https://updated.example.com/{uuid.uuid4().hex}",
+                "expires_at": expires_at(2)})
+
+    @task(1)
+    def delete_link(self):
+        if self.own_codes:
+            self.client.delete(f"/links/{self.own_codes.pop()}", name="/links/[code]")
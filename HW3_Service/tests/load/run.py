@@ -0,0 +1,184 @@
+"""
+Запуск профиля нагрузки без интерфейса Locust: p50/p95/p99 и RPS по каждому роуту в JSON
+и сравнение с сохранённой базовой линией (код возврата 1 при регрессии).
+
+Против запущенного сервиса (docker compose up, БД заполнена tests.load.seed):
+    python -m tests.load.run RedirectUser --host http://localhost:8000
+
+Полностью локально (SQLite + fakeredis, сервис и заполнение поднимаются сами):
+    python -m tests.load.run MixedUser --local
+
+Сохранить результат как новую базовую линию: --save-baseline
+"""
+import argparse
+import csv
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from urllib.error import URLError
+from urllib.request import urlopen
+
+from tests.load import BENCH_LINKS
+
+LOAD_DIR = Path(__file__).parent
+RESULTS_DIR = LOAD_DIR / "results"
+BASELINE_FILE = LOAD_DIR / "baseline.json"
+PROFILES = ["RedirectUser", "WriteUser", "ReadUser", "MixedUser"]
+
+# Параметры запуска, при которых результат сравним с базовой линией
+RUN_PARAMS = ("users", "duration", "links", "local")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_ready(host: str, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            urlopen(host, timeout=1)
+            return
+        except (URLError, ConnectionError):
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"Сервис {host} не запустился за {timeout} сек")
+            time.sleep(0.2)
+
+
+def start_local_service(links: int, workdir: str):
+    """
+    Поднятие сервиса на SQLite и fakeredis с заполненной БД.
+    Возвращает (адрес сервиса, процесс uvicorn, сервер fakeredis)
+    """
+    from fakeredis import TcpFakeServer
+
+    redis_port, app_port = free_port(), free_port()
+    redis_server = TcpFakeServer(("127.0.0.1", redis_port), server_type="redis")
+    threading.Thread(target=redis_server.serve_forever, daemon=True).start()
+
+    env = {**os.environ,
+           "DB_URL": f"sqlite+aiosqlite:///{workdir}/bench.db",
+           "REDIS_HOST": "127.0.0.1", "REDIS_PORT": str(redis_port),
+           "BENCH_LINKS": str(links), "SWEEPER_IN_APP": "true"}
+    subprocess.run([sys.executable, "-m", "tests.load.seed", "--links", str(links)], env=env, check=True)
+    app = subprocess.Popen([sys.executable, "-m", "uvicorn", "app.main:app",
+                            "--port", str(app_port), "--log-level", "warning"], env=env)
+    host = f"http://127.0.0.1:{app_port}"
+    wait_ready(host)
+    return host, app, redis_server
+
+
+def run_locust(profile: str, host: str, users: int, duration: str, links: int, local: bool,
+               workdir: str) -> dict:
+    """
+    Запуск Locust и разбор итоговой статистики из CSV
+    """
+    prefix = f"{workdir}/{profile}"
+    env = {**os.environ, "BENCH_LINKS": str(links)}
+    subprocess.run(["locust", "-f", str(LOAD_DIR / "locustfile.py"), "--headless", "--only-summary",
+                    "-u", str(users), "-r", str(users), "-t", duration, "--host", host,
+                    "--csv", prefix, profile], env=env, check=False)
+
+    endpoints = {}
+    with open(f"{prefix}_stats.csv", newline="") as f:
+        for row in csv.DictReader(f):
+            endpoints[f"{row['Type']} {row['Name']}".strip()] = {
+                "requests": int(row["Request Count"]),
+                "failures": int(row["Failure Count"]),
+                "rps": round(float(row["Requests/s"]), 2),
+                "p50": float(row["50%"]),
+                "p95": float(row["95%"]),
+                "p99": float(row["99%"])}
+    return {"profile": profile, "users": users, "duration": duration, "links": links, "local": local,
+            "total": endpoints.pop("Aggregated"), "endpoints": endpoints}
+
+
+def compare(result: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Регрессии относительно базовой линии: рост перцентилей или падение RPS больше чем на tolerance
+    """
+    regressions = []
+    for name, stats in [("total", result["total"]), *result["endpoints"].items()]:
+        base = baseline["total"] if name == "total" else baseline["endpoints"].get(name)
+        if base is None:
+            continue
+        for metric in ("p50", "p95", "p99"):
+            if stats[metric] > base[metric] * (1 + tolerance):
+                regressions.append(f"{name}: {metric} {base[metric]:.0f} -> {stats[metric]:.0f} мс")
+        if stats["rps"] < base["rps"] * (1 - tolerance):
+            regressions.append(f"{name}: rps {base['rps']} -> {stats['rps']}")
+        base_error_rate = base["failures"] / max(base["requests"], 1)
+        if stats["failures"] / max(stats["requests"], 1) > base_error_rate + 0.01:
+            regressions.append(f"{name}: ошибок {stats['failures']} из {stats['requests']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный бенчмарк с базовой линией")
+    parser.add_argument("profile", choices=PROFILES)
+    parser.add_argument("--host", default="http://localhost:8000")
+    parser.add_argument("--local", action="store_true", help="Поднять сервис на SQLite и fakeredis")
+    parser.add_argument("--links", type=int, default=BENCH_LINKS, help="Сколько ссылок заполнено в БД")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--duration", default="30s")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_FILE)
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Допустимое ухудшение (доля)")
+    parser.add_argument("--save-baseline", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        app = redis_server = None
+        host = args.host
+        try:
+            if args.local:
+                host, app, redis_server = start_local_service(args.links, workdir)
+            result = run_locust(args.profile, host, args.users, args.duration, args.links, args.local, workdir)
+        finally:
+            if app is not None:
+                app.terminate()
+                app.wait()
+            if redis_server is not None:
+                redis_server.shutdown()
+
+    RESULTS_DIR.mkdir(exist_ok=True)
+    result_file = RESULTS_DIR / f"{args.profile}.json"
+    result_file.write_text(json.dumps(result, indent=2, ensure_ascii=False))
+    total = result["total"]
+    print(f"{args.profile}: {total['rps']} rps, p50 {total['p50']:.0f} мс, p95 {total['p95']:.0f} мс, "
+          f"p99 {total['p99']:.0f} мс, ошибок {total['failures']} -> {result_file}")
+
+    baselines = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    if args.save_baseline:
+        baselines[args.profile] = result
+        args.baseline.write_text(json.dumps(baselines, indent=2, ensure_ascii=False))
+        print(f"Базовая линия сохранена в {args.baseline}")
+        return
+    if args.profile not in baselines:
+        print("Базовой линии для профиля нет, сравнение пропущено")
+        return
+
+    # Результаты с другой нагрузкой или объёмом данных не сравниваются
+    baseline = baselines[args.profile]
+    mismatched = [f"{param}: {baseline.get(param)} -> {result[param]}"
+                  for param in RUN_PARAMS if baseline.get(param) != result[param]]
+    if mismatched:
+        print(f"Параметры запуска отличаются от базовой линии ({', '.join(mismatched)}), "
+              f"сравнение невозможно: запустите с теми же параметрами или переснимите её с --save-baseline")
+        sys.exit(2)
+
+    regressions = compare(result, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"РЕГРЕССИЯ {regression}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
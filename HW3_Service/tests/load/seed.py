@@ -0,0 +1,47 @@
+"""
+Заполнение БД ссылками для бенчмарков (коды и url - из tests.load.seed_code/seed_url).
+Уже заполненная часть пропускается, поэтому повторный запуск дозаполняет таблицу.
+
+Запуск: python -m tests.load.seed --links 1000000
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert, select
+
+from app.db import engine, init_db
+from app.models import Link
+from app.urls import url_hash
+from tests.load import BENCH_LINKS, seed_code, seed_url
+
+
+async def seed(links: int, batch_size: int) -> None:
+    await init_db()
+    async with engine.begin() as conn:
+        start_index = await conn.scalar(
+            select(func.count()).select_from(Link).where(Link.short_code.like("bench-%")))
+
+    now = datetime.now().astimezone()
+    expires_at = now + timedelta(days=365)
+    started = time.perf_counter()
+    for batch_start in range(start_index, links, batch_size):
+        rows = [{"short_code": seed_code(i), "original_url": seed_url(i), "url_hash": url_hash(seed_url(i)),
+                 "created_at": now, "expires_at": expires_at, "last_clicked_at": now,
+                 "clicks_count": 0, "is_active": True}
+                for i in range(batch_start, min(batch_start + batch_size, links))]
+        # Отдельная транзакция на порцию: прерванное заполнение можно продолжить
+        async with engine.begin() as conn:
+            await conn.execute(insert(Link), rows)
+        done = batch_start + len(rows)
+        print(f"{done}/{links} ссылок, {(done - start_index) / (time.perf_counter() - started):.0f} в сек")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Заполнение БД ссылками для бенчмарков")
+    parser.add_argument("--links", type=int, default=BENCH_LINKS, help="Сколько ссылок должно быть в БД")
+    parser.add_argument("--batch-size", type=int, default=10_000, help="Ссылок в одной вставке")
+    args = parser.parse_args()
+    asyncio.run(seed(args.links, args.batch_size))
@@ -1,10 +1,24 @@
+import asyncio
+import json
+import time
+import uuid
+import jwt
 import pytest
+from datetime import datetime, timedelta
 import pytest_asyncio
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.ext.asyncio import async_sessionmaker
 from sqlalchemy import select
-from app.models import Base, Link
-from app.utils import generate_short_code
+from app.models import Base, Link, User
+from app.auth.user_cache import UserCache
+from app.shortcodes import ALPHABET, BASE, ShortCodeAllocator, allocator
+from app.clicks import (CLICKS_FLUSHING, flush_clicks, move_clicks, pending_clicks,
+                        record_click)
+from app.utils import sweep_expired_links
+from app.cache import (cached_load, cache_link, get_cached_link, invalidate_link,
+                       listen_invalidations, local_links, redis_links_stats)
+from app.routers.redis_client import get_redis
+from app.sweeper import LEASE_KEY, run_background_tasks
 
 
 # Фикстура для движка БД
@@ -32,9 +46,247 @@ async def session(engine):
 @pytest.mark.asyncio
 async def test_code_gen(session: AsyncSession):
     # Тест генерации нового кода
-    short_code = generate_short_code()
+    short_code = await allocator.allocate()
     assert len(short_code) == 6
 
     # Проверка отсутствия кода в бд
     result = await session.execute(select(Link).where(Link.short_code == short_code))
     assert result.scalar() is None
+
+
+@pytest.mark.asyncio
+async def test_code_gen_unique():
+    # Коды из нескольких блоков не повторяются, длина задаётся параметром
+    code_allocator = ShortCodeAllocator(length=4, block_size=100)
+    codes = await code_allocator.allocate_many(250)
+    codes.append(await code_allocator.allocate())
+    assert len(set(codes)) == len(codes)
+    assert all(len(code) == 4 for code in codes)
+
+
+@pytest.mark.asyncio
+async def test_code_gen_postgres_sequence():
+    # В PostgreSQL номера берутся из последовательности и не пересекаются с номерами счётчика Redis
+    class Result:
+        def __init__(self, values):
+            self.values = values
+
+        def scalars(self):
+            return self.values
+
+    class PostgresSession:
+        bind = type("Bind", (), {"dialect": type("Dialect", (), {"name": "postgresql"})})()
+
+        def __init__(self):
+            self.statements = []
+
+        async def execute(self, statement, params):
+            self.statements.append(str(statement))
+            return Result(list(range(1, params["count"] + 1)))
+
+    code_allocator = ShortCodeAllocator(length=4, block_size=10)
+    db = PostgresSession()
+    sequence_codes = await code_allocator.allocate_many(10, db)
+    assert "nextval" in db.statements[0]
+    assert sequence_codes == [code_allocator._scramble(code_allocator.space // 2 + n) for n in range(10)]
+
+    # Перестановка биективна: по коду однозначно восстанавливается номер, и он из верхней половины
+    inverse = pow(code_allocator._multiplier, -1, code_allocator.space)
+    for code in sequence_codes:
+        value = sum(ALPHABET.index(char) * BASE ** i for i, char in enumerate(reversed(code)))
+        assert (value - code_allocator._offset) * inverse % code_allocator.space >= code_allocator.space // 2
+
+
+@pytest.mark.asyncio
+async def test_flush_clicks(session: AsyncSession):
+    # Клики копятся в Redis и одним UPDATE попадают в БД
+    short_code = await allocator.allocate()
+    session.add(Link(original_url="http://clicks.com/", short_code=short_code,
+                     expires_at=datetime.now().astimezone() + timedelta(days=1),
+                     clicks_count=0))
+    await session.commit()
+
+    await record_click(short_code)
+    await record_click(short_code)
+    assert (await pending_clicks(short_code))[0] == 2
+
+    await flush_clicks(session)
+    assert (await pending_clicks(short_code))[0] == 0
+
+    session.expire_all()
+    result = await session.execute(select(Link).where(Link.short_code == short_code))
+    assert result.scalar_one().clicks_count == 2
+
+
+@pytest.mark.asyncio
+async def test_flush_clicks_keeps_unfinished_flush(session: AsyncSession):
+    # Клики, забранные незавершённым сбросом, не перезаписываются новыми и попадают в БД,
+    # даже если время последнего клика не сохранилось
+    codes = await allocator.allocate_many(2)
+    clicked_at = datetime.now().astimezone() - timedelta(days=1)
+    for code in codes:
+        session.add(Link(original_url="http://clicks-unfinished.com/", short_code=code,
+                         expires_at=datetime.now().astimezone() + timedelta(days=1),
+                         clicks_count=0, last_clicked_at=clicked_at))
+    await session.commit()
+
+    await get_redis().hset(CLICKS_FLUSHING, codes[0], 3)
+    await record_click(codes[1])
+    await flush_clicks(session)
+    assert (await pending_clicks(codes[0]))[0] == 0
+    assert (await pending_clicks(codes[1]))[0] == 0
+
+    session.expire_all()
+    links = {link.short_code: link for link in (await session.scalars(select(Link))).all()}
+    assert links[codes[0]].clicks_count == 3
+    assert links[codes[1]].clicks_count == 1
+    assert links[codes[1]].last_clicked_at.replace(tzinfo=None) > clicked_at.replace(tzinfo=None)
+
+
+@pytest.mark.asyncio
+async def test_move_clicks():
+    # При смене алиаса накопленные клики переходят на новый код
+    old_code, new_code = await allocator.allocate_many(2)
+    await record_click(old_code)
+    await record_click(old_code)
+    await move_clicks(old_code, new_code)
+    assert (await pending_clicks(old_code)) == (0, None)
+    clicks, last_clicked_at = await pending_clicks(new_code)
+    assert clicks == 2 and last_clicked_at is not None
+
+
+@pytest.mark.asyncio
+async def test_sweep_expired_links(session: AsyncSession):
+    # Устаревшие ссылки удаляются порциями, живые остаются
+    now = datetime.now().astimezone()
+    codes = await allocator.allocate_many(6)
+    for i, code in enumerate(codes):
+        expires_at = now + timedelta(days=1) if i == 0 else now - timedelta(minutes=1)
+        session.add(Link(original_url=f"http://sweep-{i}.com/", short_code=code,
+                         expires_at=expires_at, clicks_count=0))
+    await session.commit()
+
+    assert await sweep_expired_links(session, chunk_size=3) == 3
+    assert await sweep_expired_links(session, chunk_size=3) == 2
+    assert await sweep_expired_links(session, chunk_size=3) == 0
+
+    result = await session.execute(select(Link.short_code))
+    assert result.scalars().all() == [codes[0]]
+
+
+@pytest.mark.asyncio
+async def test_cached_load_single_flight():
+    # Одновременные промахи по одному ключу выполняют загрузку один раз
+    key = f"test:{await allocator.allocate()}"
+    calls = 0
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return {"value": 1}
+
+    results = await asyncio.gather(*(cached_load(key, loader) for _ in range(20)))
+    assert calls == 1
+    assert all(result == {"value": 1} for result in results)
+
+    # Свежая запись отдаётся из кэша
+    assert await cached_load(key, loader) == {"value": 1}
+    assert calls == 1
+    await get_redis().delete(key)
+
+
+@pytest.mark.asyncio
+async def test_cached_load_stale_while_revalidate():
+    # Устаревшую запись обновляет один запрос, остальные получают старое значение
+    key = f"test:{await allocator.allocate()}"
+    entry = {"value": "old", "delta": 0.01, "expires": time.time() - 1}
+    await get_redis().set(key, json.dumps(entry), ex=60)
+    calls = 0
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.3)
+        return "new"
+
+    results = await asyncio.gather(*(cached_load(key, loader) for _ in range(10)))
+    assert calls == 1
+    assert sorted(results) == ["new"] + ["old"] * 9
+    assert await cached_load(key, loader) == "new"
+    await get_redis().delete(key)
+
+
+@pytest.mark.asyncio
+async def test_two_tier_link_cache():
+    # Повторное чтение отдаётся из памяти процесса, не обращаясь к Redis
+    code = f"t{await allocator.allocate()}"
+    expires_at = datetime.now().astimezone() + timedelta(days=1)
+    await cache_link(code, "https://example.com/", expires_at)
+    local_links.clear()
+    redis_hits = redis_links_stats.hits
+
+    assert (await get_cached_link(code))["original_url"] == "https://example.com/"
+    assert (await get_cached_link(code))["original_url"] == "https://example.com/"
+    assert redis_links_stats.hits == redis_hits + 1
+    assert local_links.stats.hits >= 1
+
+    # Инвалидация в другом процессе доходит до локального уровня через pub/sub
+    listener = asyncio.create_task(listen_invalidations())
+    await asyncio.sleep(0.1)
+    local_links.set(code, {"original_url": "stale", "expires_at": expires_at})
+    await get_redis().publish("cache:invalidate", json.dumps([code]))
+    await asyncio.sleep(0.1)
+    assert code not in local_links._data
+    listener.cancel()
+    await asyncio.gather(listener, return_exceptions=True)
+
+    # Собственная инвалидация удаляет запись из обоих уровней
+    await cache_link(code, "https://example.com/", expires_at)
+    await invalidate_link(code)
+    assert await get_cached_link(code) is None
+
+
+@pytest.mark.asyncio
+async def test_user_cache_invalidation_across_processes():
+    # Изменение пользователя в одном процессе удаляет его записи из памяти других процессов
+    worker, other_worker = UserCache(use_redis=False), UserCache(use_redis=False)
+    user = User(id=uuid.uuid4(), email="cache@example.com")
+    token = jwt.encode({"exp": int(time.time()) + 60}, "secret")
+    await worker.set(token, user)
+    assert await worker.get(token) is user
+
+    listener = asyncio.create_task(worker.listen())
+    await asyncio.sleep(0.1)
+    await other_worker.invalidate(user.id)
+    await asyncio.sleep(0.1)
+    assert await worker.get(token) is None
+    listener.cancel()
+    await asyncio.gather(listener, return_exceptions=True)
+
+
+@pytest.mark.asyncio
+async def test_background_tasks_single_leader(monkeypatch):
+    # Фоновые задачи запускает только один из процессов, после его остановки - другой
+    started = []
+
+    async def task():
+        started.append(asyncio.current_task())
+        await asyncio.Event().wait()
+
+    monkeypatch.setattr("app.sweeper.delete_old_links", task)
+    monkeypatch.setattr("app.sweeper.flush_clicks_periodically", task)
+    await get_redis().delete(LEASE_KEY)
+
+    first = asyncio.create_task(run_background_tasks(lease_ttl=0.3))
+    second = asyncio.create_task(run_background_tasks(lease_ttl=0.3))
+    await asyncio.sleep(0.5)
+    assert len(started) == 2
+
+    first.cancel()
+    await asyncio.gather(first, return_exceptions=True)
+    await asyncio.sleep(0.5)
+    assert len(started) == 4
+    second.cancel()
+    await asyncio.gather(second, return_exceptions=True)
+    assert await get_redis().get(LEASE_KEY) is None